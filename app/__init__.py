@@ -1,7 +1,13 @@
-from flask import Flask
+import time
+from flask import Flask, Response, g, request
 from .config import get_config
 from .extensions import db, migrate, redis_client, kafka_producer
 from .api import create_api_blueprint
+from .utils import metrics
+
+REQUEST_LATENCY = metrics.histogram(
+    "http_request_duration_seconds", "Flask request latency by route", ("method", "route", "status"),
+)
 
 
 def create_app(config_name: str = "development") -> Flask:
@@ -19,9 +25,27 @@ def create_app(config_name: str = "development") -> Flask:
     # Register blueprints (optional; shown as a hook)
     app.register_blueprint(create_api_blueprint(), url_prefix="/api")
 
+    # Per-route latency; labelled by URL rule so path parameters do not explode the series count
+    @app.before_request
+    def start_request_timer():
+        g.request_start = time.perf_counter()
+
+    @app.after_request
+    def observe_request_latency(response):
+        start = g.pop("request_start", None)
+        if start is not None:
+            route = request.url_rule.rule if request.url_rule is not None else "unmatched"
+            REQUEST_LATENCY.labels(request.method, route, response.status_code).observe(time.perf_counter() - start)
+        return response
+
     # Health check
     @app.get("/health")
     def health():
         return {"status": "ok"}, 200
 
+    # Prometheus scrape endpoint for this process
+    @app.get("/metrics")
+    def metrics_endpoint():
+        return Response(metrics.REGISTRY.render(), content_type=metrics.CONTENT_TYPE)
+
     return app
@@ -1,41 +1,53 @@
-import json
-from confluent_kafka import Producer, KafkaError
+from confluent_kafka import KafkaException
 from confluent_kafka.admin import AdminClient, NewTopic
 from flask import current_app
+from ..extensions import kafka_producer
+from ..utils.codec import encode
 
 
 class KafkaAdapter:
-    """High-level Kafka adapter for managing producers and administrative actions."""
+    """High-level Kafka adapter: administrative actions, and publishing through the shared producer service."""
 
     def __init__(self, bootstrap_servers: str, client_id: str):
         self.bootstrap_servers = bootstrap_servers
         self.client_id = client_id
         self.producer = None
         self.admin_client = None
+        self.codec = "json"
 
     def init_app(self, app=None):
-        config = {
-            "bootstrap.servers": app.config.get("KAFKA_BOOTSTRAP_SERVERS", self.bootstrap_servers),
-            "client.id": app.config.get("KAFKA_CLIENT_ID", self.client_id),
-            "enable.idempotence": True,
-            "acks": "all",
-        }
-        self.producer = Producer(config)
-        self.admin_client = AdminClient({"bootstrap.servers": config["bootstrap.servers"]})
-
-    def produce_json(self, topic: str, key: str, value: dict):
-        """Publish a JSON payload to Kafka with key-based partitioning."""
-        payload = json.dumps(value).encode("utf-8")
+        """Bind to the process-wide producer service, initializing it for `app` if needed."""
+        self.bootstrap_servers = app.config.get("KAFKA_BOOTSTRAP_SERVERS", self.bootstrap_servers)
+        self.codec = app.config.get("KAFKA_CODEC", self.codec)
+        if not kafka_producer.initialized:
+            kafka_producer.init_app(app)
+        self.producer = kafka_producer
+        return self
+
+    def produce_json(self, topic: str, key: str, value: dict, event_type: str = None):
+        """Publish a JSON payload to Kafka with key-based partitioning; returns the delivery Future."""
+        return self._produce(topic, key, event_type, value, "json")
+
+    def produce_event(self, topic: str, key: str, event_type: str, value: dict):
+        """
+        Publish an event encoded with the configured codec (KAFKA_CODEC), with codec/type/tenant headers;
+        returns the delivery Future.
+        """
+        return self._produce(topic, key, event_type, value, self.codec)
+
+    def _produce(self, topic, key, event_type, value, codec):
+        payload, headers = encode(event_type, value, codec)
         try:
-            self.producer.produce(topic, key=key.encode("utf-8"), value=payload)
-            self.producer.poll(0)
+            return self.producer.send(topic, payload, key=key.encode("utf-8"), headers=headers)
         except BufferError as e:
             raise RuntimeError(f"Kafka buffer full: {e}")
-        except KafkaError as e:
-            raise RuntimeError(f"Kafka error: {e.str()}")
+        except KafkaException as e:
+            raise RuntimeError(f"Kafka error: {e}")
 
     def create_topic(self, topic_name: str, num_partitions: int = 3, replication_factor: int = 1):
         """Create Kafka topic if it doesn’t already exist."""
+        if self.admin_client is None:
+            self.admin_client = AdminClient({"bootstrap.servers": self.bootstrap_servers})
         topic = NewTopic(topic_name, num_partitions=num_partitions, replication_factor=replication_factor)
         try:
             fs = self.admin_client.create_topics([topic])
@@ -1,18 +1,19 @@
-from redis import Redis
 from flask import current_app
+from ..extensions import redis_client
 
 
 class RedisAdapter:
-    """Manages Redis connections and common caching/locking operations."""
+    """Common caching/locking operations on top of the process-wide pooled Redis client."""
 
-    def __init__(self, redis_url: str):
+    def __init__(self, redis_url: str = None):
         self.redis_url = redis_url
         self.client = None
 
     def init_app(self, app=None):
-        """Initialize a pooled Redis client."""
-        url = app.config.get("REDIS_URL", self.redis_url)
-        self.client = Redis.from_url(url, decode_responses=True)
+        """Bind to the shared pooled client, initializing it for `app` if needed; never opens a pool of its own."""
+        if not redis_client.initialized:
+            redis_client.init_app(app)
+        self.client = redis_client.client
         return self
 
     @classmethod
@@ -25,15 +26,17 @@ class RedisAdapter:
 
     # Common helper patterns
     def hset_json(self, key: str, mapping: dict, ttl: int = 300):
-        """Set a hash with optional expiry."""
-        self.client.hset(key, mapping=mapping)
-        if ttl:
-            self.client.expire(key, ttl)
+        """Set a hash with optional expiry in a single round trip."""
+        redis_client.hset_many({key: mapping}, ttl=ttl)
 
     def get_json_hash(self, key: str) -> dict:
         """Fetch hash and return as dictionary."""
         return self.client.hgetall(key)
 
+    def get_json_hashes(self, keys: list) -> list:
+        """Fetch many hashes in a single round trip."""
+        return redis_client.hgetall_many(keys)
+
     def acquire_lock(self, key: str, ttl: int = 30) -> bool:
         """Simple distributed lock via SETNX."""
         return bool(self.client.set(name=f"lock:{key}", value="1", nx=True, ex=ttl))
@@ -1,35 +1,32 @@
 # app/api/agents.py
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, request, jsonify, current_app
 from http import HTTPStatus
-from sqlalchemy import select
-from ..extensions import db, redis_client
-from ..models import Agent, AgentStatus
+from ..models import AgentStatus
+from ..services.agent_service import AgentService
+from ..services.presence import Presence
+from .pagination import page_args, stream_page
 
 bp = Blueprint("agents", __name__)
 
 
 @bp.get("")
 def list_agents():
-    # Filters: tenant_id, status, skill
+    # Filters: tenant_id, status, skill; keyset pagination: limit, after (id of the last agent seen)
     tenant_id = request.args.get("tenant_id")
     status = request.args.get("status")
     skill = request.args.get("skill")
 
-    stmt = select(Agent)
-    if tenant_id:
-        stmt = stmt.where(Agent.tenant_id == tenant_id)
     if status:
         try:
-            st = AgentStatus(status)
-            stmt = stmt.where(Agent.status == st)
+            AgentStatus(status)
         except ValueError:
             return jsonify({"error": "invalid status"}), HTTPStatus.BAD_REQUEST
-    if skill:
-        # naive skill matching; replace with JSON/ARRAY field if needed
-        stmt = stmt.where(Agent.skills.ilike(f"%{skill}%"))
+    limit, after, error = page_args()
+    if error:
+        return jsonify({"error": error}), HTTPStatus.BAD_REQUEST
 
-    agents = db.session.execute(stmt).scalars().all()
-    return jsonify([a.to_dict() for a in agents]), HTTPStatus.OK
+    agents = AgentService.stream_agents(tenant_id=tenant_id, skill=skill, status=status, after=after, limit=limit)
+    return stream_page(agents, limit)
 
 
 @bp.post("/status")
@@ -49,32 +46,34 @@ def upsert_agent_status():
 
     skills = data.get("skills")
     current_load = data.get("current_load")
+    if not (isinstance(current_load, int) and current_load >= 0):
+        current_load = None
 
-    agent: Agent | None = db.session.execute(
-        select(Agent).where(Agent.agent_id == agent_id, Agent.tenant_id == tenant_id)
-    ).scalars().first()
+    # Shared upsert path keeps the Redis hash and availability index in sync with the DB
+    agent = AgentService.upsert_agent(
+        agent_id=agent_id,
+        tenant_id=tenant_id,
+        status=status_enum,
+        skills=skills,
+        current_load=current_load,
+    )
 
-    if agent is None:
-        agent = Agent(agent_id=agent_id, tenant_id=tenant_id)
-        db.session.add(agent)
+    if current_app.config.get("ROUTING_SHARD_BY_TENANT"):
+        # The tenant's owning router only learns about agents from its agent.status partition
+        AgentService.publish_status(agent_id, tenant_id, status_enum.value, skills, current_load)
 
-    agent.status = status_enum
-    if skills is not None:
-        agent.skills = skills
-    if isinstance(current_load, int) and current_load >= 0:
-        agent.current_load = current_load
+    return jsonify(agent.to_dict()), HTTPStatus.OK
 
-    db.session.commit()
 
-    # Optional: reflect presence in Redis cache for fast worker reads
-    try:
-        r = redis_client.client
-        r.hset(f"agent:{tenant_id}:{agent_id}", mapping={
-            "status": agent.status.value,
-            "skills": agent.skills or "",
-            "current_load": str(agent.current_load),
-        })
-    except Exception as e:
-        print(e)
 
-    return jsonify(agent.to_dict()), HTTPStatus.OK
+@bp.post("/heartbeat")
+def agent_heartbeat():
+    # Body: { agent_id, tenant_id }; only refreshes the agent's last-seen time in Redis, never touches the DB
+    data = request.get_json(silent=True) or {}
+    agent_id = data.get("agent_id")
+    tenant_id = data.get("tenant_id")
+    if not agent_id or not tenant_id:
+        return jsonify({"error": "agent_id, tenant_id are required"}), HTTPStatus.BAD_REQUEST
+
+    Presence.touch(tenant_id, agent_id)
+    return "", HTTPStatus.NO_CONTENT
@@ -1,10 +1,27 @@
-from flask import Blueprint, jsonify, request
+import logging
+from flask import Blueprint, current_app, jsonify, request
 from http import HTTPStatus
-from sqlalchemy import select
-from ..extensions import db
-from ..models import Assignment
+from ..repositories import AssignmentCache, AssignmentRepository
+from .pagination import page_args, stream_page
 
 bp = Blueprint("assignments", __name__)
+logger = logging.getLogger("assignments_api")
+
+
+@bp.get("")
+def list_assignments():
+    # Filters: tenant_id; keyset pagination: limit, after (id of the last assignment seen)
+    limit, after, error = page_args()
+    if error:
+        return jsonify({"error": error}), HTTPStatus.BAD_REQUEST
+
+    assignments = AssignmentRepository().stream_all(
+        tenant_id=request.args.get("tenant_id"),
+        after=after,
+        limit=limit,
+        chunk_size=current_app.config.get("API_STREAM_CHUNK_SIZE", 500),
+    )
+    return stream_page(assignments, limit)
 
 
 @bp.get("/<customer_id>")
@@ -13,15 +30,28 @@ def get_assignment(customer_id: str):
     if not tenant_id:
         return jsonify({"error": "tenant_id is required"}), HTTPStatus.BAD_REQUEST
 
-    # Prefer lookup by business UID to avoid FK dependency
-    stmt = select(Assignment).where(
-        Assignment.customer_uid == customer_id,
-        Assignment.tenant_id == tenant_id,
-    )
-    assignment = db.session.execute(stmt).scalars().first()
-    if assignment is None:
+    # Read-through: routing writes assignments into the cache, so polls rarely reach the database
+    try:
+        hit, payload = AssignmentCache.get(tenant_id, customer_id)
+    except Exception as e:
+        logger.warning(f"Assignment cache unavailable, reading from the database: {e}")
+        hit, payload = False, None
+    if not hit:
+        # Prefer lookup by business UID to avoid FK dependency; columns only, no joins
+        payload = AssignmentRepository().get_view(customer_id, tenant_id)
+        try:
+            AssignmentCache.put(
+                tenant_id,
+                customer_id,
+                payload,
+                ttl=current_app.config.get("ASSIGNMENT_CACHE_TTL", 3600),
+                negative_ttl=current_app.config.get("ASSIGNMENT_CACHE_NEGATIVE_TTL", 2),
+            )
+        except Exception as e:
+            logger.warning(f"Could not cache assignment lookup for {tenant_id}/{customer_id}: {e}")
+
+    if payload is None:
         return jsonify({"customer_id": customer_id, "tenant_id": tenant_id, "assigned": False}), HTTPStatus.OK
 
-    payload = assignment.to_dict()
     payload["assigned"] = True
     return jsonify(payload), HTTPStatus.OK
@@ -1,33 +1,50 @@
+import logging
+from concurrent import futures
+from datetime import datetime
 from flask import Blueprint, request, jsonify, current_app
 from http import HTTPStatus
 from sqlalchemy import select
 from ..extensions import db, kafka_producer
 from ..models import Customer, CustomerStatus
+from ..repositories import CustomerRepository
+from ..services.waiting_queue import MAX_PRIORITY
+from ..utils.codec import ROUTING_REQUEST, encode
+from ..utils.partitioning import partition_for
+from ..utils.tracing import Trace
+from .pagination import page_args, stream_page
 
 bp = Blueprint("customers", __name__)
+logger = logging.getLogger("customers_api")
+
+# Length of the customers table's id and skill columns
+MAX_ID_LENGTH = 64
 
 
 @bp.get("")
 def list_customers():
-    # Filters: tenant_id, status, skill
+    # Filters: tenant_id, status, skill; keyset pagination: limit, after (id of the last customer seen)
     tenant_id = request.args.get("tenant_id")
     status = request.args.get("status")
     skill = request.args.get("skill")
 
-    stmt = select(Customer)
-    if tenant_id:
-        stmt = stmt.where(Customer.tenant_id == tenant_id)
     if status:
         try:
-            st = CustomerStatus(status)
-            stmt = stmt.where(Customer.status == st)
+            CustomerStatus(status)
         except ValueError:
             return jsonify({"error": "invalid status"}), HTTPStatus.BAD_REQUEST
-    if skill:
-        stmt = stmt.where(Customer.requested_skill.ilike(f"%{skill}%"))
+    limit, after, error = page_args()
+    if error:
+        return jsonify({"error": error}), HTTPStatus.BAD_REQUEST
 
-    customers = db.session.execute(stmt).scalars().all()
-    return jsonify([c.to_dict() for c in customers]), HTTPStatus.OK
+    customers = CustomerRepository().stream_all(
+        tenant_id=tenant_id,
+        status=status,
+        skill=skill,
+        after=after,
+        limit=limit,
+        chunk_size=current_app.config.get("API_STREAM_CHUNK_SIZE", 500),
+    )
+    return stream_page(customers, limit)
 
 
 @bp.post("/route")
@@ -42,54 +59,205 @@ def enqueue_route_request():
     requested_skill = data.get("requested_skill")
     priority = int(data.get("priority") or 0)
     correlation_id = data.get("correlation_id")
+    now = datetime.utcnow()
+
+    # Upsert customer row (Queued), unless customer_writer_worker persists it from the topic
+    if not current_app.config.get("CUSTOMER_WRITE_BEHIND"):
+        existing: Customer | None = db.session.execute(
+            select(Customer).where(Customer.customer_id == customer_id, Customer.tenant_id == tenant_id)
+        ).scalars().first()
+
+        if existing is None:
+            cust = Customer(
+                customer_id=customer_id,
+                tenant_id=tenant_id,
+                requested_skill=requested_skill,
+                priority=priority,
+                status=CustomerStatus.QUEUED,
+            )
+            db.session.add(cust)
+        else:
+            existing.requested_skill = requested_skill or existing.requested_skill
+            existing.priority = priority
+            existing.status = CustomerStatus.QUEUED
+        db.session.commit()
+
+    # Produce routing request keyed by customer_id
+    topic = current_app.config["TOPIC_ROUTING_REQUESTS"]
+    value = _routing_value(customer_id, tenant_id, requested_skill, priority, correlation_id, now)
+    # Trace context rides in the headers through the router into the assignment event
+    trace = Trace.start(correlation_id)
 
-    # Upsert customer row (Queued)
-    existing: Customer | None = db.session.execute(
-        select(Customer).where(Customer.customer_id == customer_id, Customer.tenant_id == tenant_id)
-    ).scalars().first()
-
-    if existing is None:
-        cust = Customer(
-            customer_id=customer_id,
-            tenant_id=tenant_id,
-            requested_skill=requested_skill,
-            priority=priority,
-            status=CustomerStatus.QUEUED,
+    try:
+        payload, headers = encode(ROUTING_REQUEST, value, current_app.config.get("KAFKA_CODEC", "json"))
+        future = kafka_producer.send(
+            topic, payload, key=customer_id.encode("utf-8"), headers=headers + trace.headers(),
+            partition=partition_for(tenant_id, current_app.config),
         )
-        db.session.add(cust)
+        future.add_done_callback(lambda f: _log_delivery_failure(f, customer_id))
+    except Exception as e:
+        # Do not fail the API if Kafka is temporarily unavailable; caller can retry
+        return jsonify({"status": "enqueued_failed", "error": str(e)}), HTTPStatus.ACCEPTED
+
+    return jsonify({
+        "status": "enqueued",
+        "topic": topic,
+        "customer_id": customer_id,
+        "trace_id": trace.trace_id,
+    }), HTTPStatus.ACCEPTED
+
+
+@bp.post("/route/batch")
+def enqueue_route_batch():
+    # Body: [ { customer_id, tenant_id, requested_skill?, priority?, correlation_id? }, ... ]
+    data = request.get_json(silent=True)
+    if not isinstance(data, list) or not data:
+        return jsonify({"error": "body must be a non-empty array of routing requests"}), HTTPStatus.BAD_REQUEST
+    max_items = current_app.config.get("ROUTE_BATCH_MAX_ITEMS", 1000)
+    if len(data) > max_items:
+        return jsonify({"error": f"at most {max_items} routing requests per batch"}), HTTPStatus.BAD_REQUEST
+
+    # Validate every item independently so one bad entry only fails itself
+    results = [None] * len(data)
+    now = datetime.utcnow()
+    accepted, seen = [], set()
+    for i, item in enumerate(data):
+        error = _validate_route_item(item, seen)
+        if error:
+            customer_id = item.get("customer_id") if isinstance(item, dict) else None
+            results[i] = {"index": i, "customer_id": customer_id, "status": "rejected", "error": error}
+            continue
+        seen.add(item["customer_id"])
+        accepted.append((i, _routing_value(
+            item["customer_id"],
+            item["tenant_id"],
+            item.get("requested_skill"),
+            int(item.get("priority") or 0),
+            item.get("correlation_id"),
+            now,
+        )))
+
+    if current_app.config.get("CUSTOMER_WRITE_BEHIND"):
+        # customer_writer_worker persists the rows (and enforces tenant ownership) from the topic
+        written, skipped = {value["customer_id"] for _, value in accepted}, {}
     else:
-        existing.requested_skill = requested_skill or existing.requested_skill
-        existing.priority = priority
-        existing.status = CustomerStatus.QUEUED
-    db.session.commit()
+        # One set-based upsert for every accepted customer row (Queued); like the single-route endpoint, the
+        # request overwrites the stored row whatever its updated_at
+        repo = CustomerRepository()
+        written = repo.bulk_upsert([_customer_row(value, now) for _, value in accepted], newer_wins=False)
+        db.session.commit()
+        skipped = repo.tenants_of([value["customer_id"] for _, value in accepted
+                                   if value["customer_id"] not in written])
 
-    # Produce routing request keyed by customer_id
+    # Produce every routing request, then wait for all their deliveries at once
     topic = current_app.config["TOPIC_ROUTING_REQUESTS"]
-    value = {
+    codec = current_app.config.get("KAFKA_CODEC", "json")
+    to_confirm = []
+    for i, value in accepted:
+        customer_id = value["customer_id"]
+        if customer_id not in written:
+            if skipped.get(customer_id, value["tenant_id"]) != value["tenant_id"]:
+                error = "customer_id belongs to another tenant"
+            else:
+                error = "customer was not written: a newer update is stored"
+            results[i] = {"index": i, "customer_id": customer_id, "status": "rejected", "error": error}
+            continue
+        trace = Trace.start(value["correlation_id"])
+        try:
+            payload, headers = encode(ROUTING_REQUEST, value, codec)
+            future = kafka_producer.send(
+                topic, payload, key=customer_id.encode("utf-8"), headers=headers + trace.headers(),
+                partition=partition_for(value["tenant_id"], current_app.config),
+            )
+            to_confirm.append((i, customer_id, trace.trace_id, future))
+        except Exception as e:
+            results[i] = {"index": i, "customer_id": customer_id, "status": "enqueued_failed", "error": str(e)}
+    futures.wait([f for *_, f in to_confirm], timeout=current_app.config.get("ROUTE_BATCH_FLUSH_TIMEOUT", 5.0))
+
+    for i, customer_id, trace_id, future in to_confirm:
+        if not future.done():
+            results[i] = {"index": i, "customer_id": customer_id, "status": "enqueued_failed",
+                          "error": "delivery not confirmed before timeout"}
+        elif future.exception() is not None:
+            results[i] = {"index": i, "customer_id": customer_id, "status": "enqueued_failed",
+                          "error": str(future.exception())}
+        else:
+            results[i] = {"index": i, "customer_id": customer_id, "status": "enqueued", "trace_id": trace_id}
+
+    enqueued = sum(1 for r in results if r["status"] == "enqueued")
+    return jsonify({
+        "topic": topic,
+        "enqueued": enqueued,
+        "failed": len(results) - enqueued,
+        "results": results,
+    }), HTTPStatus.ACCEPTED
+
+
+@bp.post("/<customer_id>/complete")
+def complete_customer(customer_id: str):
+    # Body: { tenant_id }; the retention worker later moves the customer and its assignment to the history
+    tenant_id = (request.get_json(silent=True) or {}).get("tenant_id")
+    if not tenant_id:
+        return jsonify({"error": "tenant_id is required"}), HTTPStatus.BAD_REQUEST
+
+    customer = CustomerRepository().update_status(customer_id, tenant_id, CustomerStatus.COMPLETED)
+    if customer is None:
+        return jsonify({"error": "customer not found"}), HTTPStatus.NOT_FOUND
+    return jsonify(customer.to_dict()), HTTPStatus.OK
+
+
+def _log_delivery_failure(future, customer_id):
+    # Runs on the producer's poll thread once the broker answers
+    if future.exception() is not None:
+        logger.error(f"Routing request for customer {customer_id} was not delivered: {future.exception()}")
+
+
+def _validate_route_item(item, seen: set):
+    """Error text for a routing request the set-based upsert or the codec would fail on, else None."""
+    if not isinstance(item, dict):
+        return "routing request must be an object"
+    customer_id, tenant_id = item.get("customer_id"), item.get("tenant_id")
+    if not customer_id or not tenant_id:
+        return "customer_id and tenant_id are required"
+    if not isinstance(customer_id, str) or not isinstance(tenant_id, str):
+        return "customer_id and tenant_id must be strings"
+    for field in ("customer_id", "tenant_id", "requested_skill"):
+        value = item.get(field)
+        if value is not None and not isinstance(value, str):
+            return f"{field} must be a string"
+        if value is not None and len(value) > MAX_ID_LENGTH:
+            return f"{field} must be at most {MAX_ID_LENGTH} characters"
+    if item.get("correlation_id") is not None and not isinstance(item["correlation_id"], str):
+        return "correlation_id must be a string"
+    if customer_id in seen:
+        return "duplicate customer_id in batch"
+    try:
+        priority = int(item.get("priority") or 0)
+    except (TypeError, ValueError, OverflowError):
+        return "priority must be an integer"
+    if not 0 <= priority <= MAX_PRIORITY:
+        return f"priority must be between 0 and {MAX_PRIORITY}"
+    return None
+
+
+def _routing_value(customer_id, tenant_id, requested_skill, priority, correlation_id, enqueued_at) -> dict:
+    return {
         "customer_id": customer_id,
         "tenant_id": tenant_id,
         "requested_skill": requested_skill,
         "priority": priority,
         "correlation_id": correlation_id,
+        "enqueued_at": enqueued_at.isoformat(),
     }
 
-    def _delivery(err, msg):
-        # Optional: log or metric on delivery outcome
-        pass
 
-    try:
-        producer = kafka_producer.producer
-        # Simple JSON serialization; replace with schema if needed
-        import json
-        producer.produce(
-            topic=topic,
-            key=customer_id.encode("utf-8"),
-            value=json.dumps(value).encode("utf-8"),
-            on_delivery=_delivery,
-        )
-        producer.poll(0)  # trigger delivery callbacks
-    except Exception as e:
-        # Do not fail the API if Kafka is temporarily unavailable; caller can retry
-        return jsonify({"status": "enqueued_failed", "error": str(e)}), HTTPStatus.ACCEPTED
-
-    return jsonify({"status": "enqueued", "topic": topic, "customer_id": customer_id}), HTTPStatus.ACCEPTED
+def _customer_row(value: dict, updated_at) -> dict:
+    """CustomerRepository.bulk_upsert row (Queued) for a routing request value."""
+    return {
+        "customer_id": value["customer_id"],
+        "tenant_id": value["tenant_id"],
+        "requested_skill": value["requested_skill"],
+        "priority": value["priority"],
+        "status": CustomerStatus.QUEUED,
+        "updated_at": updated_at,
+    }
@@ -0,0 +1,40 @@
+import json
+from flask import Response, current_app, request, stream_with_context
+
+
+def page_args():
+    """
+    Parse the `limit` and `after` keyset cursor args of a list request.
+
+    Returns (limit, after, error); `limit` defaults to API_PAGE_DEFAULT_LIMIT and is capped at API_PAGE_MAX_LIMIT.
+    """
+    default_limit = current_app.config.get("API_PAGE_DEFAULT_LIMIT", 500)
+    max_limit = current_app.config.get("API_PAGE_MAX_LIMIT", 5000)
+    try:
+        limit = int(request.args.get("limit", default_limit))
+        after = request.args.get("after")
+        after = int(after) if after is not None else None
+    except ValueError:
+        return None, None, "limit and after must be integers"
+    if not 1 <= limit <= max_limit:
+        return None, None, f"limit must be between 1 and {max_limit}"
+    if after is not None and after < 0:
+        return None, None, "after must not be negative"
+    return limit, after, None
+
+
+def stream_page(rows, limit: int) -> Response:
+    """
+    Stream `rows` as {"items": [...], "next_after": id} without materializing the page.
+
+    `next_after` is the id to pass as `after` for the next page, or null once the last page is reached.
+    """
+    def generate():
+        yield '{"items": ['
+        count, last_id = 0, None
+        for row in rows:
+            yield ("," if count else "") + json.dumps(row.to_dict())
+            count, last_id = count + 1, row.id
+        yield f'], "next_after": {json.dumps(last_id if count == limit else None)}}}'
+
+    return Response(stream_with_context(generate()), mimetype="application/json")
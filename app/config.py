@@ -5,10 +5,99 @@ class BaseConfig:
     SQLALCHEMY_DATABASE_URI = os.getenv("DATABASE_URL", "postgresql+psycopg://app@localhost:5432/contactcenterdb")
     SQLALCHEMY_TRACK_MODIFICATIONS = False
     REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379/0")
+    # Shared Redis pool: callers block up to REDIS_POOL_TIMEOUT seconds for a free connection when all
+    # REDIS_MAX_CONNECTIONS are in use; idle connections are PINGed after REDIS_HEALTH_CHECK_INTERVAL seconds
+    REDIS_MAX_CONNECTIONS = int(os.getenv("REDIS_MAX_CONNECTIONS", "50"))
+    REDIS_POOL_TIMEOUT = float(os.getenv("REDIS_POOL_TIMEOUT", "5.0"))
+    REDIS_SOCKET_TIMEOUT = float(os.getenv("REDIS_SOCKET_TIMEOUT", "2.0"))
+    REDIS_SOCKET_CONNECT_TIMEOUT = float(os.getenv("REDIS_SOCKET_CONNECT_TIMEOUT", "2.0"))
+    REDIS_HEALTH_CHECK_INTERVAL = int(os.getenv("REDIS_HEALTH_CHECK_INTERVAL", "30"))
     KAFKA_BOOTSTRAP_SERVERS = os.getenv("KAFKA_BOOTSTRAP_SERVERS", "localhost:9092")
     KAFKA_CLIENT_ID = os.getenv("KAFKA_CLIENT_ID", "contact-center-api")
+    # Shared producer: "latency" or "throughput" batching profile; send() blocks up to KAFKA_PRODUCER_BLOCK_TIMEOUT
+    # seconds once KAFKA_PRODUCER_MAX_IN_FLIGHT messages await delivery
+    KAFKA_PRODUCER_PROFILE = os.getenv("KAFKA_PRODUCER_PROFILE", "latency")
+    KAFKA_PRODUCER_MAX_IN_FLIGHT = int(os.getenv("KAFKA_PRODUCER_MAX_IN_FLIGHT", "10000"))
+    KAFKA_PRODUCER_BLOCK_TIMEOUT = float(os.getenv("KAFKA_PRODUCER_BLOCK_TIMEOUT", "5.0"))
+    # Producer payload codec ("json" or the compact "bin1"); consumers decode whatever the codec header says,
+    # so switch producers only after every consumer understands the new codec
+    KAFKA_CODEC = os.getenv("KAFKA_CODEC", "json")
     TOPIC_ROUTING_REQUESTS = os.getenv("TOPIC_ROUTING_REQUESTS", "customer.routing.requests")
     TOPIC_ASSIGNMENTS = os.getenv("TOPIC_ASSIGNMENTS", "customer.assignments")
+    TOPIC_AGENT_STATUS = os.getenv("TOPIC_AGENT_STATUS", "agent.status")
+    TOPIC_AGENT_HEARTBEAT = os.getenv("TOPIC_AGENT_HEARTBEAT", "agent.heartbeat")
+    # Keyset-paginated list endpoints: page size default/cap and rows fetched per server-side cursor round trip
+    API_PAGE_DEFAULT_LIMIT = int(os.getenv("API_PAGE_DEFAULT_LIMIT", "500"))
+    API_PAGE_MAX_LIMIT = int(os.getenv("API_PAGE_MAX_LIMIT", "5000"))
+    API_STREAM_CHUNK_SIZE = int(os.getenv("API_STREAM_CHUNK_SIZE", "500"))
+    # GET /api/assignments/<customer_id> read-through cache; unassigned lookups are cached only briefly
+    ASSIGNMENT_CACHE_TTL = int(os.getenv("ASSIGNMENT_CACHE_TTL", "3600"))
+    ASSIGNMENT_CACHE_NEGATIVE_TTL = int(os.getenv("ASSIGNMENT_CACHE_NEGATIVE_TTL", "2"))
+    # POST /api/customers/route/batch limits
+    ROUTE_BATCH_MAX_ITEMS = int(os.getenv("ROUTE_BATCH_MAX_ITEMS", "1000"))
+    ROUTE_BATCH_FLUSH_TIMEOUT = float(os.getenv("ROUTE_BATCH_FLUSH_TIMEOUT", "5.0"))
+    # Write-behind: the routing endpoints only validate and produce; customer_writer_worker persists the
+    # customer rows from the routing topic in batches
+    CUSTOMER_WRITE_BEHIND = os.getenv("CUSTOMER_WRITE_BEHIND", "false").lower() in ("1", "true", "yes")
+    CUSTOMER_WRITER_BATCH_SIZE = int(os.getenv("CUSTOMER_WRITER_BATCH_SIZE", "1000"))
+    CUSTOMER_WRITER_MAX_WAIT = float(os.getenv("CUSTOMER_WRITER_MAX_WAIT", "0.2"))
+    # Transactional outbox: assignment events are committed with the assignments and produced by
+    # workers/outbox_relay.py in batches of OUTBOX_RELAY_BATCH_SIZE, polling every OUTBOX_RELAY_POLL_INTERVAL
+    # seconds while idle and waiting up to OUTBOX_RELAY_DELIVERY_TIMEOUT seconds for a batch's deliveries
+    ASSIGNMENT_OUTBOX = os.getenv("ASSIGNMENT_OUTBOX", "false").lower() in ("1", "true", "yes")
+    OUTBOX_RELAY_BATCH_SIZE = int(os.getenv("OUTBOX_RELAY_BATCH_SIZE", "1000"))
+    OUTBOX_RELAY_POLL_INTERVAL = float(os.getenv("OUTBOX_RELAY_POLL_INTERVAL", "0.2"))
+    OUTBOX_RELAY_DELIVERY_TIMEOUT = float(os.getenv("OUTBOX_RELAY_DELIVERY_TIMEOUT", "30.0"))
+    # Agent status worker: events per batch (only the latest per agent is applied) and max wait in seconds
+    AGENT_STATUS_BATCH_SIZE = int(os.getenv("AGENT_STATUS_BATCH_SIZE", "500"))
+    AGENT_STATUS_BATCH_MAX_WAIT = float(os.getenv("AGENT_STATUS_BATCH_MAX_WAIT", "0.1"))
+    # Redis agent mirror: hash TTL in seconds; workers/agent_cache_reconciler.py rewrites drifted agents and
+    # refreshes TTLs every AGENT_CACHE_RECONCILE_INTERVAL seconds, and a tenant reconciled within the last
+    # AGENT_CACHE_WARM_TTL seconds counts as warm (an empty index then means nobody is available)
+    AGENT_HASH_TTL = int(os.getenv("AGENT_HASH_TTL", "300"))
+    AGENT_CACHE_RECONCILE_INTERVAL = float(os.getenv("AGENT_CACHE_RECONCILE_INTERVAL", "60"))
+    AGENT_CACHE_WARM_TTL = int(os.getenv("AGENT_CACHE_WARM_TTL", "120"))
+    # Agent heartbeats only refresh a Redis last-seen set; workers/presence_sweeper.py sets agents silent for
+    # PRESENCE_TIMEOUT seconds offline every PRESENCE_SWEEP_INTERVAL seconds. The heartbeat worker consumes
+    # HEARTBEAT_BATCH_SIZE events per batch, waiting up to HEARTBEAT_BATCH_MAX_WAIT seconds
+    PRESENCE_TIMEOUT = float(os.getenv("PRESENCE_TIMEOUT", "30"))
+    PRESENCE_SWEEP_INTERVAL = float(os.getenv("PRESENCE_SWEEP_INTERVAL", "5"))
+    HEARTBEAT_BATCH_SIZE = int(os.getenv("HEARTBEAT_BATCH_SIZE", "5000"))
+    HEARTBEAT_BATCH_MAX_WAIT = float(os.getenv("HEARTBEAT_BATCH_MAX_WAIT", "0.5"))
+    # workers/retention_worker.py runs a pass every RETENTION_INTERVAL seconds in chunks of RETENTION_CHUNK_SIZE
+    # rows, sleeping RETENTION_CHUNK_PAUSE seconds between chunks; on Postgres a chunk waits at most
+    # RETENTION_LOCK_TIMEOUT seconds for a lock. Customers completed COMPLETED_ARCHIVE_AFTER seconds ago move
+    # to assignment_history, kept ASSIGNMENT_HISTORY_RETENTION_DAYS days; sent outbox events are deleted after
+    # OUTBOX_SENT_RETENTION seconds (0 keeps either forever)
+    RETENTION_INTERVAL = float(os.getenv("RETENTION_INTERVAL", "60"))
+    RETENTION_CHUNK_SIZE = int(os.getenv("RETENTION_CHUNK_SIZE", "1000"))
+    RETENTION_CHUNK_PAUSE = float(os.getenv("RETENTION_CHUNK_PAUSE", "0.05"))
+    RETENTION_LOCK_TIMEOUT = float(os.getenv("RETENTION_LOCK_TIMEOUT", "2"))
+    COMPLETED_ARCHIVE_AFTER = int(os.getenv("COMPLETED_ARCHIVE_AFTER", "300"))
+    ASSIGNMENT_HISTORY_RETENTION_DAYS = int(os.getenv("ASSIGNMENT_HISTORY_RETENTION_DAYS", "90"))
+    OUTBOX_SENT_RETENTION = int(os.getenv("OUTBOX_SENT_RETENTION", "86400"))
+    # Seconds a parked customer's routing trace is kept in Redis waiting for an agent to be dispatched
+    TRACE_PARKED_TTL = int(os.getenv("TRACE_PARKED_TTL", "86400"))
+    # Workers serve Prometheus metrics on METRICS_PORT + their supervisor slot index (0 disables);
+    # the API always exposes /metrics
+    METRICS_PORT = int(os.getenv("METRICS_PORT", "0"))
+    # Router worker: "single" handles one message per poll, "batch" consumes and routes in bulk,
+    # "async" routes many messages concurrently while keeping per-customer order, "sharded" routes the
+    # tenants of its partitions from local state without Redis locks (needs ROUTING_SHARD_BY_TENANT)
+    ROUTER_MODE = os.getenv("ROUTER_MODE", "single")
+    ROUTER_BATCH_SIZE = int(os.getenv("ROUTER_BATCH_SIZE", "500"))
+    ROUTER_BATCH_MAX_WAIT = float(os.getenv("ROUTER_BATCH_MAX_WAIT", "0.05"))
+    # Concurrent routing calls in async mode; keep within the SQLAlchemy and Redis pool sizes
+    ROUTER_ASYNC_CONCURRENCY = int(os.getenv("ROUTER_ASYNC_CONCURRENCY", "16"))
+    # Rank agents from an in-process view kept current via the Redis change channel
+    ROUTER_AGENT_VIEW = os.getenv("ROUTER_AGENT_VIEW", "false").lower() in ("1", "true", "yes")
+    # Tenant sharding: producers pin each tenant to partition crc32(tenant_id) % ROUTING_PARTITIONS of the
+    # routing and agent status topics (both must have exactly that many partitions), and ROUTER_MODE=sharded
+    # routers own their partitions' tenants in memory. On taking over a partition a router replays its
+    # agent status events from the last ROUTER_STATUS_REPLAY_SECONDS seconds
+    ROUTING_SHARD_BY_TENANT = os.getenv("ROUTING_SHARD_BY_TENANT", "false").lower() in ("1", "true", "yes")
+    ROUTING_PARTITIONS = int(os.getenv("ROUTING_PARTITIONS", "12"))
+    ROUTER_STATUS_REPLAY_SECONDS = int(os.getenv("ROUTER_STATUS_REPLAY_SECONDS", "300"))
 
 
 class DevelopmentConfig(BaseConfig):
@@ -1,20 +1,67 @@
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
 from flask_sqlalchemy import SQLAlchemy
 from flask_migrate import Migrate
-from redis import Redis
-from confluent_kafka import Producer
+from redis import BlockingConnectionPool, Redis
+from confluent_kafka import KafkaException, Producer
+from .utils import metrics
 
 db = SQLAlchemy()
 migrate = Migrate()
 
 
+class CountingConnectionPool(BlockingConnectionPool):
+    """
+    Bounded connection pool that blocks for a free connection (up to `timeout`) instead of opening
+    unbounded connections, and counts checkouts and waits.
+
+    Every command and every pipeline execute checks out exactly one connection, so checkouts are the
+    number of Redis round trips.
+    """
+
+    def __init__(self, *args, **kwargs):
+        self._stats_lock = threading.Lock()
+        self.round_trips = 0
+        self.waits = 0
+        self.wait_seconds = 0.0
+        super().__init__(*args, **kwargs)
+
+    def get_connection(self, *args, **kwargs):
+        waited = self.pool.empty()
+        start = time.perf_counter()
+        connection = super().get_connection(*args, **kwargs)
+        with self._stats_lock:
+            self.round_trips += 1
+            if waited:
+                self.waits += 1
+                self.wait_seconds += time.perf_counter() - start
+        return connection
+
+
 class RedisClient:
+    """The process-wide pooled Redis client; everything that talks to Redis shares its pool."""
+
     def __init__(self):
         self._client = None
 
     def init_app(self, app):
-        url = app.config["REDIS_URL"]
         # Lazy connect; allow app to start even if Redis is not yet up
-        self._client = Redis.from_url(url, decode_responses=True)
+        pool = CountingConnectionPool.from_url(
+            app.config["REDIS_URL"],
+            decode_responses=True,
+            max_connections=app.config.get("REDIS_MAX_CONNECTIONS", 50),
+            timeout=app.config.get("REDIS_POOL_TIMEOUT", 5.0),
+            socket_timeout=app.config.get("REDIS_SOCKET_TIMEOUT", 2.0),
+            socket_connect_timeout=app.config.get("REDIS_SOCKET_CONNECT_TIMEOUT", 2.0),
+            health_check_interval=app.config.get("REDIS_HEALTH_CHECK_INTERVAL", 30),
+        )
+        self._client = Redis(connection_pool=pool)
+
+    @property
+    def initialized(self) -> bool:
+        return self._client is not None
 
     @property
     def client(self):
@@ -22,26 +69,104 @@ class RedisClient:
             raise RuntimeError("Redis not initialized")
         return self._client
 
+    def pipeline(self, transaction: bool = False):
+        """Pipeline on the shared pool; queue commands and `execute()` them in one round trip."""
+        return self.client.pipeline(transaction=transaction)
+
+    def hgetall_many(self, keys: list) -> list:
+        """Fetch many hashes in one round trip, in key order ({} for missing keys)."""
+        pipe = self.pipeline()
+        for key in keys:
+            pipe.hgetall(key)
+        return pipe.execute()
+
+    def hset_many(self, mappings: dict, ttl: int = None):
+        """Write many hashes ({key: mapping}), each with an optional expiry, in one round trip."""
+        pipe = self.pipeline()
+        for key, mapping in mappings.items():
+            pipe.hset(key, mapping=mapping)
+            if ttl:
+                pipe.expire(key, ttl)
+        pipe.execute()
+
+    def stats(self) -> dict:
+        """Round trips and pool waits so far, plus pool occupancy; counters are None for an uncounted pool."""
+        pool = self.client.connection_pool
+        return {
+            "round_trips": getattr(pool, "round_trips", None),
+            "pool_waits": getattr(pool, "waits", None),
+            "pool_wait_seconds": getattr(pool, "wait_seconds", None),
+            "max_connections": getattr(pool, "max_connections", None),
+        }
+
 
 redis_client = RedisClient()
 
 
+PRODUCE_DELIVERY = metrics.histogram(
+    "kafka_produce_delivery_seconds", "Time from send() to the broker's delivery report", ("outcome",),
+)
+
+
+# librdkafka batching presets, selected with KAFKA_PRODUCER_PROFILE
+PRODUCER_PROFILES = {
+    # Ship each message almost immediately: lowest enqueue-to-delivery latency
+    "latency": {
+        "linger.ms": 1,
+        "batch.num.messages": 1000,
+        "compression.type": "none",
+    },
+    # Let batches fill and compress them: fewer, larger requests and fewer broker bytes
+    "throughput": {
+        "linger.ms": 50,
+        "batch.num.messages": 10000,
+        "batch.size": 1048576,
+        "compression.type": "lz4",
+    },
+}
+
+
 class KafkaProducerWrapper:
+    """
+    The process-wide Kafka producer service: one librdkafka client whose delivery reports are served
+    by a background poll thread, so request threads never poll or flush.
+
+    `send()` returns a Future per message, resolved with the delivered message or failed with a
+    KafkaException. Once KAFKA_PRODUCER_MAX_IN_FLIGHT messages await delivery, `send()` blocks for up
+    to KAFKA_PRODUCER_BLOCK_TIMEOUT seconds and then raises BufferError.
+    """
+
     def __init__(self):
         self._producer = None
+        self._max_in_flight = 10000
+        self._block_timeout = 5.0
+        self._slots = threading.BoundedSemaphore(self._max_in_flight)
+        self._thread = None
+        self._stopping = threading.Event()
+        self._lock = threading.Lock()
+        self._latencies = deque(maxlen=1000)
+        self.in_flight = 0
+        self.delivered = 0
+        self.failed = 0
 
     def init_app(self, app):
+        profile = app.config.get("KAFKA_PRODUCER_PROFILE", "latency")
         conf = {
             "bootstrap.servers": app.config["KAFKA_BOOTSTRAP_SERVERS"],
             "client.id": app.config["KAFKA_CLIENT_ID"],
             # Idempotence for safer delivery on retries
             "enable.idempotence": True,
             "acks": "all",
-            # Reasonable defaults; tune in production
-            "linger.ms": 5,
-            "batch.num.messages": 1000,
+            **PRODUCER_PROFILES[profile],
         }
         self._producer = Producer(conf)
+        self._max_in_flight = app.config.get("KAFKA_PRODUCER_MAX_IN_FLIGHT", 10000)
+        self._block_timeout = app.config.get("KAFKA_PRODUCER_BLOCK_TIMEOUT", 5.0)
+        self._slots = threading.BoundedSemaphore(self._max_in_flight)
+
+    @property
+    def initialized(self) -> bool:
+        return self._producer is not None
 
     @property
     def producer(self):
@@ -49,5 +174,94 @@ class KafkaProducerWrapper:
             raise RuntimeError("Kafka producer not initialized")
         return self._producer
 
+    def send(self, topic: str, value: bytes, key: bytes = None, headers=None, partition: int = None) -> Future:
+        """
+        Queue a message for delivery; the returned Future resolves once the broker acknowledges it.
+
+        `partition` pins the partition (e.g. tenant sharding); by default the key picks it.
+        """
+        producer = self.producer
+        self._ensure_polling()
+        if not self._slots.acquire(timeout=self._block_timeout):
+            raise BufferError(f"{self._max_in_flight} messages already awaiting delivery")
+        future = Future()
+        start = time.monotonic()
+        with self._lock:
+            self.in_flight += 1
+        try:
+            producer.produce(
+                topic,
+                value=value,
+                key=key,
+                headers=headers,
+                on_delivery=lambda err, msg: self._on_delivery(future, start, err, msg),
+                **({"partition": partition} if partition is not None else {}),
+            )
+        except BaseException:
+            with self._lock:
+                self.in_flight -= 1
+            self._slots.release()
+            raise
+        return future
+
+    def flush(self, timeout: float = 10.0) -> int:
+        """Wait for every queued message to be delivered; returns how many are still outstanding."""
+        if self._producer is None:
+            return 0
+        return self._producer.flush(timeout)
+
+    def close(self, timeout: float = 10.0):
+        """Deliver what is queued and stop the poll thread; call on worker shutdown."""
+        remaining = self.flush(timeout)
+        self._stopping.set()
+        if self._thread is not None:
+            self._thread.join(timeout=1.0)
+            self._thread = None
+        self._stopping.clear()
+        return remaining
+
+    def stats(self) -> dict:
+        """In-flight and queued messages, delivery outcomes and delivery latency (ms) over recent messages."""
+        with self._lock:
+            latencies = sorted(self._latencies)
+            stats = {"in_flight": self.in_flight, "delivered": self.delivered, "failed": self.failed}
+        stats["queue_depth"] = len(self._producer) if self._producer is not None else 0
+        stats["latency_p50_ms"] = latencies[len(latencies) // 2] * 1000 if latencies else None
+        stats["latency_p99_ms"] = latencies[int(len(latencies) * 0.99)] * 1000 if latencies else None
+        return stats
+
+    def _on_delivery(self, future, start, err, msg):
+        # Runs on the poll thread (or inside flush)
+        self._slots.release()
+        with self._lock:
+            self.in_flight -= 1
+            latency = time.monotonic() - start
+            self._latencies.append(latency)
+            if err is None:
+                self.delivered += 1
+            else:
+                self.failed += 1
+        PRODUCE_DELIVERY.labels("delivered" if err is None else "failed").observe(latency)
+        if err is None:
+            future.set_result(msg)
+        else:
+            future.set_exception(KafkaException(err))
+
+    def _ensure_polling(self):
+        # Started lazily so the thread is created in the process that sends (e.g. after a fork)
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._poll_loop, name="kafka-producer-poll", daemon=True)
+                self._thread.start()
+
+    def _poll_loop(self):
+        while not self._stopping.is_set():
+            self._producer.poll(0.1)
+
 
 kafka_producer = KafkaProducerWrapper()
+metrics.gauge("kafka_producer_in_flight", "Messages sent and still awaiting a delivery report").set_function(
+    lambda: kafka_producer.in_flight
+)
@@ -1,6 +1,9 @@
 from .agent import Agent, AgentStatus
 from .customer import Customer, CustomerStatus
 from .assignment import Assignment
+from .assignment_history import AssignmentHistory
+from .skill import Skill, agent_skills
+from .outbox import OutboxEvent
 
 __all__ = [
     "Agent",
@@ -8,4 +11,8 @@ __all__ = [
     "Customer",
     "CustomerStatus",
     "Assignment",
+    "AssignmentHistory",
+    "Skill",
+    "agent_skills",
+    "OutboxEvent",
 ]
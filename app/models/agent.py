@@ -1,7 +1,7 @@
 from enum import Enum
 from datetime import datetime
-from sqlalchemy import String, Integer, DateTime, Enum as SAEnum
-from sqlalchemy.orm import Mapped, mapped_column
+from sqlalchemy import String, Integer, DateTime, Index, Enum as SAEnum, text
+from sqlalchemy.orm import Mapped, mapped_column, relationship
 from ..extensions import db
 
 
@@ -13,15 +13,26 @@ class AgentStatus(str, Enum):
 
 class Agent(db.Model):
     __tablename__ = "agents"
+    __table_args__ = (
+        Index("ix_agents_tenant_status", "tenant_id", "status"),
+        # Least-loaded pick among a tenant's available agents (the DB fallback of claims) reads this in order
+        Index(
+            "ix_agents_available", "tenant_id", "current_load", "id",
+            postgresql_where=text("status = 'AVAILABLE'"), sqlite_where=text("status = 'AVAILABLE'"),
+        ),
+    )
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
     agent_id: Mapped[str] = mapped_column(String(64), unique=True, index=True, nullable=False)
-    tenant_id: Mapped[str] = mapped_column(String(64), index=True, nullable=False)
+    tenant_id: Mapped[str] = mapped_column(String(64), nullable=False)
     skills: Mapped[str] = mapped_column(String(256), nullable=True)  # comma-separated or JSON in a text field
     status: Mapped[AgentStatus] = mapped_column(SAEnum(AgentStatus), default=AgentStatus.OFFLINE, nullable=False)
     current_load: Mapped[int] = mapped_column(Integer, default=0, nullable=False)
     updated_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=False)
 
+    # Interned skills backing skill filters; `skills` stays as the denormalized display string
+    skill_set = relationship("Skill", secondary="agent_skills", lazy="select")
+
     def to_dict(self) -> dict:
         return {
             "id": self.id,
@@ -0,0 +1,44 @@
+from datetime import datetime
+from sqlalchemy import String, Integer, DateTime, Index
+from sqlalchemy.orm import Mapped, mapped_column
+from ..extensions import db
+
+
+class AssignmentHistory(db.Model):
+    """
+    Assignments of completed customers, moved out of the hot tables by the retention job.
+
+    On PostgreSQL the table is range-partitioned by month of archived_at (the job creates partitions ahead
+    and drops expired ones whole); elsewhere it is a plain table purged in chunks.
+    """
+
+    __tablename__ = "assignment_history"
+    __table_args__ = (
+        Index("ix_assignment_history_tenant_customer", "tenant_id", "customer_uid"),
+        {"postgresql_partition_by": "RANGE (archived_at)"},
+    )
+
+    # A partitioned table's primary key must include the partition key
+    assignment_id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=False)
+    archived_at: Mapped[datetime] = mapped_column(DateTime, primary_key=True, default=datetime.utcnow)
+
+    customer_uid: Mapped[str] = mapped_column(String(64), nullable=False)
+    agent_uid: Mapped[str] = mapped_column(String(64), nullable=False)
+    tenant_id: Mapped[str] = mapped_column(String(64), nullable=False)
+    requested_skill: Mapped[str] = mapped_column(String(64), nullable=True)
+    priority: Mapped[int] = mapped_column(Integer, default=0, nullable=False)
+    assigned_at: Mapped[datetime] = mapped_column(DateTime, nullable=False)
+    completed_at: Mapped[datetime] = mapped_column(DateTime, nullable=False)
+
+    def to_dict(self) -> dict:
+        return {
+            "assignment_id": self.assignment_id,
+            "customer_uid": self.customer_uid,
+            "agent_uid": self.agent_uid,
+            "tenant_id": self.tenant_id,
+            "requested_skill": self.requested_skill,
+            "priority": self.priority,
+            "assigned_at": self.assigned_at.isoformat() if self.assigned_at else None,
+            "completed_at": self.completed_at.isoformat() if self.completed_at else None,
+            "archived_at": self.archived_at.isoformat() if self.archived_at else None,
+        }
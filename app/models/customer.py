@@ -1,6 +1,6 @@
 from enum import Enum
 from datetime import datetime
-from sqlalchemy import String, Integer, DateTime, Enum as SAEnum
+from sqlalchemy import String, Integer, DateTime, Index, Enum as SAEnum, text
 from sqlalchemy.orm import Mapped, mapped_column
 from ..extensions import db
 
@@ -13,10 +13,18 @@ class CustomerStatus(str, Enum):
 
 class Customer(db.Model):
     __tablename__ = "customers"
+    __table_args__ = (
+        Index("ix_customers_tenant_customer", "tenant_id", "customer_id"),
+        # Completed customers are only kept until the retention job archives them, oldest first
+        Index(
+            "ix_customers_completed", "updated_at",
+            postgresql_where=text("status = 'COMPLETED'"), sqlite_where=text("status = 'COMPLETED'"),
+        ),
+    )
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
     customer_id: Mapped[str] = mapped_column(String(64), unique=True, index=True, nullable=False)
-    tenant_id: Mapped[str] = mapped_column(String(64), index=True, nullable=False)
+    tenant_id: Mapped[str] = mapped_column(String(64), nullable=False)
     requested_skill: Mapped[str] = mapped_column(String(64), nullable=True)
     priority: Mapped[int] = mapped_column(Integer, default=0, nullable=False)
     status: Mapped[CustomerStatus] = mapped_column(SAEnum(CustomerStatus), default=CustomerStatus.QUEUED, nullable=False)
@@ -0,0 +1,45 @@
+from datetime import datetime
+from sqlalchemy import String, Integer, DateTime, LargeBinary, JSON, Index, text
+from sqlalchemy.orm import Mapped, mapped_column
+from ..extensions import db
+
+
+class OutboxEvent(db.Model):
+    """
+    Kafka event written in the same transaction as the state change it announces; the outbox relay
+    produces pending rows in id order and stamps sent_at once the broker has them.
+    """
+
+    __tablename__ = "outbox_events"
+    __table_args__ = (
+        # Only pending rows are ever scanned, so keep the index to them
+        Index(
+            "ix_outbox_events_pending",
+            "id",
+            postgresql_where=text("sent_at IS NULL"),
+            sqlite_where=text("sent_at IS NULL"),
+        ),
+    )
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
+    topic: Mapped[str] = mapped_column(String(255), nullable=False)
+    key: Mapped[str] = mapped_column(String(255), nullable=True)
+    payload: Mapped[bytes] = mapped_column(LargeBinary, nullable=False)
+    # Kafka headers as [[name, value], ...]; our header values are all text
+    headers: Mapped[list] = mapped_column(JSON, nullable=True)
+    created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow, nullable=False)
+    sent_at: Mapped[datetime] = mapped_column(DateTime, nullable=True)
+
+    def kafka_headers(self) -> list:
+        return [(name, value.encode("utf-8")) for name, value in self.headers or ()]
+
+    @staticmethod
+    def row(topic: str, key, payload: bytes, headers, created_at=None) -> dict:
+        """Insert row for an encoded event; `headers` as returned by utils.codec.encode."""
+        return {
+            "topic": topic,
+            "key": key,
+            "payload": payload,
+            "headers": [[name, value.decode("utf-8")] for name, value in headers or ()],
+            "created_at": created_at or datetime.utcnow(),
+        }
@@ -0,0 +1,34 @@
+from sqlalchemy import Column, ForeignKey, Index, Integer, String, Table, UniqueConstraint
+from sqlalchemy.orm import Mapped, mapped_column
+from ..extensions import db
+
+# Normalized agent <-> skill relation; the composite PK serves agent lookups, the index serves skill filters
+agent_skills = Table(
+    "agent_skills",
+    db.metadata,
+    Column("agent_id", ForeignKey("agents.id", ondelete="CASCADE"), primary_key=True),
+    Column("skill_id", ForeignKey("skills.id", ondelete="CASCADE"), primary_key=True),
+    Index("ix_agent_skills_skill_id", "skill_id"),
+)
+
+
+class Skill(db.Model):
+    __tablename__ = "skills"
+    __table_args__ = (
+        UniqueConstraint("tenant_id", "name", name="uq_skills_tenant_name"),
+        UniqueConstraint("tenant_id", "bit", name="uq_skills_tenant_bit"),
+    )
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
+    tenant_id: Mapped[str] = mapped_column(String(64), nullable=False)
+    name: Mapped[str] = mapped_column(String(64), nullable=False)
+    # Dense per-tenant ordinal used as the skill's position in agent skill bitmasks
+    bit: Mapped[int] = mapped_column(Integer, nullable=False)
+
+    def to_dict(self) -> dict:
+        return {
+            "id": self.id,
+            "tenant_id": self.tenant_id,
+            "name": self.name,
+            "bit": self.bit,
+        }
@@ -4,9 +4,16 @@ Repository layer implementing persistence encapsulation for domain models.
 Provides:
 - Common CRUD operations (BaseRepository)
 - Model-specific repositories (AgentRepository, CustomerRepository, AssignmentRepository)
+- Redis read-through cache of assignments (AssignmentCache)
+- Transactional outbox of Kafka events (OutboxRepository)
+- Archival of completed assignments into their history (AssignmentHistoryRepository)
 """
 from .agent_repo import AgentRepository
 from .customer_repo import CustomerRepository
 from .assignment_repo import AssignmentRepository
+from .assignment_cache import AssignmentCache
+from .outbox_repo import OutboxRepository
+from .history_repo import AssignmentHistoryRepository
 
-__all__ = ["AgentRepository", "CustomerRepository", "AssignmentRepository"]
+__all__ = ["AgentRepository", "CustomerRepository", "AssignmentRepository", "AssignmentCache", "OutboxRepository",
+           "AssignmentHistoryRepository"]
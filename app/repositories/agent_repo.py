@@ -1,6 +1,9 @@
-from sqlalchemy import select
+from collections import Counter
+from sqlalchemy import delete, func, insert, select, update
 from ..extensions import db
-from ..models import Agent, AgentStatus
+from ..models import Agent, AgentStatus, Skill, agent_skills
+from .pagination import keyset, stream
+from .upsert import dialect_insert
 
 
 class AgentRepository:
@@ -21,16 +24,128 @@ class AgentRepository:
         )
         return db.session.execute(stmt).scalars().first()
 
-    def list_all(self, tenant_id=None, status=None, skill=None):
+    def list_all(self, tenant_id=None, status=None, skill=None, after=None, limit=None):
+        stmt = keyset(self._filtered(tenant_id, status, skill), Agent, after, limit)
+        return db.session.execute(stmt).scalars().all()
+
+    def stream_all(self, tenant_id=None, status=None, skill=None, after=None, limit=None, chunk_size=500):
+        """Like list_all, but yields agents from a server-side cursor so memory stays bounded."""
+        return stream(keyset(self._filtered(tenant_id, status, skill), Agent, after, limit), chunk_size)
+
+    def _filtered(self, tenant_id=None, status=None, skill=None):
         stmt = select(Agent)
         if tenant_id:
             stmt = stmt.where(Agent.tenant_id == tenant_id)
         if status:
             stmt = stmt.where(Agent.status == AgentStatus(status))
         if skill:
-            stmt = stmt.where(Agent.skills.ilike(f"%{skill}%"))
+            # Exact match through the indexed agent_skills relation rather than a substring scan
+            stmt = (
+                stmt.join(agent_skills, agent_skills.c.agent_id == Agent.id)
+                .join(Skill, Skill.id == agent_skills.c.skill_id)
+                .where(Skill.name == skill)
+            )
+        return stmt
+
+    def get_states(self, agent_ids) -> dict:
+        """agent_id -> (tenant_id, skills, current_load) for the agents that exist, in one query."""
+        rows = db.session.execute(
+            select(Agent.agent_id, Agent.tenant_id, Agent.skills, Agent.current_load).where(Agent.agent_id.in_(agent_ids))
+        )
+        return {row.agent_id: row for row in rows}
+
+    def list_least_loaded(self, tenant_id: str, skill=None, limit: int = 10) -> list:
+        """Up to `limit` available agents of a tenant with the skill (if given), least loaded first."""
+        stmt = self._filtered(tenant_id, AgentStatus.AVAILABLE, skill).order_by(Agent.current_load, Agent.id).limit(limit)
         return db.session.execute(stmt).scalars().all()
 
+    def tenant_ids(self) -> list:
+        return db.session.execute(select(Agent.tenant_id).distinct().order_by(Agent.tenant_id)).scalars().all()
+
+    def get_tenant_states(self, tenant_id: str) -> list:
+        """(id, agent_id, status, skills, current_load, updated_at) rows of every agent of a tenant, in one query."""
+        return db.session.execute(
+            select(Agent.id, Agent.agent_id, Agent.status, Agent.skills, Agent.current_load, Agent.updated_at)
+            .where(Agent.tenant_id == tenant_id)
+        ).all()
+
+    def skill_masks(self, tenant_id: str) -> dict:
+        """Agent primary key -> bitmask of its interned skills, for every agent of a tenant, in one query."""
+        masks = {}
+        for agent_pk, bit in db.session.execute(
+            select(agent_skills.c.agent_id, Skill.bit)
+            .join(Skill, Skill.id == agent_skills.c.skill_id)
+            .where(Skill.tenant_id == tenant_id)
+        ):
+            masks[agent_pk] = masks.get(agent_pk, 0) | (1 << bit)
+        return masks
+
+    def increment_loads(self, tenant_id: str, agent_ids: list) -> int:
+        """
+        Add one to current_load per occurrence of an agent id, with one UPDATE per distinct increment
+        (normally a single statement). The caller commits.
+        """
+        by_increment = {}
+        for agent_id, count in Counter(agent_ids).items():
+            by_increment.setdefault(count, []).append(agent_id)
+        updated = 0
+        for count, ids in by_increment.items():
+            updated += db.session.execute(
+                update(Agent)
+                .where(Agent.tenant_id == tenant_id, Agent.agent_id.in_(ids))
+                .values(current_load=Agent.current_load + count)
+                .execution_options(synchronize_session=False)
+            ).rowcount
+        return updated
+
+    def bulk_upsert(self, rows: list) -> list:
+        """
+        Insert or update many agents in one statement, keyed on agent_id.
+
+        Rows carry agent_id, tenant_id, status, skills, current_load and updated_at; a missing skills value
+        keeps the stored one. Agents whose agent_id belongs to another tenant are left untouched. Returns
+        the written (id, agent_id, tenant_id, status, skills, current_load) rows. The caller commits.
+        """
+        if not rows:
+            return []
+        stmt = dialect_insert(Agent).values(rows)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[Agent.agent_id],
+            set_={
+                "status": stmt.excluded.status,
+                "skills": func.coalesce(stmt.excluded.skills, Agent.skills),
+                "current_load": stmt.excluded.current_load,
+                "updated_at": stmt.excluded.updated_at,
+            },
+            where=Agent.tenant_id == stmt.excluded.tenant_id,
+        ).returning(Agent.id, Agent.agent_id, Agent.tenant_id, Agent.status, Agent.skills, Agent.current_load)
+        return db.session.execute(stmt).all()
+
+    def mark_offline(self, tenant_id: str, agent_ids: list, now) -> list:
+        """
+        Set the given agents of a tenant offline in one UPDATE, skipping those already offline.
+
+        Returns the changed (agent_id, skills, current_load) rows. The caller commits.
+        """
+        if not agent_ids:
+            return []
+        return db.session.execute(
+            update(Agent)
+            .where(Agent.tenant_id == tenant_id, Agent.agent_id.in_(agent_ids), Agent.status != AgentStatus.OFFLINE)
+            .values(status=AgentStatus.OFFLINE, updated_at=now)
+            .returning(Agent.agent_id, Agent.skills, Agent.current_load)
+            .execution_options(synchronize_session=False)
+        ).all()
+
+    def replace_skill_sets(self, skill_ids: dict):
+        """Replace the agent_skills rows of each agent primary key in `skill_ids` with its skill ids."""
+        if not skill_ids:
+            return
+        db.session.execute(delete(agent_skills).where(agent_skills.c.agent_id.in_(list(skill_ids))))
+        pairs = [{"agent_id": agent, "skill_id": skill} for agent, skills in skill_ids.items() for skill in skills]
+        if pairs:
+            db.session.execute(insert(agent_skills), pairs)
+
     def update_status(self, agent_id: str, tenant_id: str, status: AgentStatus):
         agent = self.get_by_agent_id(agent_id, tenant_id)
         if not agent:
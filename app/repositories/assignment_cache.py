@@ -0,0 +1,70 @@
+import json
+import logging
+from ..extensions import redis_client
+
+logger = logging.getLogger("assignment_cache")
+
+# Cached "no assignment yet" marker; kept short so polls see a new assignment quickly even if the
+# write-through that replaces it is lost
+_NONE = ""
+
+
+class AssignmentCache:
+    """
+    Redis read-through cache of the latest assignment per customer, `assignment:{tenant}:{customer}`.
+
+    Routing writes entries through as it commits assignments; misses are filled from a column-only
+    query, including a short-lived negative entry while a customer is still unassigned.
+    """
+
+    @staticmethod
+    def key(tenant_id: str, customer_uid: str) -> str:
+        return f"assignment:{tenant_id}:{customer_uid}"
+
+    @staticmethod
+    def get(tenant_id: str, customer_uid: str):
+        """Return (hit, assignment dict or None); a hit with None means cached as unassigned."""
+        value = redis_client.client.get(AssignmentCache.key(tenant_id, customer_uid))
+        if value is None:
+            return False, None
+        return True, (json.loads(value) if value != _NONE else None)
+
+    @staticmethod
+    def put(tenant_id: str, customer_uid: str, view, ttl: int = 3600, negative_ttl: int = 2):
+        """Cache an assignment dict, or with `view=None` the fact that there is none yet."""
+        key = AssignmentCache.key(tenant_id, customer_uid)
+        if view is None:
+            # NX: never mask an assignment written through while this lookup was reading the database
+            redis_client.client.set(key, _NONE, ex=negative_ttl, nx=True)
+        else:
+            redis_client.client.set(key, json.dumps(view), ex=ttl)
+
+    @staticmethod
+    def put_many(views: list, ttl: int = 3600):
+        """Write many assignment dicts through in one round trip; failures only cost cache hits."""
+        if not views:
+            return
+        try:
+            pipe = redis_client.pipeline()
+            for view in views:
+                pipe.set(AssignmentCache.key(view["tenant_id"], view["customer_uid"]), json.dumps(view), ex=ttl)
+            pipe.execute()
+        except Exception as e:
+            logger.warning(f"Could not cache {len(views)} assignments: {e}")
+
+    @staticmethod
+    def invalidate(tenant_id: str, customer_uid: str):
+        try:
+            redis_client.client.delete(AssignmentCache.key(tenant_id, customer_uid))
+        except Exception as e:
+            logger.warning(f"Could not invalidate cached assignment {tenant_id}/{customer_uid}: {e}")
+
+    @staticmethod
+    def invalidate_many(keys: list):
+        """Drop the cached assignments of many (tenant_id, customer_uid) pairs in one round trip."""
+        if not keys:
+            return
+        try:
+            redis_client.client.delete(*(AssignmentCache.key(tenant_id, customer_uid) for tenant_id, customer_uid in keys))
+        except Exception as e:
+            logger.warning(f"Could not invalidate {len(keys)} cached assignments: {e}")
@@ -1,6 +1,9 @@
 from sqlalchemy import select
 from ..extensions import db
 from ..models import Assignment
+from .assignment_cache import AssignmentCache
+from .pagination import keyset, stream
+from .upsert import dialect_insert
 
 
 class AssignmentRepository:
@@ -12,18 +15,64 @@ class AssignmentRepository:
         db.session.commit()
         return assignment
 
+    def upsert_many(self, rows: list) -> list:
+        """
+        Insert or reassign many assignments in one statement, keyed on (tenant_id, customer_uid).
+
+        Rows carry customer_uid, agent_uid, tenant_id, created_at and updated_at; a customer that already
+        has an assignment gets the new agent and updated_at, keeping its id and created_at. When a customer
+        appears more than once only its last row is written. Returns the written rows with every to_dict()
+        column, in input order. The caller commits.
+        """
+        latest = {(row["tenant_id"], row["customer_uid"]): row for row in rows}
+        if not latest:
+            return []
+        stmt = dialect_insert(Assignment).values(list(latest.values()))
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[Assignment.tenant_id, Assignment.customer_uid],
+            set_={"agent_uid": stmt.excluded.agent_uid, "updated_at": stmt.excluded.updated_at},
+        ).returning(*Assignment.__table__.columns)
+        written = {(row.tenant_id, row.customer_uid): row for row in db.session.execute(stmt)}
+        return [written[key] for key in latest]
+
     def get_by_customer_uid(self, customer_uid: str, tenant_id: str):
         stmt = select(Assignment).where(
             Assignment.customer_uid == customer_uid,
             Assignment.tenant_id == tenant_id
-        )
+        ).order_by(Assignment.id.desc())
         return db.session.execute(stmt).scalars().first()
 
-    def list_all(self, tenant_id=None):
+    def get_view(self, customer_uid: str, tenant_id: str):
+        """Latest assignment of a customer as a to_dict() dict, from a column-only query with no joins."""
+        stmt = select(
+            Assignment.id,
+            Assignment.customer_uid,
+            Assignment.agent_uid,
+            Assignment.tenant_id,
+            Assignment.customer_id,
+            Assignment.agent_id,
+            Assignment.created_at,
+            Assignment.updated_at,
+        ).where(
+            Assignment.customer_uid == customer_uid,
+            Assignment.tenant_id == tenant_id,
+        ).order_by(Assignment.id.desc()).limit(1)
+        row = db.session.execute(stmt).first()
+        return Assignment.view(row) if row else None
+
+    def list_all(self, tenant_id=None, after=None, limit=None):
+        stmt = keyset(self._filtered(tenant_id), Assignment, after, limit)
+        return db.session.execute(stmt).scalars().all()
+
+    def stream_all(self, tenant_id=None, after=None, limit=None, chunk_size=500):
+        """Like list_all, but yields assignments from a server-side cursor so memory stays bounded."""
+        return stream(keyset(self._filtered(tenant_id), Assignment, after, limit), chunk_size)
+
+    def _filtered(self, tenant_id=None):
         stmt = select(Assignment)
         if tenant_id:
             stmt = stmt.where(Assignment.tenant_id == tenant_id)
-        return db.session.execute(stmt).scalars().all()
+        return stmt
 
     def update_agent_mapping(self, customer_uid: str, tenant_id: str, new_agent_uid: str):
         assignment = self.get_by_customer_uid(customer_uid, tenant_id)
@@ -31,6 +80,7 @@ class AssignmentRepository:
             return None
         assignment.agent_uid = new_agent_uid
         db.session.commit()
+        AssignmentCache.invalidate(tenant_id, customer_uid)
         return assignment
 
     def delete_by_customer_uid(self, customer_uid: str, tenant_id: str):
@@ -38,5 +88,6 @@ class AssignmentRepository:
         if assignment:
             db.session.delete(assignment)
             db.session.commit()
+            AssignmentCache.invalidate(tenant_id, customer_uid)
             return True
         return False
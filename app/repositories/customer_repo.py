@@ -1,6 +1,8 @@
-from sqlalchemy import select
+from sqlalchemy import and_, func, select
 from ..extensions import db
 from ..models import Customer, CustomerStatus
+from .pagination import keyset, stream
+from .upsert import dialect_insert
 
 
 class CustomerRepository:
@@ -21,13 +23,65 @@ class CustomerRepository:
         )
         return db.session.execute(stmt).scalars().first()
 
-    def list_all(self, tenant_id=None, status=None):
+    def list_all(self, tenant_id=None, status=None, skill=None, after=None, limit=None):
+        stmt = keyset(self._filtered(tenant_id, status, skill), Customer, after, limit)
+        return db.session.execute(stmt).scalars().all()
+
+    def stream_all(self, tenant_id=None, status=None, skill=None, after=None, limit=None, chunk_size=500):
+        """Like list_all, but yields customers from a server-side cursor so memory stays bounded."""
+        return stream(keyset(self._filtered(tenant_id, status, skill), Customer, after, limit), chunk_size)
+
+    def _filtered(self, tenant_id=None, status=None, skill=None):
         stmt = select(Customer)
         if tenant_id:
             stmt = stmt.where(Customer.tenant_id == tenant_id)
         if status:
             stmt = stmt.where(Customer.status == CustomerStatus(status))
-        return db.session.execute(stmt).scalars().all()
+        if skill:
+            stmt = stmt.where(Customer.requested_skill.ilike(f"%{skill}%"))
+        return stmt
+
+    def bulk_upsert(self, rows: list, newer_wins: bool = True) -> set:
+        """
+        Insert or update many customers in one statement, keyed on customer_id.
+
+        Rows carry customer_id, tenant_id, requested_skill, priority, status and updated_at; a missing
+        requested_skill or priority keeps the stored one (priority 0 for a new row). With `newer_wins` a row
+        only overwrites a stored customer whose updated_at is not later, so out-of-order writers (e.g.
+        write-behind persistence racing the router) cannot roll a status back. Rows whose customer_id belongs
+        to another tenant are left untouched. Returns the customer_ids that were written. The caller commits.
+        """
+        written = set()
+        keep_priority = [dict(row, priority=0) for row in rows if row.get("priority") is None]
+        with_priority = [row for row in rows if row.get("priority") is not None]
+        for batch, keep in ((with_priority, False), (keep_priority, True)):
+            if batch:
+                written |= set(db.session.execute(self._upsert(batch, keep, newer_wins)).scalars())
+        return written
+
+    @staticmethod
+    def _upsert(rows: list, keep_priority: bool, newer_wins: bool):
+        stmt = dialect_insert(Customer).values(rows)
+        set_ = {
+            "requested_skill": func.coalesce(stmt.excluded.requested_skill, Customer.requested_skill),
+            "status": stmt.excluded.status,
+            "updated_at": stmt.excluded.updated_at,
+        }
+        if not keep_priority:
+            set_["priority"] = stmt.excluded.priority
+        where = Customer.tenant_id == stmt.excluded.tenant_id
+        if newer_wins:
+            where = and_(where, Customer.updated_at <= stmt.excluded.updated_at)
+        return stmt.on_conflict_do_update(
+            index_elements=[Customer.customer_id], set_=set_, where=where,
+        ).returning(Customer.customer_id)
+
+    def tenants_of(self, customer_ids: list) -> dict:
+        """{customer_id: tenant_id} of the stored customers among `customer_ids`."""
+        if not customer_ids:
+            return {}
+        stmt = select(Customer.customer_id, Customer.tenant_id).where(Customer.customer_id.in_(customer_ids))
+        return dict(db.session.execute(stmt).all())
 
     def update_status(self, customer_id: str, tenant_id: str, new_status: CustomerStatus):
         cust = self.get_by_customer_id(customer_id, tenant_id)
@@ -0,0 +1,108 @@
+import re
+from datetime import datetime
+from sqlalchemy import delete, insert, literal, select, text, tuple_
+from ..extensions import db
+from ..models import Assignment, AssignmentHistory, Customer, CustomerStatus
+
+_PARTITION = re.compile(r"^assignment_history_(\d{4})_(\d{2})$")
+
+
+def _month_start(when: datetime, months_later: int = 0) -> datetime:
+    month = when.year * 12 + when.month - 1 + months_later
+    return datetime(month // 12, month % 12 + 1, 1)
+
+
+class AssignmentHistoryRepository:
+    """
+    Moves completed work out of the hot tables in bounded chunks, and ages out the history it was moved to.
+
+    The archive and purge methods handle at most `limit` rows, and no method commits: the caller makes each
+    chunk its own short transaction.
+    """
+
+    def archive_completed(self, before: datetime, limit: int, now=None) -> list:
+        """
+        Copy the assignments of up to `limit` customers completed before `before` into the history, then
+        delete those assignments and customers. Returns the (tenant_id, customer_id) pairs archived.
+
+        On Postgres the customers are locked FOR UPDATE SKIP LOCKED, so a concurrent re-enqueue of one of
+        them waits for this chunk rather than being deleted under it.
+        """
+        customers = db.session.execute(
+            select(Customer.id, Customer.tenant_id, Customer.customer_id)
+            .where(Customer.status == CustomerStatus.COMPLETED, Customer.updated_at < before)
+            .order_by(Customer.updated_at)
+            .limit(limit)
+            .with_for_update(skip_locked=True)
+        ).all()
+        if not customers:
+            return []
+        ids = [c.id for c in customers]
+        pairs = [(c.tenant_id, c.customer_id) for c in customers]
+        db.session.execute(insert(AssignmentHistory).from_select(
+            ["assignment_id", "archived_at", "customer_uid", "agent_uid", "tenant_id", "requested_skill", "priority",
+             "assigned_at", "completed_at"],
+            select(
+                Assignment.id, literal(now or datetime.utcnow(), AssignmentHistory.archived_at.type),
+                Assignment.customer_uid, Assignment.agent_uid, Assignment.tenant_id, Customer.requested_skill,
+                Customer.priority, Assignment.created_at, Customer.updated_at,
+            )
+            .join(Customer, (Customer.tenant_id == Assignment.tenant_id) & (Customer.customer_id == Assignment.customer_uid))
+            .where(Customer.id.in_(ids)),
+        ))
+        db.session.execute(
+            delete(Assignment)
+            .where(tuple_(Assignment.tenant_id, Assignment.customer_uid).in_(pairs))
+            .execution_options(synchronize_session=False)
+        )
+        db.session.execute(delete(Customer).where(Customer.id.in_(ids)).execution_options(synchronize_session=False))
+        return pairs
+
+    def purge_history(self, before: datetime, limit: int) -> int:
+        """Delete up to `limit` history rows archived before `before`. Returns the number deleted."""
+        oldest = (
+            select(AssignmentHistory.assignment_id, AssignmentHistory.archived_at)
+            .where(AssignmentHistory.archived_at < before)
+            .limit(limit)
+        )
+        return db.session.execute(
+            delete(AssignmentHistory)
+            .where(tuple_(AssignmentHistory.assignment_id, AssignmentHistory.archived_at).in_(oldest))
+            .execution_options(synchronize_session=False)
+        ).rowcount
+
+    # Postgres partitions: one per month of archived_at, named assignment_history_YYYY_MM, plus a default
+
+    def ensure_partitions(self, now: datetime, months_ahead: int = 1) -> list:
+        """Create the monthly partitions from now's month to `months_ahead` later. Returns those created."""
+        existing = set(self._partitions())
+        created = []
+        for offset in range(months_ahead + 1):
+            start, end = _month_start(now, offset), _month_start(now, offset + 1)
+            name = f"assignment_history_{start:%Y_%m}"
+            if name in existing:
+                continue
+            db.session.execute(text(
+                f"CREATE TABLE IF NOT EXISTS {name} PARTITION OF assignment_history "
+                f"FOR VALUES FROM ('{start:%Y-%m-%d}') TO ('{end:%Y-%m-%d}')"
+            ))
+            created.append(name)
+        return created
+
+    def drop_partitions(self, before: datetime) -> list:
+        """Detach and drop the monthly partitions that end at or before `before`. Returns those dropped."""
+        dropped = []
+        for name in self._partitions():
+            year, month = (int(part) for part in _PARTITION.match(name).groups())
+            if _month_start(datetime(year, month, 1), 1) <= before:
+                db.session.execute(text(f"ALTER TABLE assignment_history DETACH PARTITION {name}"))
+                db.session.execute(text(f"DROP TABLE {name}"))
+                dropped.append(name)
+        return dropped
+
+    def _partitions(self) -> list:
+        names = db.session.execute(text(
+            "SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid "
+            "WHERE i.inhparent = 'assignment_history'::regclass ORDER BY c.relname"
+        )).scalars()
+        return [name for name in names if _PARTITION.match(name)]
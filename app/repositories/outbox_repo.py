@@ -0,0 +1,61 @@
+from datetime import datetime
+from sqlalchemy import delete, insert, select, update
+from ..extensions import db
+from ..models import OutboxEvent
+
+
+class OutboxRepository:
+    """Repository for the transactional outbox of Kafka events."""
+
+    def add_many(self, rows: list):
+        """Stage OutboxEvent.row() dicts in the caller's transaction with one multi-row INSERT. The caller commits."""
+        if rows:
+            db.session.execute(insert(OutboxEvent), rows)
+
+    def claim_pending(self, limit: int) -> list:
+        """
+        Lock and return up to `limit` unsent events in id order, which is insert order: transactions that
+        commit in the opposite order to their inserts are relayed in insert order, and a row whose transaction
+        commits late is relayed after later ids. Per-key order still holds, since a customer's routing
+        transactions run one after another from its partition.
+
+        On Postgres the rows are locked FOR UPDATE SKIP LOCKED, so a second relay started for failover
+        never produces rows the first one holds; the lock lasts until the caller commits.
+        """
+        stmt = (
+            select(OutboxEvent)
+            .where(OutboxEvent.sent_at.is_(None))
+            .order_by(OutboxEvent.id)
+            .limit(limit)
+            .with_for_update(skip_locked=True)
+        )
+        return db.session.execute(stmt).scalars().all()
+
+    def mark_sent(self, ids: list, sent_at=None) -> int:
+        """Stamp many events as sent with one UPDATE. The caller commits."""
+        if not ids:
+            return 0
+        stmt = (
+            update(OutboxEvent)
+            .where(OutboxEvent.id.in_(ids))
+            .values(sent_at=sent_at or datetime.utcnow())
+            .execution_options(synchronize_session=False)
+        )
+        return db.session.execute(stmt).rowcount
+
+    def count_pending(self) -> int:
+        stmt = select(db.func.count()).select_from(OutboxEvent).where(OutboxEvent.sent_at.is_(None))
+        return db.session.execute(stmt).scalar_one()
+
+    def purge_sent(self, before: datetime, limit: int) -> int:
+        """Delete up to `limit` outbox events sent before `before`, oldest first. Returns the number deleted."""
+        # The relay sends in id order, so sent rows sit at the low end of the primary key
+        oldest = (
+            select(OutboxEvent.id)
+            .where(OutboxEvent.sent_at.is_not(None), OutboxEvent.sent_at < before)
+            .order_by(OutboxEvent.id)
+            .limit(limit)
+        )
+        return db.session.execute(
+            delete(OutboxEvent).where(OutboxEvent.id.in_(oldest)).execution_options(synchronize_session=False)
+        ).rowcount
@@ -0,0 +1,16 @@
+from ..extensions import db
+
+
+def keyset(stmt, model, after=None, limit=None):
+    """Order by primary key and apply a keyset cursor: only rows with id > after, at most `limit` of them."""
+    stmt = stmt.order_by(model.id)
+    if after is not None:
+        stmt = stmt.where(model.id > after)
+    if limit is not None:
+        stmt = stmt.limit(limit)
+    return stmt
+
+
+def stream(stmt, chunk_size: int = 500):
+    """Iterate ORM rows from a server-side cursor, buffering `chunk_size` rows at a time."""
+    return db.session.execute(stmt.execution_options(yield_per=chunk_size)).scalars()
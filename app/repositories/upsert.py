@@ -0,0 +1,16 @@
+from sqlalchemy.dialects import postgresql, sqlite
+from ..extensions import db
+
+_INSERTS = {
+    "postgresql": postgresql.insert,
+    "sqlite": sqlite.insert,
+}
+
+
+def dialect_insert(model):
+    """INSERT construct for the bound dialect, exposing `on_conflict_do_update` for set-based upserts."""
+    dialect = db.session.get_bind().dialect.name
+    try:
+        return _INSERTS[dialect](model)
+    except KeyError:
+        raise NotImplementedError(f"Set-based upserts are not supported on {dialect}")
@@ -0,0 +1,164 @@
+"""
+Redis mirror of agent state: the `agent:{tenant}:{agent}` hashes plus the availability index.
+
+Agent upserts write through to it; `reconcile` bulk-loads it from the database (warm-up after a Redis
+restart or expiry, and the periodic drift check), and `ensure_warm` rewarms a single tenant when a claim
+finds its index empty, with a Redis lock so one process reloads while the others fall back to a bounded
+DB query.
+"""
+import logging
+from collections import Counter
+from flask import current_app
+from ..extensions import redis_client
+from ..repositories import AgentRepository
+from ..utils import metrics
+from .agent_index import AgentAvailabilityIndex, parse_skills
+
+logger = logging.getLogger("agent_cache")
+
+# missing (no hash), stale (hash status/skills differ from the DB), index (availability index disagrees with the
+# DB status) and orphaned (indexed but not in the DB)
+CACHE_DRIFT = metrics.counter("agent_cache_drift", "Agents found out of step with the database", ("kind",))
+
+WARM_LOCK_TTL = 30
+
+
+class AgentCache:
+    """Write-through, warm-up and reconciliation of the Redis agent mirror."""
+
+    @staticmethod
+    def hash_key(tenant_id: str, agent_id: str) -> str:
+        return f"agent:{tenant_id}:{agent_id}"
+
+    @staticmethod
+    def warm_key(tenant_id: str) -> str:
+        return f"agents:warm:{tenant_id}"
+
+    @staticmethod
+    def stage_agent(pipe, tenant_id, agent_id, status, skills, skill_mask, current_load, updated_at,
+                    previous_skills=None):
+        """Queue the agent hash and availability index writes for one agent on a Redis pipeline."""
+        key = AgentCache.hash_key(tenant_id, agent_id)
+        pipe.hset(key, mapping={
+            "status": status,
+            "skills": skills or "",
+            "skill_mask": str(skill_mask),
+            "current_load": str(current_load),
+            "updated_at": updated_at.isoformat(),
+        })
+        ttl = current_app.config.get("AGENT_HASH_TTL", 300)
+        pipe.expire(key, ttl)
+        # Keep the availability index in step so routers never need to scan the keyspace; its sets expire
+        # alongside the hashes
+        AgentAvailabilityIndex.stage_update(
+            pipe, tenant_id, agent_id, status, skills, current_load, previous_skills, skill_mask=skill_mask, ttl=ttl,
+        )
+
+    @staticmethod
+    def reconcile(tenant_id=None, repair=True, skip_warm=False) -> dict:
+        """
+        Compare every agent (of one tenant, or all) with its Redis mirror and rewrite the ones that drifted.
+
+        Returns drift counts by kind plus the number of agents checked. With repair=False it only reports;
+        skip_warm leaves out tenants reconciled within AGENT_CACHE_WARM_TTL (e.g. by another starting worker).
+        """
+        tenants = [tenant_id] if tenant_id else AgentRepository().tenant_ids()
+        if skip_warm and tenants:
+            pipe = redis_client.pipeline()
+            for tenant in tenants:
+                pipe.exists(AgentCache.warm_key(tenant))
+            tenants = [tenant for tenant, warm in zip(tenants, pipe.execute()) if not warm]
+        report = Counter()
+        for tenant in tenants:
+            report.update(AgentCache.reconcile_tenant(tenant, repair))
+        return dict(report)
+
+    @staticmethod
+    def reconcile_tenant(tenant_id: str, repair=True) -> Counter:
+        """
+        Reconcile one tenant in two DB queries and two Redis round trips (a pipelined read, a pipelined write),
+        plus one pipelined read of orphaned agents' skills when the index holds agents the DB does not know.
+
+        The DB is the source of truth for status and skills. Load is not: claims only bump it in Redis, so an
+        indexed agent keeps its indexed load. Hashes that did not drift, and the tenant's index sets, just get
+        their TTL refreshed.
+        """
+        repo = AgentRepository()
+        rows = repo.get_tenant_states(tenant_id)
+        masks = repo.skill_masks(tenant_id)
+
+        pipe = redis_client.pipeline()
+        pipe.zrange(AgentAvailabilityIndex.tenant_key(tenant_id), 0, -1, withscores=True)
+        for row in rows:
+            pipe.hgetall(AgentCache.hash_key(tenant_id, row.agent_id))
+        indexed, *cached = pipe.execute()
+        indexed = dict(indexed)
+
+        drift = Counter(checked=len(rows))
+        ttl = current_app.config.get("AGENT_HASH_TTL", 300)
+        pipe = redis_client.pipeline()
+        for row, hash_ in zip(rows, cached):
+            status, skills = row.status.value, row.skills or ""
+            kind = None
+            if hash_ and hash_.get("updated_at", "") > row.updated_at.isoformat():
+                # An upsert landed after our DB read; its write-through is newer than what we would write
+                continue
+            if not hash_:
+                kind = "missing"
+            elif hash_.get("status") != status or hash_.get("skills", "") != skills:
+                kind = "stale"
+            elif (status == "available") != (row.agent_id in indexed):
+                kind = "index"
+            if kind is None:
+                pipe.expire(AgentCache.hash_key(tenant_id, row.agent_id), ttl)
+                continue
+            drift[kind] += 1
+            load = int(indexed[row.agent_id]) if status == "available" and row.agent_id in indexed else row.current_load
+            AgentCache.stage_agent(
+                pipe, tenant_id, row.agent_id, status, row.skills, masks.get(row.id, 0), load, row.updated_at,
+                hash_.get("skills") if hash_ else None,
+            )
+        known = {row.agent_id for row in rows}
+        orphans = [agent_id for agent_id in indexed if agent_id not in known]
+        if orphans:
+            # Indexed agents the DB does not know: their skill sets come from their hashes, read in one round trip
+            reads = redis_client.pipeline()
+            for agent_id in orphans:
+                reads.hget(AgentCache.hash_key(tenant_id, agent_id), "skills")
+            for agent_id, skills in zip(orphans, reads.execute()):
+                drift["orphaned"] += 1
+                AgentAvailabilityIndex.stage_update(pipe, tenant_id, agent_id, "offline", skills, 0)
+        if repair:
+            index_keys = {AgentAvailabilityIndex.tenant_key(tenant_id)}
+            index_keys.update(AgentAvailabilityIndex.skill_key(tenant_id, skill)
+                              for row in rows for skill in parse_skills(row.skills))
+            for key in index_keys:
+                pipe.expire(key, ttl)
+            pipe.set(AgentCache.warm_key(tenant_id), "1", ex=current_app.config.get("AGENT_CACHE_WARM_TTL", 120))
+            pipe.execute()
+
+        for kind, count in drift.items():
+            if kind != "checked":
+                CACHE_DRIFT.labels(kind).inc(count)
+        if len(drift) > 1:
+            logger.info(f"Agent cache drift for tenant {tenant_id}: {dict(drift)}{'' if repair else ' (not repaired)'}")
+        return drift
+
+    @staticmethod
+    def ensure_warm(tenant_id: str) -> str:
+        """
+        Called when a claim found the tenant's index empty. Returns "warm" (reconciled recently, so the empty
+        index is real: nobody is available), "warmed" (this call just reloaded it) or "warming" (another process
+        holds the rewarm lock; fall back to the database meanwhile).
+        """
+        r = redis_client.client
+        if r.exists(AgentCache.warm_key(tenant_id)):
+            return "warm"
+        lock = f"lock:warm:{tenant_id}"
+        if not r.set(lock, "1", nx=True, ex=WARM_LOCK_TTL):
+            return "warming"
+        try:
+            AgentCache.reconcile_tenant(tenant_id)
+        finally:
+            r.delete(lock)
+        return "warmed"
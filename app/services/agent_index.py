@@ -0,0 +1,295 @@
+import json
+from ..extensions import redis_client
+
+DEFAULT_CANDIDATE_LIMIT = 10
+RESERVATION_TTL = 30
+
+AGENT_CHANGES_CHANNEL = "agents:changes"
+
+# Reserve one agent and bump its load in every availability set it belongs to, announcing the new load.
+# Agent hashes and skill sets are derived from the tenant id, so the scripts assume a non-clustered Redis.
+_TRY_CLAIM_LUA = """
+local function try_claim(tenant, agent_id, ttl)
+  local tenant_key = 'agents:available:' .. tenant
+  if not redis.call('ZSCORE', tenant_key, agent_id) then
+    return nil
+  end
+  if not redis.call('SET', 'lock:agent:' .. tenant .. ':' .. agent_id, 'locked', 'NX', 'EX', ttl) then
+    return nil
+  end
+  local load = redis.call('ZINCRBY', tenant_key, 1, agent_id)
+  local hash = 'agent:' .. tenant .. ':' .. agent_id
+  local skills = redis.call('HGET', hash, 'skills')
+  if skills then
+    for skill in string.gmatch(skills, '([^,]+)') do
+      redis.call('ZADD', tenant_key .. ':skill:' .. skill:match('^%s*(.-)%s*$'), 'XX', 'INCR', 1, agent_id)
+    end
+    redis.call('HSET', hash, 'current_load', load)
+  end
+  redis.call('PUBLISH', '""" + AGENT_CHANGES_CHANNEL + """', cjson.encode({
+    tenant_id = tenant, agent_id = agent_id, current_load = tonumber(load)
+  }))
+  return load
+end
+"""
+
+# Undo a try_claim whose assignment was never committed: drop the reservation and take back the load bump.
+_RELEASE_LUA = """
+local function release(tenant, agent_id)
+  redis.call('DEL', 'lock:agent:' .. tenant .. ':' .. agent_id)
+  local tenant_key = 'agents:available:' .. tenant
+  local load = tonumber(redis.call('ZSCORE', tenant_key, agent_id))
+  if not load or load < 1 then
+    return
+  end
+  load = redis.call('ZINCRBY', tenant_key, -1, agent_id)
+  local hash = 'agent:' .. tenant .. ':' .. agent_id
+  local skills = redis.call('HGET', hash, 'skills')
+  if skills then
+    for skill in string.gmatch(skills, '([^,]+)') do
+      redis.call('ZADD', tenant_key .. ':skill:' .. skill:match('^%s*(.-)%s*$'), 'XX', 'INCR', -1, agent_id)
+    end
+    redis.call('HSET', hash, 'current_load', load)
+  end
+  redis.call('PUBLISH', '""" + AGENT_CHANGES_CHANNEL + """', cjson.encode({
+    tenant_id = tenant, agent_id = agent_id, current_load = tonumber(load)
+  }))
+end
+"""
+
+# KEYS = none; ARGV = tenant_id, agent_id.
+_RELEASE_ONE_LUA = _RELEASE_LUA + """
+release(ARGV[1], ARGV[2])
+return 1
+"""
+
+# Settle a request for which no agent could be claimed: park the customer in its waiting queue when given.
+# KEYS[park] = waiting queue; ARGV[member], ARGV[member + 1] = customer_id, waiting score.
+_PARK_LUA = """
+local function settle_unclaimed(park, member)
+  if KEYS[park] then
+    redis.call('ZADD', KEYS[park], 'NX', ARGV[member + 1], ARGV[member])
+    return {'parked'}
+  end
+  return {'busy'}
+end
+local function settle_claimed(park, member, agent_id, load)
+  if KEYS[park] then
+    redis.call('ZREM', KEYS[park], ARGV[member])
+  end
+  return {'claimed', agent_id, load}
+end
+"""
+
+# Pick the least-loaded unreserved agent from a candidate set.
+# KEYS = candidate sorted set[, waiting queue]; ARGV = tenant_id, candidate limit, reservation ttl[, customer_id, score].
+_CLAIM_LUA = _TRY_CLAIM_LUA + _PARK_LUA + """
+local candidates = redis.call('ZRANGE', KEYS[1], 0, tonumber(ARGV[2]) - 1)
+if #candidates == 0 then
+  return {'empty'}
+end
+for _, agent_id in ipairs(candidates) do
+  local load = try_claim(ARGV[1], agent_id, tonumber(ARGV[3]))
+  if load then
+    return settle_claimed(2, 4, agent_id, load)
+  end
+end
+return settle_unclaimed(2, 4)
+"""
+
+# Claim the first still-available agent from a caller-ranked list.
+# KEYS = [waiting queue]; ARGV = tenant_id, reservation ttl, customer_id, score, agent ids in preference order.
+_CLAIM_FROM_LUA = _TRY_CLAIM_LUA + _PARK_LUA + """
+for i = 5, #ARGV do
+  local load = try_claim(ARGV[1], ARGV[i], tonumber(ARGV[2]))
+  if load then
+    return settle_claimed(1, 3, ARGV[i], load)
+  end
+end
+return settle_unclaimed(1, 3)
+"""
+_scripts = {}
+
+
+def parse_skills(skills) -> list:
+    """Split a comma-separated skills string into a list of normalized skill names."""
+    if not skills:
+        return []
+    return [s.strip() for s in skills.split(",") if s.strip()]
+
+
+class AgentAvailabilityIndex:
+    """Maintains per-tenant and per-(tenant, skill) sorted sets of available agents scored by current load."""
+
+    @staticmethod
+    def tenant_key(tenant_id: str) -> str:
+        return f"agents:available:{tenant_id}"
+
+    @staticmethod
+    def skill_key(tenant_id: str, skill: str) -> str:
+        return f"agents:available:{tenant_id}:skill:{skill}"
+
+    @staticmethod
+    def candidate_key(tenant_id: str, skill=None) -> str:
+        """Sorted set holding the agents eligible for a request with the given (optional) skill."""
+        if skill:
+            return AgentAvailabilityIndex.skill_key(tenant_id, skill)
+        return AgentAvailabilityIndex.tenant_key(tenant_id)
+
+    @staticmethod
+    def stage_update(pipe, tenant_id, agent_id, status, skills, current_load, previous_skills=None, skill_mask=None,
+                     ttl=None):
+        """
+        Queue index writes for one agent on a Redis pipeline; the caller executes it.
+
+        With `ttl` the agent's index sets expire that many seconds after their last write, like the agent
+        hashes, so the entries of agents nobody writes any more do not outlive them indefinitely.
+        """
+        new_skills = parse_skills(skills)
+        for skill in set(parse_skills(previous_skills)) - set(new_skills):
+            pipe.zrem(AgentAvailabilityIndex.skill_key(tenant_id, skill), agent_id)
+
+        keys = [AgentAvailabilityIndex.tenant_key(tenant_id)]
+        keys += [AgentAvailabilityIndex.skill_key(tenant_id, s) for s in new_skills]
+        if status == "available":
+            for key in keys:
+                pipe.zadd(key, {agent_id: int(current_load or 0)})
+        else:
+            for key in keys:
+                pipe.zrem(key, agent_id)
+        if ttl:
+            for key in keys:
+                pipe.expire(key, ttl)
+        pipe.publish(AGENT_CHANGES_CHANNEL, json.dumps({
+            "tenant_id": tenant_id,
+            "agent_id": agent_id,
+            "status": status,
+            "skills": skills or "",
+            "skill_mask": skill_mask,
+            "current_load": int(current_load or 0),
+        }))
+        return pipe
+
+    @staticmethod
+    def candidates(tenant_id: str, skill=None, limit: int = DEFAULT_CANDIDATE_LIMIT) -> list:
+        """Return up to `limit` least-loaded available agents with a single bounded range query."""
+        r = redis_client.client
+        key = AgentAvailabilityIndex.candidate_key(tenant_id, skill)
+        rows = r.zrange(key, 0, limit - 1, withscores=True)
+        return [{"agent_id": agent_id, "current_load": int(score)} for agent_id, score in rows]
+
+    @staticmethod
+    def claim(tenant_id: str, skill=None, limit: int = DEFAULT_CANDIDATE_LIMIT, ttl: int = RESERVATION_TTL, park=None):
+        """
+        Select, reserve and load-bump the best eligible agent in one server-side call.
+
+        `park` is an optional (waiting key, customer_id, score) tuple: the customer is parked in that
+        queue when every candidate is reserved, and removed from it once claimed.
+
+        Returns an (outcome, agent) tuple where outcome is "claimed", "parked", "busy" (every candidate
+        is reserved) or "empty" (no indexed agents, e.g. a cold cache; never parked).
+        """
+        r = redis_client.client
+        keys, args = AgentAvailabilityIndex._claim_params(tenant_id, skill, limit, ttl, park)
+        result = AgentAvailabilityIndex._script(r, _CLAIM_LUA)(keys=keys, args=args, client=r)
+        return AgentAvailabilityIndex._claim_result(result)
+
+    @staticmethod
+    def claim_many(tenant_id: str, requests: list, limit: int = DEFAULT_CANDIDATE_LIMIT, ttl: int = RESERVATION_TTL):
+        """Run one `claim` per (skill, park) request for a tenant, pipelined into a single round trip."""
+        r = redis_client.client
+        script = AgentAvailabilityIndex._script(r, _CLAIM_LUA)
+        pipe = r.pipeline(transaction=False)
+        for skill, park in requests:
+            keys, args = AgentAvailabilityIndex._claim_params(tenant_id, skill, limit, ttl, park)
+            script(keys=keys, args=args, client=pipe)
+        return [AgentAvailabilityIndex._claim_result(result) for result in pipe.execute()]
+
+    @staticmethod
+    def claim_from(tenant_id: str, agent_ids: list, ttl: int = RESERVATION_TTL, park=None):
+        """Claim the first agent of a caller-ranked list that is still available and unreserved."""
+        r = redis_client.client
+        keys, args = AgentAvailabilityIndex._claim_from_params(tenant_id, agent_ids, ttl, park)
+        result = AgentAvailabilityIndex._script(r, _CLAIM_FROM_LUA)(keys=keys, args=args, client=r)
+        return AgentAvailabilityIndex._claim_result(result)
+
+    @staticmethod
+    def claim_from_many(tenant_id: str, requests: list, ttl: int = RESERVATION_TTL):
+        """Pipeline one `claim_from` per (ranked agent ids, park) request for a tenant into a single round trip."""
+        r = redis_client.client
+        script = AgentAvailabilityIndex._script(r, _CLAIM_FROM_LUA)
+        pipe = r.pipeline(transaction=False)
+        for agent_ids, park in requests:
+            keys, args = AgentAvailabilityIndex._claim_from_params(tenant_id, agent_ids, ttl, park)
+            script(keys=keys, args=args, client=pipe)
+        return [AgentAvailabilityIndex._claim_result(result) for result in pipe.execute()]
+
+    @staticmethod
+    def release_many(releases: list):
+        """
+        Undo (tenant_id, agent_id, bumped) claims whose assignments were not committed, in one round trip:
+        drop each reservation and, for claims that bumped the indexed load (`bumped`), take the bump back.
+        """
+        if not releases:
+            return
+        r = redis_client.client
+        script = AgentAvailabilityIndex._script(r, _RELEASE_ONE_LUA)
+        pipe = redis_client.pipeline()
+        for tenant_id, agent_id, bumped in releases:
+            if bumped:
+                script(keys=[], args=[tenant_id, agent_id], client=pipe)
+            else:
+                pipe.delete(AgentAvailabilityIndex.reservation_key(tenant_id, agent_id))
+        pipe.execute()
+
+    @staticmethod
+    def reservation_key(tenant_id: str, agent_id: str) -> str:
+        return f"lock:agent:{tenant_id}:{agent_id}"
+
+    @staticmethod
+    def reservations(tenant_id: str, agent_ids: list) -> dict:
+        """{agent_id: milliseconds left} of the given agents' live reservation locks, in one round trip."""
+        if not agent_ids:
+            return {}
+        pipe = redis_client.pipeline()
+        for agent_id in agent_ids:
+            pipe.pttl(AgentAvailabilityIndex.reservation_key(tenant_id, agent_id))
+        return {agent_id: ms for agent_id, ms in zip(agent_ids, pipe.execute()) if ms > 0}
+
+    @staticmethod
+    def hold_reservations(tenant_id: str, remaining_ms: dict):
+        """Write {agent_id: milliseconds left} reservations as locks that expire when they would have, in one round trip."""
+        if not remaining_ms:
+            return
+        pipe = redis_client.pipeline()
+        for agent_id, ms in remaining_ms.items():
+            pipe.set(AgentAvailabilityIndex.reservation_key(tenant_id, agent_id), "locked", px=int(ms))
+        pipe.execute()
+
+    @staticmethod
+    def _claim_params(tenant_id, skill, limit, ttl, park):
+        keys = [AgentAvailabilityIndex.candidate_key(tenant_id, skill)]
+        args = [tenant_id, limit, ttl]
+        if park:
+            keys.append(park[0])
+            args += [park[1], park[2]]
+        return keys, args
+
+    @staticmethod
+    def _claim_from_params(tenant_id, agent_ids, ttl, park):
+        if park:
+            return [park[0]], [tenant_id, ttl, park[1], park[2], *agent_ids]
+        return [], [tenant_id, ttl, "", 0, *agent_ids]
+
+    @staticmethod
+    def _script(r, source):
+        if source not in _scripts:
+            _scripts[source] = r.register_script(source)
+        return _scripts[source]
+
+    @staticmethod
+    def _claim_result(result):
+        outcome = result[0]
+        if outcome != "claimed":
+            return outcome, None
+        return outcome, {"agent_id": result[1], "current_load": int(float(result[2]))}
@@ -1,7 +1,21 @@
+import logging
+import time
+from collections import defaultdict
 from datetime import datetime
+from flask import current_app
 from sqlalchemy import select
-from ..extensions import db, redis_client
+from ..extensions import db, kafka_producer, redis_client
 from ..models import Agent, AgentStatus
+from ..repositories import AgentRepository
+from ..utils.codec import AGENT_STATUS, encode
+from ..utils.partitioning import partition_for
+from .agent_cache import AgentCache
+from .agent_index import parse_skills
+from .presence import Presence
+from .routing_service import RoutingService
+from .skill_catalogue import SkillCatalogue
+
+logger = logging.getLogger("agent_service")
 
 
 class AgentService:
@@ -9,14 +23,19 @@ class AgentService:
 
     @staticmethod
     def list_agents(tenant_id=None, skill=None, status=None):
-        stmt = select(Agent)
-        if tenant_id:
-            stmt = stmt.where(Agent.tenant_id == tenant_id)
-        if status:
-            stmt = stmt.where(Agent.status == status)
-        if skill:
-            stmt = stmt.where(Agent.skills.ilike(f"%{skill}%"))
-        return db.session.execute(stmt).scalars().all()
+        return AgentRepository().list_all(tenant_id=tenant_id, status=status, skill=skill)
+
+    @staticmethod
+    def stream_agents(tenant_id=None, skill=None, status=None, after=None, limit=None):
+        """One keyset page of agents (id > after), yielded from a server-side cursor."""
+        return AgentRepository().stream_all(
+            tenant_id=tenant_id,
+            status=status,
+            skill=skill,
+            after=after,
+            limit=limit,
+            chunk_size=current_app.config.get("API_STREAM_CHUNK_SIZE", 500),
+        )
 
     @staticmethod
     def upsert_agent(agent_id, tenant_id, status, skills=None, current_load=None):
@@ -29,8 +48,12 @@ class AgentService:
             agent = Agent(agent_id=agent_id, tenant_id=tenant_id)
             db.session.add(agent)
 
+        previous_skills = agent.skills
         agent.status = AgentStatus(status)
-        agent.skills = skills or agent.skills
+        if skills is not None:
+            agent.skills = skills
+            agent.skill_set = SkillCatalogue.intern(tenant_id, parse_skills(skills))
+        skill_mask = SkillCatalogue.mask(agent.skill_set)
         if current_load is not None and isinstance(current_load, int):
             agent.current_load = max(current_load, 0)
         agent.updated_at = datetime.utcnow()
@@ -39,21 +62,179 @@ class AgentService:
 
         # Mirror state in Redis for real-time consumption by routers/workers
         try:
-            r = redis_client.client
-            key = f"agent:{tenant_id}:{agent_id}"
-            r.hset(key, mapping={
-                "status": agent.status.value,
-                "skills": agent.skills or "",
-                "current_load": str(agent.current_load),
-                "updated_at": agent.updated_at.isoformat(),
-            })
-            r.expire(key, 300)
+            pipe = redis_client.client.pipeline()
+            AgentService._stage_mirror(
+                pipe, tenant_id, agent_id, agent.status.value, agent.skills, skill_mask, agent.current_load,
+                agent.updated_at, previous_skills,
+            )
+            pipe.execute()
         except Exception:
             # Non-critical: worker will rely on DB if cache fails
             pass
 
+        # In tenant-sharded mode the tenant's owning router dispatches from its own state
+        if agent.status == AgentStatus.AVAILABLE and not current_app.config.get("ROUTING_SHARD_BY_TENANT"):
+            AgentService._dispatch_waiting(tenant_id, agent_id, agent.skills)
+
         return agent
 
+    @staticmethod
+    def upsert_agents(updates: list) -> int:
+        """
+        Bulk upsert_agent for a batch holding at most one update per agent: one SELECT, one set-based
+        upsert and one commit for the whole batch, then a single Redis pipeline and one pipelined dispatch
+        of waiting customers to the agents left available.
+
+        Updates are dicts of agent_id, tenant_id, status and optional skills and current_load.
+        Returns the number of agents written.
+        """
+        if not updates:
+            return 0
+        repo = AgentRepository()
+        previous = repo.get_states([u["agent_id"] for u in updates])
+
+        # Intern every declared skill once per tenant
+        names = defaultdict(list)
+        for u in updates:
+            if u.get("skills") is not None:
+                names[u["tenant_id"]] += parse_skills(u["skills"])
+        catalogue = {tenant: {s.name: s for s in SkillCatalogue.intern(tenant, n)} for tenant, n in names.items()}
+
+        now = datetime.utcnow()
+        rows = []
+        for u in updates:
+            prev = previous.get(u["agent_id"])
+            load = u.get("current_load")
+            if load is not None and isinstance(load, int):
+                load = max(load, 0)
+            else:
+                load = prev.current_load if prev else 0
+            rows.append({
+                "agent_id": u["agent_id"],
+                "tenant_id": u["tenant_id"],
+                "status": AgentStatus(u["status"]),
+                "skills": u.get("skills"),
+                "current_load": load,
+                "updated_at": now,
+            })
+        written = repo.bulk_upsert(rows)
+
+        declared = {u["agent_id"]: u.get("skills") for u in updates}
+        repo.replace_skill_sets({
+            row.id: [catalogue[row.tenant_id][n].id for n in parse_skills(declared[row.agent_id])]
+            for row in written
+            if declared[row.agent_id] is not None
+        })
+        db.session.commit()
+
+        try:
+            pipe = redis_client.client.pipeline()
+            for row in written:
+                prev = previous.get(row.agent_id)
+                bits = (SkillCatalogue.bit_for(row.tenant_id, n) for n in parse_skills(row.skills))
+                AgentService._stage_mirror(
+                    pipe, row.tenant_id, row.agent_id, row.status.value, row.skills,
+                    SkillCatalogue.mask(b for b in bits if b is not None), row.current_load, now,
+                    prev.skills if prev else None,
+                )
+            pipe.execute()
+        except Exception:
+            # Non-critical: worker will rely on DB if cache fails
+            pass
+
+        available = [
+            (row.tenant_id, row.agent_id, parse_skills(row.skills))
+            for row in written
+            if row.status == AgentStatus.AVAILABLE
+        ]
+        if available and not current_app.config.get("ROUTING_SHARD_BY_TENANT"):
+            try:
+                RoutingService.dispatch_waiting_many(available, topic=current_app.config.get("TOPIC_ASSIGNMENTS"))
+            except Exception:
+                # Customers stay parked and are retried on the agents' next availability events
+                db.session.rollback()
+                logger.exception(f"Dispatch to {len(available)} available agents failed")
+        return len(written)
+
+    @staticmethod
+    def publish_status(agent_id, tenant_id, status, skills=None, current_load=None):
+        """
+        Announce a stored status change on the agent status topic, on the tenant's partition. In tenant-sharded
+        mode that is how the tenant's owning router learns about it; failures are only logged.
+        """
+        value = {"agent_id": agent_id, "tenant_id": tenant_id, "status": status, "skills": skills,
+                 "current_load": current_load}
+        try:
+            payload, headers = encode(AGENT_STATUS, value, current_app.config.get("KAFKA_CODEC", "json"))
+            kafka_producer.send(
+                current_app.config.get("TOPIC_AGENT_STATUS", "agent.status"),
+                payload,
+                key=agent_id.encode("utf-8"),
+                headers=headers,
+                partition=partition_for(tenant_id, current_app.config),
+            )
+        except Exception as e:
+            # The status is stored; the owning router catches up on the agent's next event
+            logger.error(f"Could not publish status of agent {agent_id} of tenant {tenant_id}: {e}")
+
+    @staticmethod
+    def sweep_presence(timeout: float, now_ms=None) -> int:
+        """
+        Mark agents whose last heartbeat is more than `timeout` seconds old offline: one UPDATE and commit for
+        all of them, then one Redis pipeline for their hashes and availability index entries. Agents that never
+        heartbeat are not tracked, so they are never swept. Returns the number of agents set offline.
+        """
+        cutoff_ms = int((now_ms if now_ms is not None else time.time() * 1000) - timeout * 1000)
+        stale = Presence.stale(cutoff_ms)
+        if not stale:
+            return 0
+        now = datetime.utcnow()
+        repo = AgentRepository()
+        changed = {tenant_id: repo.mark_offline(tenant_id, agent_ids, now) for tenant_id, agent_ids in stale.items()}
+        db.session.commit()
+
+        swept = [(tenant_id, row) for tenant_id, rows in changed.items() for row in rows]
+        try:
+            pipe = redis_client.client.pipeline()
+            for tenant_id, row in swept:
+                bits = (SkillCatalogue.bit_for(tenant_id, n) for n in parse_skills(row.skills))
+                AgentService._stage_mirror(
+                    pipe, tenant_id, row.agent_id, AgentStatus.OFFLINE.value, row.skills,
+                    SkillCatalogue.mask(b for b in bits if b is not None), row.current_load, now, row.skills,
+                )
+            pipe.execute()
+        except Exception:
+            # The reconciler repairs the mirror from the DB
+            logger.exception(f"Could not mirror {len(swept)} swept agents to Redis")
+        if current_app.config.get("ROUTING_SHARD_BY_TENANT"):
+            for tenant_id, row in swept:
+                AgentService.publish_status(row.agent_id, tenant_id, AgentStatus.OFFLINE.value)
+        Presence.forget(list(stale), cutoff_ms)
+        return len(swept)
+
+    @staticmethod
+    def _stage_mirror(pipe, tenant_id, agent_id, status, skills, skill_mask, current_load, updated_at,
+                      previous_skills=None):
+        """Queue the agent hash and availability index writes for one agent on a Redis pipeline."""
+        AgentCache.stage_agent(
+            pipe, tenant_id, agent_id, status, skills, skill_mask, current_load, updated_at, previous_skills,
+        )
+
+    @staticmethod
+    def _dispatch_waiting(tenant_id, agent_id, skills):
+        """Hand an available agent the highest-priority customer waiting for one of its skills."""
+        try:
+            RoutingService.dispatch_waiting(
+                tenant_id,
+                agent_id,
+                parse_skills(skills),
+                topic=current_app.config.get("TOPIC_ASSIGNMENTS"),
+            )
+        except Exception:
+            # Customers stay parked and are retried on the agent's next availability event
+            db.session.rollback()
+            logger.exception(f"Dispatch to agent {agent_id} of tenant {tenant_id} failed")
+
     @staticmethod
     def get_agent(agent_id, tenant_id):
         """Fetch agent info from Redis if possible, otherwise DB."""
@@ -0,0 +1,161 @@
+import heapq
+import json
+import logging
+import threading
+import time
+from flask import current_app
+from sqlalchemy import select
+from ..extensions import db
+from ..models import Agent, Skill, agent_skills
+from .agent_index import AGENT_CHANGES_CHANNEL, DEFAULT_CANDIDATE_LIMIT, AgentAvailabilityIndex
+from .skill_catalogue import SkillCatalogue
+
+logger = logging.getLogger("agent_view")
+
+
+class AgentState:
+    """Routing-relevant snapshot of a single agent."""
+
+    __slots__ = ("status", "skill_mask", "current_load")
+
+    def __init__(self, status, skill_mask, current_load):
+        self.status = status
+        self.skill_mask = int(skill_mask or 0)
+        self.current_load = int(current_load or 0)
+
+
+class AgentView:
+    """
+    In-process, per-tenant materialized view of agent status, skill bitmask and load.
+
+    Bootstrapped once from the database and kept current from the Redis change channel that agent
+    upserts and claims publish to, so routers can rank candidates without touching the network.
+    """
+
+    def __init__(self, redis):
+        self._redis = redis
+        self._lock = threading.Lock()
+        self._tenants = {}
+        self._stop = threading.Event()
+        self._thread = None
+        self._app = None
+
+    def start(self):
+        """Subscribe to the change channel, bootstrap from the DB and tail changes in a daemon thread."""
+        # Subscribe before the snapshot so changes made while bootstrapping are buffered, not lost
+        self._app = current_app._get_current_object()
+        pubsub = self._subscribe()
+        self.bootstrap()
+        self._thread = threading.Thread(target=self._run, args=(pubsub,), name="agent-view", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+
+    def bootstrap(self):
+        """Replace the view with a DB snapshot of every agent, overlaid with live availability and load from Redis."""
+        masks = {}
+        for agent_pk, bit in db.session.execute(
+            select(agent_skills.c.agent_id, Skill.bit).join(Skill, Skill.id == agent_skills.c.skill_id)
+        ):
+            masks[agent_pk] = masks.get(agent_pk, 0) | (1 << bit)
+        rows = db.session.execute(
+            select(Agent.id, Agent.tenant_id, Agent.agent_id, Agent.status, Agent.current_load)
+        ).all()
+        tenants = {}
+        for agent_pk, tenant_id, agent_id, status, current_load in rows:
+            tenants.setdefault(tenant_id, {})[agent_id] = AgentState(status.value, masks.get(agent_pk), current_load)
+
+        # Claims only bump load in Redis, so prefer the index wherever it is populated
+        pipe = self._redis.pipeline(transaction=False)
+        for tenant_id in tenants:
+            pipe.zrange(AgentAvailabilityIndex.tenant_key(tenant_id), 0, -1, withscores=True)
+        for (tenant_id, agents), indexed in zip(tenants.items(), pipe.execute()):
+            if not indexed:
+                continue
+            live = dict(indexed)
+            for agent_id, state in agents.items():
+                if agent_id in live:
+                    state.status, state.current_load = "available", int(live[agent_id])
+                elif state.status == "available":
+                    state.status = "offline"
+        with self._lock:
+            self._tenants = tenants
+        logger.info(f"Agent view bootstrapped with {len(rows)} agents across {len(tenants)} tenants")
+
+    def apply(self, tenant_id, agent_id, status=None, skill_mask=None, current_load=None):
+        """Merge a (possibly partial) agent change into the view."""
+        with self._lock:
+            agents = self._tenants.setdefault(tenant_id, {})
+            state = agents.get(agent_id)
+            if state is None:
+                agents[agent_id] = AgentState(status or "offline", skill_mask, current_load)
+                return
+            if status is not None:
+                state.status = status
+            if skill_mask is not None:
+                state.skill_mask = int(skill_mask)
+            if current_load is not None:
+                state.current_load = int(current_load)
+
+    def has_tenant(self, tenant_id) -> bool:
+        with self._lock:
+            return bool(self._tenants.get(tenant_id))
+
+    def candidates(self, tenant_id, skill=None, limit=DEFAULT_CANDIDATE_LIMIT) -> list:
+        """Return up to `limit` agent ids of available, skill-eligible agents ordered by load."""
+        required = 0
+        if skill:
+            bit = SkillCatalogue.bit_for(tenant_id, skill)
+            if bit is None:
+                return []
+            required = 1 << bit
+        with self._lock:
+            agents = self._tenants.get(tenant_id) or {}
+            ranked = heapq.nsmallest(
+                limit,
+                (
+                    (state.current_load, agent_id)
+                    for agent_id, state in agents.items()
+                    if state.status == "available" and state.skill_mask & required == required
+                ),
+            )
+        return [agent_id for _, agent_id in ranked]
+
+    def _subscribe(self):
+        pubsub = self._redis.pubsub(ignore_subscribe_messages=True)
+        pubsub.subscribe(AGENT_CHANGES_CHANNEL)
+        return pubsub
+
+    def _run(self, pubsub):
+        with self._app.app_context():
+            self._listen(pubsub)
+
+    def _listen(self, pubsub):
+        while not self._stop.is_set():
+            try:
+                message = pubsub.get_message(timeout=1.0)
+                if message is None:
+                    continue
+                change = json.loads(message["data"])
+                self.apply(
+                    change["tenant_id"],
+                    change["agent_id"],
+                    status=change.get("status"),
+                    skill_mask=change.get("skill_mask"),
+                    current_load=change.get("current_load"),
+                )
+            except Exception as e:
+                # Changes published while disconnected are lost, so resubscribe and rebuild the snapshot
+                logger.exception(f"Agent view listener failed, resynchronizing: {e}")
+                time.sleep(1.0)
+                try:
+                    pubsub.close()
+                    pubsub = self._subscribe()
+                    self.bootstrap()
+                except Exception as e:
+                    logger.error(f"Agent view resynchronization failed: {e}")
+        pubsub.close()
@@ -0,0 +1,58 @@
+import time
+from ..extensions import redis_client
+
+# Tenants with at least one heartbeating agent, so the sweeper never scans the keyspace
+TENANTS_KEY = "presence:tenants"
+
+
+class Presence:
+    """Per-tenant Redis sorted sets of agent last-seen times (epoch ms), fed by heartbeats only."""
+
+    @staticmethod
+    def key(tenant_id: str) -> str:
+        return f"presence:{tenant_id}"
+
+    @staticmethod
+    def touch(tenant_id: str, agent_id: str, seen_ms=None):
+        Presence.touch_many([(tenant_id, agent_id, seen_ms)])
+
+    @staticmethod
+    def touch_many(heartbeats: list):
+        """
+        Record (tenant_id, agent_id, seen_ms) heartbeats in one round trip; seen_ms defaults to now.
+
+        GT keeps the latest time when heartbeats arrive out of order.
+        """
+        if not heartbeats:
+            return
+        now_ms = int(time.time() * 1000)
+        by_tenant = {}
+        for tenant_id, agent_id, seen_ms in heartbeats:
+            seen = by_tenant.setdefault(tenant_id, {})
+            seen[agent_id] = max(seen.get(agent_id, 0), seen_ms or now_ms)
+        pipe = redis_client.pipeline()
+        pipe.sadd(TENANTS_KEY, *by_tenant)
+        for tenant_id, seen in by_tenant.items():
+            pipe.zadd(Presence.key(tenant_id), seen, gt=True)
+        pipe.execute()
+
+    @staticmethod
+    def stale(cutoff_ms: int) -> dict:
+        """{tenant_id: [agent_id]} of agents last seen at or before cutoff_ms, in two round trips."""
+        tenants = sorted(redis_client.client.smembers(TENANTS_KEY))
+        if not tenants:
+            return {}
+        pipe = redis_client.pipeline()
+        for tenant_id in tenants:
+            pipe.zrangebyscore(Presence.key(tenant_id), "-inf", cutoff_ms)
+        return {tenant_id: agents for tenant_id, agents in zip(tenants, pipe.execute()) if agents}
+
+    @staticmethod
+    def forget(tenant_ids: list, cutoff_ms: int):
+        """Drop entries last seen at or before cutoff_ms; agents that heartbeated since keep theirs."""
+        if not tenant_ids:
+            return
+        pipe = redis_client.pipeline()
+        for tenant_id in tenant_ids:
+            pipe.zremrangebyscore(Presence.key(tenant_id), "-inf", cutoff_ms)
+        pipe.execute()
@@ -0,0 +1,115 @@
+"""
+Retention of finished work, so the hot tables only hold live routing state.
+
+Customers completed more than COMPLETED_ARCHIVE_AFTER seconds ago are archived: their assignments are
+copied to `assignment_history` and both rows deleted. History older than ASSIGNMENT_HISTORY_RETENTION_DAYS
+and outbox events sent more than OUTBOX_SENT_RETENTION seconds ago are deleted. Everything runs in chunks of
+RETENTION_CHUNK_SIZE rows, one short transaction each with a pause in between; on Postgres each chunk also
+gives up after RETENTION_LOCK_TIMEOUT seconds waiting for a lock instead of queueing behind (and blocking)
+routing writes, and expired history goes by dropping whole monthly partitions.
+"""
+import logging
+import time
+from datetime import datetime, timedelta
+from flask import current_app
+from sqlalchemy import text
+from sqlalchemy.exc import OperationalError
+from ..extensions import db
+from ..repositories import AssignmentCache, AssignmentHistoryRepository, OutboxRepository
+from ..utils import metrics
+
+logger = logging.getLogger("retention")
+
+# SQLSTATE of a statement cancelled by lock_timeout
+LOCK_NOT_AVAILABLE = "55P03"
+
+RETENTION_ROWS = metrics.counter("retention_rows", "Rows archived or deleted by the retention job", ("table", "action"))
+
+
+class RetentionService:
+    """Chunked archival and purging of completed assignments, their history and sent outbox events."""
+
+    @staticmethod
+    def run(now=None, stop=None) -> dict:
+        """
+        One retention pass; returns row counts per step. `stop` is polled between chunks so a worker can
+        shut down in the middle of a large backlog, which the next pass picks up.
+        """
+        now = now or datetime.utcnow()
+        config = current_app.config
+        chunk = config.get("RETENTION_CHUNK_SIZE", 1000)
+        history = AssignmentHistoryRepository()
+        postgres = db.session.get_bind().dialect.name == "postgresql"
+        report = {}
+
+        if postgres:
+            # Before archiving, so rows never land in the default partition and block creating their month's
+            RetentionService._transaction(lambda: history.ensure_partitions(now))
+        archive_before = now - timedelta(seconds=config.get("COMPLETED_ARCHIVE_AFTER", 300))
+        report["archived"] = RetentionService._chunked(
+            lambda: history.archive_completed(archive_before, chunk, now), chunk, stop,
+            # Lookups of an archived customer now miss instead of returning its last assignment
+            committed=AssignmentCache.invalidate_many,
+        )
+        RETENTION_ROWS.labels("assignments", "archived").inc(report["archived"])
+
+        history_days = config.get("ASSIGNMENT_HISTORY_RETENTION_DAYS", 90)
+        if history_days:
+            history_before = now - timedelta(days=history_days)
+            if postgres:
+                dropped = RetentionService._transaction(lambda: history.drop_partitions(history_before)) or []
+                report["partitions_dropped"] = len(dropped)
+                if dropped:
+                    logger.info(f"Dropped expired history partitions {', '.join(dropped)}")
+            # Elsewhere the whole purge; on Postgres only stragglers in the default partition
+            report["history_purged"] = RetentionService._chunked(
+                lambda: history.purge_history(history_before, chunk), chunk, stop,
+            )
+            RETENTION_ROWS.labels("assignment_history", "deleted").inc(report["history_purged"])
+
+        outbox_seconds = config.get("OUTBOX_SENT_RETENTION", 86400)
+        if outbox_seconds:
+            outbox_before = now - timedelta(seconds=outbox_seconds)
+            report["outbox_purged"] = RetentionService._chunked(
+                lambda: OutboxRepository().purge_sent(outbox_before, chunk), chunk, stop,
+            )
+            RETENTION_ROWS.labels("outbox_events", "deleted").inc(report["outbox_purged"])
+        return report
+
+    @staticmethod
+    def _chunked(step, chunk: int, stop=None, committed=None) -> int:
+        """
+        Run `step` (the rows, or row count, handled in one transaction) until a chunk comes back short;
+        `committed` gets each chunk's rows once committed. Returns the total row count.
+        """
+        pause = current_app.config.get("RETENTION_CHUNK_PAUSE", 0.05)
+        total = 0
+        while stop is None or not stop():
+            rows = RetentionService._transaction(step)
+            if rows is None:
+                break
+            if committed is not None:
+                committed(rows)
+            handled = rows if isinstance(rows, int) else len(rows)
+            total += handled
+            if handled < chunk:
+                break
+            time.sleep(pause)
+        return total
+
+    @staticmethod
+    def _transaction(step):
+        """Run `step` in its own bounded-lock transaction and commit; None when it hit the lock timeout."""
+        try:
+            if db.session.get_bind().dialect.name == "postgresql":
+                timeout_ms = int(current_app.config.get("RETENTION_LOCK_TIMEOUT", 2.0) * 1000)
+                db.session.execute(text(f"SET LOCAL lock_timeout = {timeout_ms}"))
+            result = step()
+            db.session.commit()
+            return result
+        except OperationalError as e:
+            db.session.rollback()
+            if getattr(e.orig, "sqlstate", None) != LOCK_NOT_AVAILABLE:
+                raise
+            logger.warning(f"Retention step gave up waiting for a lock, retrying next pass: {e.orig}")
+            return None
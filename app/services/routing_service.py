@@ -1,83 +1,409 @@
-import json
-import random
+import logging
+import time
+from collections import defaultdict
 from datetime import datetime
 from http import HTTPStatus
-from sqlalchemy import select
+from flask import current_app
 from ..extensions import db, redis_client, kafka_producer
-from ..models import Agent, Assignment, Customer, CustomerStatus
+from ..models import Assignment, CustomerStatus, OutboxEvent
+from ..repositories import AgentRepository, AssignmentCache, AssignmentRepository, CustomerRepository, OutboxRepository
+from ..utils import metrics
+from ..utils.codec import ASSIGNMENT, encode
+from ..utils.tracing import ASSIGNED, CONSUMED, ENQUEUED, PARKED
+from .agent_cache import AgentCache
+from .agent_index import AgentAvailabilityIndex, DEFAULT_CANDIDATE_LIMIT
+from .waiting_queue import WaitingQueue
+
+logger = logging.getLogger("routing_service")
+
+# claim (index script: candidate scan + reservation), db_candidates/reserve (cold-cache fallback), park, dispatch,
+# mark_in_progress, db_commit, cache_write and produce
+ROUTING_STAGE = metrics.histogram("routing_stage_seconds", "Time spent in each routing step", ("stage",))
+ROUTING_LATENCY = metrics.histogram("routing_seconds", "End-to-end routing call latency", ("path",))
+ROUTING_RESULTS = metrics.counter("routing_results", "Routing outcomes per request", ("path", "status"))
+# From the trace headers stamped at enqueue: time spent in Kafka, and until an agent was assigned
+QUEUE_WAIT = metrics.histogram(
+    "routing_queue_wait_seconds", "Enqueue to router pickup per tenant", ("tenant_id",), buckets=metrics.WAIT_BUCKETS,
+)
+ENQUEUE_TO_ASSIGNMENT = metrics.histogram(
+    "routing_enqueue_to_assignment_seconds", "Enqueue to agent assignment per tenant", ("tenant_id",),
+    buckets=metrics.WAIT_BUCKETS,
+)
+
+# Routing outcomes after which a request needs no redelivery: assigned now, or parked for agent-driven dispatch
+SETTLED_STATUSES = ("assigned", "queued")
 
 
 class RoutingService:
     """Handles customer-to-agent assignment logic and Kafka event dispatch."""
 
     @staticmethod
-    def assign_customer(customer_id: str, tenant_id: str, requested_skill=None, topic=None):
-        """Select an agent for a given customer and emit to Kafka."""
-        # Step 1: Retrieve eligible agents (available or least loaded)
-        available_agents = RoutingService._get_available_agents(tenant_id, requested_skill)
-        if not available_agents:
-            return {"status": "no_agents_available"}, HTTPStatus.ACCEPTED
-
-        # Step 2: Simple load-balancing - pick the least loaded or random
-        agent = min(available_agents, key=lambda a: a.get("current_load", 0) or 0)
-
-        # Step 3: Atomically reserve the agent
-        if not RoutingService._reserve_agent(agent["agent_id"], tenant_id):
-            return {"status": "reservation_conflict_retry"}, HTTPStatus.CONFLICT
-
-        # Step 4: Persist assignment
-        assignment = Assignment(
-            customer_uid=customer_id,
-            agent_uid=agent["agent_id"],
-            tenant_id=tenant_id,
-            created_at=datetime.utcnow(),
-            updated_at=datetime.utcnow(),
-        )
-        db.session.add(assignment)
-        RoutingService._mark_customer_in_progress(customer_id, tenant_id)
-        db.session.commit()
-
-        # Step 5: Emit Kafka event for confirmation
-        topic = topic or "customer.assignments"
-        payload = {
-            "timestamp": datetime.utcnow().isoformat(),
+    def assign_customer(customer_id: str, tenant_id: str, requested_skill=None, topic=None, agent_view=None,
+                        priority=0, trace=None):
+        """
+        Select an agent for a given customer and emit to Kafka, or park the customer until one frees up.
+
+        `trace` is the request's Trace; it travels with a parked customer and ends up in the assignment
+        event's headers.
+        """
+        start = time.perf_counter()
+        RoutingService._observe_queue_wait(tenant_id, trace)
+        # Step 1: Select, reserve and load-bump the best eligible agent in one round trip
+        park = WaitingQueue.park_args(tenant_id, customer_id, requested_skill, priority)
+        agent = RoutingService._claim_agent(tenant_id, requested_skill, agent_view, park)
+        if agent is None:
+            if trace is not None:
+                RoutingService._stash_traces(tenant_id, {customer_id: trace})
+            RoutingService._observe("single", start, queued=1)
+            return {"status": "queued"}, HTTPStatus.ACCEPTED
+
+        # Step 2: Persist assignment
+        now = datetime.utcnow()
+        assignment = RoutingService._new_assignment(customer_id, tenant_id, agent["agent_id"], now)
+        RoutingService._mark_customers_in_progress(tenant_id, [(customer_id, requested_skill, priority)], now)
+
+        # Step 3: Commit, and emit the Kafka event for confirmation (through the outbox when enabled)
+        RoutingService._commit_assignments([assignment], topic, {customer_id: trace} if trace else None)
+
+        RoutingService._observe("single", start, assigned=1)
+        return {"status": "assigned", "agent": agent}, HTTPStatus.OK
+
+    @staticmethod
+    def assign_batch(requests: list, topic=None, agent_view=None, traces=None) -> list:
+        """
+        Route a batch of requests grouped by tenant: pipelined claims per tenant, one DB
+        transaction for every assignment and customer update, and one bulk produce (or outbox insert).
+
+        `traces` optionally holds each request's Trace (or None), in input order.
+        Returns a (result, status) tuple per request, in input order.
+        """
+        start = time.perf_counter()
+        traces = traces or [None] * len(requests)
+        results = [({"status": "queued"}, HTTPStatus.ACCEPTED)] * len(requests)
+        by_tenant = defaultdict(list)
+        for i, req in enumerate(requests):
+            by_tenant[req["tenant_id"]].append(i)
+            RoutingService._observe_queue_wait(req["tenant_id"], traces[i])
+
+        now = datetime.utcnow()
+        created, assigned_traces, claimed = [], {}, []
+        try:
+            for tenant_id, indexes in by_tenant.items():
+                skills = [requests[i].get("requested_skill") for i in indexes]
+                parks = [
+                    WaitingQueue.park_args(tenant_id, requests[i]["customer_id"], skill, requests[i].get("priority"))
+                    for i, skill in zip(indexes, skills)
+                ]
+                if agent_view is not None and agent_view.has_tenant(tenant_id):
+                    # Rank locally; widen the lists so later requests can step past agents claimed earlier in the batch
+                    limit = DEFAULT_CANDIDATE_LIMIT + len(indexes)
+                    ranked = [agent_view.candidates(tenant_id, skill, limit) for skill in skills]
+                    with ROUTING_STAGE.labels("claim").time():
+                        claims = AgentAvailabilityIndex.claim_from_many(tenant_id, list(zip(ranked, parks)))
+                    RoutingService._apply_claims(agent_view, tenant_id, claims)
+                else:
+                    with ROUTING_STAGE.labels("claim").time():
+                        claims = AgentAvailabilityIndex.claim_many(tenant_id, list(zip(skills, parks)))
+                customer_ids, parked_traces = [], {}
+                cache_state = None
+                for i, skill, park, (outcome, agent) in zip(indexes, skills, parks, claims):
+                    customer_id = requests[i]["customer_id"]
+                    if outcome == "empty":
+                        # Checked once per tenant and batch: a cold tenant is rewarmed at most once
+                        cache_state = cache_state or AgentCache.ensure_warm(tenant_id)
+                        agent = RoutingService._claim_cold(tenant_id, skill, park, cache_state)
+                    if agent is None:
+                        if traces[i] is not None:
+                            parked_traces[customer_id] = traces[i]
+                        continue
+                    # Only a DB fallback claim (another process is rewarming) leaves the indexed load alone
+                    claimed.append((tenant_id, agent["agent_id"], outcome == "claimed" or cache_state == "warmed"))
+                    if traces[i] is not None:
+                        assigned_traces[customer_id] = traces[i]
+                    created.append(RoutingService._new_assignment(customer_id, tenant_id, agent["agent_id"], now))
+                    customer_ids.append((customer_id, skill, requests[i].get("priority") or 0))
+                    results[i] = ({"status": "assigned", "agent": agent}, HTTPStatus.OK)
+                if customer_ids:
+                    RoutingService._mark_customers_in_progress(tenant_id, customer_ids, now)
+                RoutingService._stash_traces(tenant_id, parked_traces)
+            committed = RoutingService._persist_assignments(created, topic, assigned_traces)
+        except Exception:
+            # Parked customers stay parked (re-parking keeps their place); claimed agents are handed back
+            db.session.rollback()
+            RoutingService._release_claims(claimed)
+            raise
+        RoutingService._publish_assignments(*committed, assigned_traces)
+        RoutingService._observe("batch", start, assigned=len(created), queued=len(requests) - len(created))
+        return results
+
+    @staticmethod
+    def _new_assignment(customer_id, tenant_id, agent_id, now) -> dict:
+        """Insert row for a new assignment; `_commit_assignments` upserts and caches it."""
+        return {
+            "customer_uid": customer_id,
+            "agent_uid": agent_id,
             "tenant_id": tenant_id,
-            "customer_id": customer_id,
-            "agent_id": agent["agent_id"],
-            "status": "assigned",
+            "created_at": now,
+            "updated_at": now,
         }
 
-        producer = kafka_producer.producer
-        producer.produce(topic, key=customer_id.encode(), value=json.dumps(payload).encode())
-        producer.poll(0)
+    @staticmethod
+    def _commit_assignments(rows: list, topic=None, traces=None):
+        """
+        Upsert the new assignments and commit the routing transaction, write them through to the read cache
+        and announce them on the assignments topic, with each customer's trace ({customer_id: Trace}) in the headers.
 
-        return {"status": "assigned", "agent": agent}, HTTPStatus.OK
+        A customer routed again keeps its assignment row, which takes the new agent and updated_at.
+        With ASSIGNMENT_OUTBOX the events are inserted into the outbox inside the same transaction, so an
+        assignment is never committed without its event; the outbox relay produces them. Otherwise they are
+        produced straight after the commit and a failed delivery is only logged.
+        """
+        committed = RoutingService._persist_assignments(rows, topic, traces)
+        RoutingService._publish_assignments(*committed, traces)
 
     @staticmethod
-    def _get_available_agents(tenant_id, skill=None):
-        """Retrieve available agents from Redis or DB fallback."""
-        r = redis_client.client
-        pattern = f"agent:{tenant_id}:*"
-        agents = []
-        for key in r.scan_iter(match=pattern):
-            info = r.hgetall(key)
-            if info.get("status") != "available":
-                continue
-            if skill and skill not in (info.get("skills") or ""):
+    def _persist_assignments(rows: list, topic=None, traces=None):
+        """The transactional half of `_commit_assignments`; returns what `_publish_assignments` needs."""
+        with ROUTING_STAGE.labels("db_commit").time():
+            # One statement for the batch; RETURNING gives ids and stored created_at without a reload
+            assignments = AssignmentRepository().upsert_many(rows)
+            views = [Assignment.view(a) for a in assignments]
+            events = RoutingService._assignment_events(topic, assignments, traces)
+            if current_app.config.get("ASSIGNMENT_OUTBOX"):
+                OutboxRepository().add_many([OutboxEvent.row(*event, created_at=a.updated_at)
+                                             for event, a in zip(events, assignments)])
+            db.session.commit()
+        return assignments, views, events
+
+    @staticmethod
+    def _publish_assignments(assignments: list, views: list, events: list, traces=None):
+        """The post-commit half of `_commit_assignments`: cache write-through, produce and latency metrics."""
+        with ROUTING_STAGE.labels("cache_write").time():
+            AssignmentCache.put_many(views, ttl=current_app.config.get("ASSIGNMENT_CACHE_TTL", 3600))
+        if not current_app.config.get("ASSIGNMENT_OUTBOX"):
+            with ROUTING_STAGE.labels("produce").time():
+                RoutingService._emit_assignments(events)
+        for a in assignments:
+            trace = traces.get(a.customer_uid) if traces else None
+            elapsed = trace.seconds(ENQUEUED, ASSIGNED) if trace is not None else None
+            if elapsed is not None:
+                ENQUEUE_TO_ASSIGNMENT.labels(a.tenant_id).observe(elapsed)
+
+    @staticmethod
+    def _assignment_events(topic, assignments: list, traces=None) -> list:
+        """Encoded (topic, key, payload, headers) assignment event per new assignment, trace headers included."""
+        topic = topic or "customer.assignments"
+        codec = current_app.config.get("KAFKA_CODEC", "json")
+        events = []
+        for a in assignments:
+            trace = traces.get(a.customer_uid) if traces else None
+            payload, headers = encode(ASSIGNMENT, {
+                "timestamp": a.updated_at.isoformat(),
+                "tenant_id": a.tenant_id,
+                "customer_id": a.customer_uid,
+                "agent_id": a.agent_uid,
+                "status": "assigned",
+            }, codec)
+            if trace is not None:
+                headers += trace.stamp(ASSIGNED).headers()
+            events.append((topic, a.customer_uid, payload, headers))
+        return events
+
+    @staticmethod
+    def _emit_assignments(events: list):
+        """Produce encoded assignment events; delivery is reported off-thread."""
+        for topic, customer_id, payload, headers in events:
+            future = kafka_producer.send(topic, payload, key=customer_id.encode(), headers=headers)
+            future.add_done_callback(lambda f, customer_id=customer_id: _log_undelivered(f, customer_id))
+
+    @staticmethod
+    def _claim_agent(tenant_id, skill=None, agent_view=None, park=None):
+        """
+        Claim an agent via the atomic index script, falling back to DB candidates on a cold cache.
+
+        When no agent can be claimed the customer described by `park` is left in its waiting queue.
+        """
+        if agent_view is not None and agent_view.has_tenant(tenant_id):
+            # Rank from the in-process view; only the claim (or park) itself goes to Redis
+            candidates = agent_view.candidates(tenant_id, skill)
+            with ROUTING_STAGE.labels("claim").time():
+                claim = AgentAvailabilityIndex.claim_from(tenant_id, candidates, park=park)
+            RoutingService._apply_claims(agent_view, tenant_id, [claim])
+            return claim[1]
+        with ROUTING_STAGE.labels("claim").time():
+            outcome, agent = AgentAvailabilityIndex.claim(tenant_id, skill, park=park)
+        if outcome != "empty":
+            return agent
+        return RoutingService._claim_cold(tenant_id, skill, park, AgentCache.ensure_warm(tenant_id))
+
+    @staticmethod
+    def _claim_cold(tenant_id, skill, park, cache_state):
+        """
+        Settle a request whose claim found an empty index, given `AgentCache.ensure_warm`'s verdict: retry the
+        index once it was just rewarmed, trust it when recently warm, and only while another process rewarms
+        it claim from a bounded, skill-filtered DB query. Parks the customer when no agent is claimed.
+        """
+        agent = None
+        if cache_state == "warmed":
+            with ROUTING_STAGE.labels("claim").time():
+                outcome, agent = AgentAvailabilityIndex.claim(tenant_id, skill, park=park)
+            if outcome != "empty":
+                return agent
+        elif cache_state == "warming":
+            agent = RoutingService._claim_db_agent(tenant_id, skill)
+        if agent is None and park:
+            RoutingService._park(park)
+        return agent
+
+    @staticmethod
+    def _park(park):
+        with ROUTING_STAGE.labels("park").time():
+            WaitingQueue.park(park)
+
+    @staticmethod
+    def _stash_traces(tenant_id, traces: dict):
+        """Stamp parked customers' traces and keep them in Redis until dispatch; tracing never fails routing."""
+        if not traces:
+            return
+        try:
+            WaitingQueue.stash_traces(
+                tenant_id,
+                {customer_id: trace.stamp(PARKED) for customer_id, trace in traces.items()},
+                ttl=current_app.config.get("TRACE_PARKED_TTL", 86400),
+            )
+        except Exception as e:
+            logger.warning(f"Could not stash traces of {len(traces)} parked customers: {e}")
+
+    @staticmethod
+    def _observe_queue_wait(tenant_id, trace):
+        elapsed = trace.seconds(ENQUEUED, CONSUMED) if trace is not None else None
+        if elapsed is not None:
+            QUEUE_WAIT.labels(tenant_id).observe(elapsed)
+
+    @staticmethod
+    def _observe(path, start, assigned=0, queued=0):
+        ROUTING_LATENCY.labels(path).observe(time.perf_counter() - start)
+        if assigned:
+            ROUTING_RESULTS.labels(path, "assigned").inc(assigned)
+        if queued:
+            ROUTING_RESULTS.labels(path, "queued").inc(queued)
+
+    @staticmethod
+    def dispatch_waiting(tenant_id: str, agent_id: str, skills: list, topic=None):
+        """Assign the highest-priority waiting customer the agent can serve, if any."""
+        start = time.perf_counter()
+        with ROUTING_STAGE.labels("dispatch").time():
+            dispatched = WaitingQueue.dispatch(tenant_id, agent_id, skills)
+        if dispatched is None:
+            return None
+        customer_id, agent, trace, parked = dispatched
+
+        now = datetime.utcnow()
+        traces = {customer_id: trace} if trace else None
+        try:
+            assignment = RoutingService._new_assignment(customer_id, tenant_id, agent_id, now)
+            RoutingService._mark_customers_in_progress(tenant_id, [(customer_id, None, None)], now)
+            committed = RoutingService._persist_assignments([assignment], topic, traces)
+        except Exception:
+            db.session.rollback()
+            RoutingService._undo_dispatches([(tenant_id, agent_id, dispatched)])
+            raise
+        RoutingService._publish_assignments(*committed, traces)
+
+        RoutingService._observe("dispatch", start, assigned=1)
+        return {"status": "assigned", "customer_id": customer_id, "agent": agent}
+
+    @staticmethod
+    def dispatch_waiting_many(agents: list, topic=None) -> int:
+        """
+        `dispatch_waiting` for many (tenant_id, agent_id, skills) agents: one pipelined dispatch round
+        trip, one DB transaction and one bulk produce (or outbox insert). Returns the number of customers assigned.
+        """
+        start = time.perf_counter()
+        now = datetime.utcnow()
+        created, traces, undos = [], {}, []
+        by_tenant = defaultdict(list)
+        with ROUTING_STAGE.labels("dispatch").time():
+            outcomes = WaitingQueue.dispatch_many(agents)
+        for (tenant_id, agent_id, _), dispatched in zip(agents, outcomes):
+            if dispatched is None:
                 continue
-            try:
-                info["current_load"] = int(info.get("current_load", 0))
-            except ValueError:
-                info["current_load"] = 0
-            agents.append(info)
+            customer_id, _agent, trace, _parked = dispatched
+            if trace is not None:
+                traces[customer_id] = trace
+            undos.append((tenant_id, agent_id, dispatched))
+            created.append(RoutingService._new_assignment(customer_id, tenant_id, agent_id, now))
+            by_tenant[tenant_id].append((customer_id, None, None))
+        if not created:
+            return 0
+        try:
+            for tenant_id, customers in by_tenant.items():
+                RoutingService._mark_customers_in_progress(tenant_id, customers, now)
+            committed = RoutingService._persist_assignments(created, topic, traces)
+        except Exception:
+            db.session.rollback()
+            RoutingService._undo_dispatches(undos)
+            raise
+        RoutingService._publish_assignments(*committed, traces)
+        RoutingService._observe("dispatch", start, assigned=len(created))
+        return len(created)
+
+    @staticmethod
+    def _undo_dispatches(dispatches: list):
+        """
+        Hand (tenant_id, agent_id, dispatched) dispatches whose assignments were not committed back: the customers
+        return to their queues with their original scores and traces, and the agents' reservations and load
+        bumps are undone. A Redis failure here is logged; the reservations then lapse after their TTL.
+        """
+        try:
+            WaitingQueue.undispatch_many(
+                [(tenant_id, agent_id, d[0], d[3], d[2]) for tenant_id, agent_id, d in dispatches],
+                trace_ttl=current_app.config.get("TRACE_PARKED_TTL", 86400),
+            )
+        except Exception as e:
+            logger.error(f"Could not hand {len(dispatches)} failed dispatches back to their waiting queues: {e}")
+
+    @staticmethod
+    def _release_claims(claimed: list):
+        """Hand back (tenant_id, agent_id, bumped) claims of a batch that was not committed; see `_undo_dispatches`."""
+        try:
+            AgentAvailabilityIndex.release_many(claimed)
+        except Exception as e:
+            logger.error(f"Could not release {len(claimed)} agents claimed by a failed batch: {e}")
+
+    @staticmethod
+    def _claim_db_agent(tenant_id, skill=None):
+        """Reserve the least-loaded available agent with the skill, read from the database."""
+        with ROUTING_STAGE.labels("db_candidates").time():
+            candidates = RoutingService._get_db_agents(tenant_id, skill)
+        for candidate in candidates:
+            with ROUTING_STAGE.labels("reserve").time():
+                reserved = RoutingService._reserve_agent(candidate["agent_id"], tenant_id)
+            if reserved:
+                return candidate
+        return None
+
+    @staticmethod
+    def _apply_claims(agent_view, tenant_id, claims):
+        """Reflect our own claims locally without waiting for the change channel round trip."""
+        for outcome, agent in claims:
+            if outcome == "claimed":
+                agent_view.apply(tenant_id, agent["agent_id"], current_load=agent["current_load"])
+
+    @staticmethod
+    def _get_available_agents(tenant_id, skill=None, limit=DEFAULT_CANDIDATE_LIMIT):
+        """Retrieve the least-loaded available agents from the Redis index or DB fallback."""
+        agents = AgentAvailabilityIndex.candidates(tenant_id, skill, limit)
         # Fallback to DB if Redis empty
         if not agents:
-            rows = db.session.execute(
-                select(Agent).where(Agent.tenant_id == tenant_id, Agent.status == "available")
-            ).scalars().all()
-            agents = [a.to_dict() for a in rows]
+            agents = RoutingService._get_db_agents(tenant_id, skill, limit)
         return agents
 
+    @staticmethod
+    def _get_db_agents(tenant_id, skill=None, limit=DEFAULT_CANDIDATE_LIMIT):
+        """Load the least-loaded available agents with the skill straight from the database, one indexed query."""
+        return [a.to_dict() for a in AgentRepository().list_least_loaded(tenant_id, skill, limit)]
+
     @staticmethod
     def _reserve_agent(agent_id: str, tenant_id: str) -> bool:
         """Optimistic reservation to prevent two customers claiming same agent."""
@@ -88,11 +414,31 @@ class RoutingService:
         return bool(success)
 
     @staticmethod
-    def _mark_customer_in_progress(customer_id: str, tenant_id: str):
-        """Mark customer as being served."""
-        cust = db.session.execute(
-            select(Customer).where(Customer.customer_id == customer_id, Customer.tenant_id == tenant_id)
-        ).scalars().first()
-        if cust:
-            cust.status = CustomerStatus.IN_PROGRESS
-            cust.updated_at = datetime.utcnow()
+    def _mark_customers_in_progress(tenant_id: str, customers: list, now=None):
+        """
+        Mark (customer_id, requested_skill, priority) customers as being served with one set-based upsert;
+        a None skill or priority (a customer dispatched from a waiting queue) keeps the stored one.
+
+        Upserting rather than updating covers write-behind mode, where the customer row may not exist yet.
+        Only there can a late write race the router, so otherwise the newer-wins guard is skipped: an API
+        host whose clock runs ahead must not keep the customer Queued.
+        """
+        now = now or datetime.utcnow()
+        with ROUTING_STAGE.labels("mark_in_progress").time():
+            CustomerRepository().bulk_upsert([
+                {
+                    "customer_id": customer_id,
+                    "tenant_id": tenant_id,
+                    "requested_skill": requested_skill,
+                    "priority": None if priority is None else int(priority),
+                    "status": CustomerStatus.IN_PROGRESS,
+                    "updated_at": now,
+                }
+                for customer_id, requested_skill, priority in customers
+            ], newer_wins=bool(current_app.config.get("CUSTOMER_WRITE_BEHIND")))
+
+
+def _log_undelivered(future, customer_id):
+    # Runs on the producer's poll thread; the assignment itself is already committed
+    if future.exception() is not None:
+        logger.error(f"Assignment event for customer {customer_id} was not delivered: {future.exception()}")
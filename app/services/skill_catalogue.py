@@ -0,0 +1,84 @@
+import threading
+import time
+from sqlalchemy import func, select
+from sqlalchemy.exc import IntegrityError
+from ..extensions import db
+from ..models import Skill
+
+
+class SkillCatalogue:
+    """Interns each tenant's skill names to stable integer bit positions for bitmask matching."""
+
+    # (tenant_id, name) -> bit; bits never change once assigned, so the cache needs no invalidation
+    _bits = {}
+    # (tenant_id, name) -> monotonic time until which the skill is known not to exist; kept short because
+    # any agent upsert may intern it, and intern() clears it for its own process at once
+    _misses = {}
+    MISS_TTL = 5.0
+    MAX_MISSES = 10000
+    _lock = threading.Lock()
+
+    @staticmethod
+    def intern(tenant_id: str, names: list, retries: int = 3) -> list:
+        """Return Skill rows for `names`, creating missing ones with the tenant's next free bit."""
+        names = list(dict.fromkeys(names))
+        if not names:
+            return []
+        for attempt in range(retries):
+            skills = {
+                s.name: s for s in db.session.execute(
+                    select(Skill).where(Skill.tenant_id == tenant_id, Skill.name.in_(names))
+                ).scalars()
+            }
+            missing = [n for n in names if n not in skills]
+            if not missing:
+                break
+            try:
+                # Savepoint so a concurrent interner winning the unique race only rolls back our inserts
+                with db.session.begin_nested():
+                    next_bit = db.session.execute(
+                        select(func.coalesce(func.max(Skill.bit) + 1, 0)).where(Skill.tenant_id == tenant_id)
+                    ).scalar_one()
+                    for offset, name in enumerate(missing):
+                        skills[name] = Skill(tenant_id=tenant_id, name=name, bit=next_bit + offset)
+                        db.session.add(skills[name])
+                break
+            except IntegrityError:
+                if attempt == retries - 1:
+                    raise
+        with SkillCatalogue._lock:
+            for skill in skills.values():
+                SkillCatalogue._bits[(tenant_id, skill.name)] = skill.bit
+                SkillCatalogue._misses.pop((tenant_id, skill.name), None)
+        return [skills[n] for n in names]
+
+    @staticmethod
+    def bit_for(tenant_id: str, name: str):
+        """Bit position of a skill, or None when no agent of the tenant has ever declared it."""
+        key = (tenant_id, name)
+        bit = SkillCatalogue._bits.get(key)
+        if bit is not None:
+            return bit
+        if SkillCatalogue._misses.get(key, 0) > time.monotonic():
+            return None
+        bit = db.session.execute(
+            select(Skill.bit).where(Skill.tenant_id == tenant_id, Skill.name == name)
+        ).scalar_one_or_none()
+        with SkillCatalogue._lock:
+            if bit is not None:
+                SkillCatalogue._bits[key] = bit
+            else:
+                now = time.monotonic()
+                if len(SkillCatalogue._misses) >= SkillCatalogue.MAX_MISSES:
+                    # Requested skills are caller-supplied; keep the negative cache bounded
+                    SkillCatalogue._misses = {k: t for k, t in SkillCatalogue._misses.items() if t > now}
+                SkillCatalogue._misses[key] = now + SkillCatalogue.MISS_TTL
+        return bit
+
+    @staticmethod
+    def mask(skills) -> int:
+        """Fold Skill rows (or bit positions) into a single integer bitmask."""
+        mask = 0
+        for skill in skills:
+            mask |= 1 << (skill if isinstance(skill, int) else skill.bit)
+        return mask
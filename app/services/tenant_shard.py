@@ -0,0 +1,336 @@
+"""
+Router-local ownership of tenants for tenant-sharded routing (ROUTER_MODE=sharded).
+
+With ROUTING_SHARD_BY_TENANT every routing request and agent status event of a tenant lands on the same
+partition number of its topic, so the router that is assigned that partition is the only process that
+routes for the tenant. It keeps the tenant's agents and waiting customers in memory and picks agents
+without Redis reservation locks or claim scripts; the database and the Redis waiting queues remain the
+durable state, written before the in-memory state changes.
+
+Ownership moves with partitions: a tenant is loaded (DB agents, Redis waiting queues, live reservation
+locks) the first time its owner touches it, and on release its unexpired reservations are written back
+as `lock:agent` keys, so the next owner keeps honouring them.
+"""
+import heapq
+import logging
+import time
+from collections import defaultdict
+from datetime import datetime
+from http import HTTPStatus
+from ..models import AgentStatus
+from ..repositories import AgentRepository
+from ..utils import metrics
+from ..utils.partitioning import tenant_partition
+from .agent_index import RESERVATION_TTL, AgentAvailabilityIndex, parse_skills
+from .routing_service import ROUTING_STAGE, RoutingService
+from .waiting_queue import WaitingQueue
+
+logger = logging.getLogger("tenant_shard")
+
+OWNED_TENANTS = metrics.gauge("router_owned_tenants", "Tenants whose routing state this router holds")
+
+
+class OwnedAgent:
+    """Routing-relevant state of one agent of an owned tenant; reserved_until is epoch seconds."""
+
+    __slots__ = ("status", "skills", "current_load", "reserved_until")
+
+    def __init__(self, status, skills=(), current_load=0, reserved_until=0.0):
+        self.status = status
+        self.skills = frozenset(skills)
+        self.current_load = int(current_load or 0)
+        self.reserved_until = reserved_until
+
+    def eligible(self, now: float) -> bool:
+        return self.status == AgentStatus.AVAILABLE.value and self.reserved_until <= now
+
+
+class OwnedTenant:
+    """
+    Agents and waiting customers of one owned tenant.
+
+    `queues` holds a heap of (score, customer_id) per loaded waiting queue (skill, None for tenant-wide);
+    `waiting` maps each waiting customer to its (skill, score). Heap entries no longer in `waiting` are stale
+    and skipped.
+    """
+
+    __slots__ = ("agents", "queues", "waiting")
+
+    def __init__(self):
+        self.agents = {}
+        self.queues = {}
+        self.waiting = {}
+
+    def head(self, skill):
+        """Pop stale entries off a queue and return its best waiting (score, customer_id), or None."""
+        heap = self.queues.get(skill)
+        while heap:
+            score, customer_id = heap[0]
+            if self.waiting.get(customer_id) == (skill, score):
+                return heap[0]
+            heapq.heappop(heap)
+        return None
+
+
+class TenantShard:
+    """The tenants of the routing partitions currently assigned to this router."""
+
+    def __init__(self, partitions: int, reservation_ttl: int = RESERVATION_TTL):
+        self.partitions = partitions
+        self.reservation_ttl = reservation_ttl
+        self._owned = set()
+        self._tenants = {}
+        OWNED_TENANTS.set_function(lambda: len(self._tenants))
+
+    def owns(self, tenant_id: str) -> bool:
+        return tenant_partition(tenant_id, self.partitions) in self._owned
+
+    def own(self, partitions):
+        """Take ownership of partition numbers; their tenants are loaded lazily."""
+        self._owned.update(partitions)
+        logger.info(f"Owning routing partitions {sorted(self._owned)}")
+
+    def release(self, partitions):
+        """Hand partition numbers off: write the live reservations of their tenants back to Redis and forget them."""
+        partitions = set(partitions)
+        self._owned -= partitions
+        now = time.time()
+        for tenant_id in [t for t in self._tenants if tenant_partition(t, self.partitions) in partitions]:
+            state = self._tenants.pop(tenant_id)
+            remaining = {
+                agent_id: (agent.reserved_until - now) * 1000
+                for agent_id, agent in state.agents.items()
+                if agent.reserved_until - now >= 0.001
+            }
+            try:
+                AgentAvailabilityIndex.hold_reservations(tenant_id, remaining)
+            except Exception as e:
+                logger.error(f"Could not hand off {len(remaining)} reservations of tenant {tenant_id}: {e}")
+        logger.info(f"Released routing partitions {sorted(partitions)}")
+
+    def apply_status(self, updates: list) -> list:
+        """
+        Apply coalesced agent status updates (see agent_status_worker.coalesce) of owned tenants.
+
+        Returns (tenant_id, agent_id) of the agents the updates left available, for `dispatch`.
+        """
+        available = []
+        for u in updates:
+            tenant_id = u["tenant_id"]
+            if not self.owns(tenant_id):
+                continue
+            state = self._tenant(tenant_id)
+            agent = state.agents.get(u["agent_id"])
+            if agent is None:
+                agent = state.agents[u["agent_id"]] = OwnedAgent(u["status"])
+            agent.status = u["status"]
+            if u.get("skills") is not None:
+                agent.skills = frozenset(parse_skills(u["skills"]))
+                self._load_queues(tenant_id, state, agent.skills)
+            if isinstance(u.get("current_load"), int):
+                agent.current_load = max(u["current_load"], 0)
+            if agent.status == AgentStatus.AVAILABLE.value:
+                available.append((tenant_id, u["agent_id"]))
+        return available
+
+    def route(self, requests: list, topic=None, traces=None) -> list:
+        """
+        Route requests of owned tenants from local state: the least-loaded eligible agent, or park.
+
+        Parked customers are written to their Redis waiting queues and assignments, customer updates and
+        agent load bumps committed in one DB transaction before local state changes, so a failure (which
+        propagates; the caller rolls back) leaves the shard as it was. Returns a (result, status) tuple per
+        request, in input order.
+        """
+        start = time.perf_counter()
+        traces = traces or [None] * len(requests)
+        now = time.time()
+        by_tenant = defaultdict(list)
+        for i, req in enumerate(requests):
+            by_tenant[req["tenant_id"]].append(i)
+            RoutingService._observe_queue_wait(req["tenant_id"], traces[i])
+        states = {tenant_id: self._tenant(tenant_id) for tenant_id in by_tenant}
+
+        picks, parked = {}, []
+        for tenant_id, indexes in by_tenant.items():
+            state = states[tenant_id]
+            ranked = sorted((a.current_load, agent_id) for agent_id, a in state.agents.items() if a.eligible(now))
+            taken = set()
+            for i in indexes:
+                skill = requests[i].get("requested_skill")
+                agent_id = next((
+                    agent_id for _, agent_id in ranked
+                    if agent_id not in taken and (not skill or skill in state.agents[agent_id].skills)
+                ), None)
+                if agent_id is None:
+                    parked.append(i)
+                else:
+                    taken.add(agent_id)
+                    picks[i] = agent_id
+
+        # Persist: parks, then one DB transaction; nothing local has changed yet
+        parks = {}
+        for i in parked:
+            req = requests[i]
+            state = states[req["tenant_id"]]
+            self._load_queues(req["tenant_id"], state, [req.get("requested_skill")])
+            parks[i] = WaitingQueue.park_args(req["tenant_id"], req["customer_id"], req.get("requested_skill"),
+                                              req.get("priority"))
+        if parks:
+            with ROUTING_STAGE.labels("park").time():
+                WaitingQueue.park_many(list(parks.values()))
+        self._persist(
+            [(requests[i]["tenant_id"], requests[i]["customer_id"], agent_id, requests[i].get("requested_skill"),
+              requests[i].get("priority"), traces[i]) for i, agent_id in picks.items()],
+            states, topic,
+        )
+        parked_traces = defaultdict(dict)
+        for i in parked:
+            if traces[i] is not None:
+                parked_traces[requests[i]["tenant_id"]][requests[i]["customer_id"]] = traces[i]
+        for tenant_id, tenant_traces in parked_traces.items():
+            RoutingService._stash_traces(tenant_id, tenant_traces)
+
+        # Apply locally
+        results = []
+        for i, req in enumerate(requests):
+            state = states[req["tenant_id"]]
+            if i in picks:
+                agent = self._take(state, picks[i], now)
+                state.waiting.pop(req["customer_id"], None)
+                results.append(({"status": "assigned", "agent": {"agent_id": picks[i],
+                                                                  "current_load": agent.current_load}}, HTTPStatus.OK))
+                continue
+            if req["customer_id"] not in state.waiting:
+                skill, score = req.get("requested_skill") or None, parks[i][2]
+                state.waiting[req["customer_id"]] = (skill, score)
+                heapq.heappush(state.queues[skill], (score, req["customer_id"]))
+            results.append(({"status": "queued"}, HTTPStatus.ACCEPTED))
+        RoutingService._observe("sharded", start, assigned=len(picks), queued=len(parked))
+        return results
+
+    def dispatch(self, agents: list, topic=None) -> int:
+        """
+        Hand each available, unreserved (tenant_id, agent_id) agent the best waiting customer it can serve,
+        from local queues. Same persist-then-apply order as `route`. Returns the number of customers assigned.
+        """
+        start = time.perf_counter()
+        now = time.time()
+        popped, picks = [], []
+        for tenant_id, agent_id in dict.fromkeys(agents):
+            if not self.owns(tenant_id):
+                continue
+            state = self._tenant(tenant_id)
+            agent = state.agents.get(agent_id)
+            if agent is None or not agent.eligible(now):
+                continue
+            heads = [(state.head(skill), skill) for skill in [None, *agent.skills] if skill in state.queues]
+            heads = [(head, skill) for head, skill in heads if head is not None]
+            if not heads:
+                continue
+            (score, customer_id), skill = min(heads)
+            # Popped tentatively so other agents in this batch see the next customer; pushed back on failure
+            heapq.heappop(state.queues[skill])
+            popped.append((state, skill, score, customer_id))
+            picks.append((tenant_id, customer_id, agent_id, skill))
+        if not picks:
+            return 0
+
+        states = {tenant_id: self._tenants[tenant_id] for tenant_id, *_ in picks}
+        try:
+            traces = {}
+            for tenant_id in states:
+                traces.update(WaitingQueue.stashed_traces(tenant_id, [c for t, c, *_ in picks if t == tenant_id]))
+            self._persist(
+                [(tenant_id, customer_id, agent_id, skill, None, traces.get(customer_id))
+                 for tenant_id, customer_id, agent_id, skill in picks],
+                states, topic, dispatched=True,
+            )
+        except Exception:
+            for state, skill, score, customer_id in popped:
+                heapq.heappush(state.queues[skill], (score, customer_id))
+            raise
+
+        for tenant_id, customer_id, agent_id, _ in picks:
+            state = states[tenant_id]
+            self._take(state, agent_id, now)
+            state.waiting.pop(customer_id, None)
+        RoutingService._observe("dispatch", start, assigned=len(picks))
+        return len(picks)
+
+    def _persist(self, assignments: list, states: dict, topic, dispatched=False):
+        """
+        Commit (tenant_id, customer_id, agent_id, skill, priority, trace) assignments with their customer
+        updates and agent load bumps, then take the customers out of the Redis waiting queues they were in.
+        """
+        if not assignments:
+            return
+        now = datetime.utcnow()
+        created, traces = [], {}
+        by_tenant = defaultdict(list)
+        for tenant_id, customer_id, agent_id, skill, priority, trace in assignments:
+            created.append(RoutingService._new_assignment(customer_id, tenant_id, agent_id, now))
+            by_tenant[tenant_id].append((customer_id, agent_id, skill, priority))
+            if trace is not None:
+                traces[customer_id] = trace
+        repo = AgentRepository()
+        for tenant_id, rows in by_tenant.items():
+            # As in dispatch_waiting_many, dispatched customers keep their stored skill and priority
+            RoutingService._mark_customers_in_progress(
+                tenant_id, [(c, None if dispatched else s, None if dispatched else (p or 0)) for c, _, s, p in rows],
+                now,
+            )
+            repo.increment_loads(tenant_id, [agent_id for _, agent_id, _, _ in rows])
+        RoutingService._commit_assignments(created, topic, traces)
+
+        for tenant_id, rows in by_tenant.items():
+            waiting = states[tenant_id].waiting
+            removals = [(waiting[c][0], c) for c, _, _, _ in rows if c in waiting]
+            try:
+                WaitingQueue.remove_many(tenant_id, removals)
+            except Exception as e:
+                # Committed already; a leftover entry is only seen by a later owner, which re-dispatches it
+                logger.error(f"Could not remove {len(removals)} assigned customers of tenant {tenant_id} "
+                             f"from their waiting queues: {e}")
+
+    def _take(self, state, agent_id, now):
+        agent = state.agents[agent_id]
+        agent.current_load += 1
+        agent.reserved_until = now + self.reservation_ttl
+        return agent
+
+    def _tenant(self, tenant_id: str) -> OwnedTenant:
+        state = self._tenants.get(tenant_id)
+        if state is None:
+            state = self._tenants[tenant_id] = self._load(tenant_id)
+        return state
+
+    def _load(self, tenant_id: str) -> OwnedTenant:
+        """Agents from the DB, live reservation locks and the waiting queues of every skill the agents have."""
+        state = OwnedTenant()
+        now = time.time()
+        rows = AgentRepository().get_tenant_states(tenant_id)
+        reservations = AgentAvailabilityIndex.reservations(tenant_id, [row.agent_id for row in rows])
+        for row in rows:
+            state.agents[row.agent_id] = OwnedAgent(
+                AgentStatus(row.status).value,
+                parse_skills(row.skills),
+                row.current_load,
+                now + reservations[row.agent_id] / 1000 if row.agent_id in reservations else 0.0,
+            )
+        skills = set().union(*(a.skills for a in state.agents.values()))
+        self._load_queues(tenant_id, state, [None, *skills])
+        logger.info(f"Loaded tenant {tenant_id}: {len(rows)} agents, {len(state.waiting)} waiting customers")
+        return state
+
+    @staticmethod
+    def _load_queues(tenant_id, state, skills):
+        """Read waiting queues this tenant has not loaded yet from Redis."""
+        missing = list(dict.fromkeys(s or None for s in skills if (s or None) not in state.queues))
+        if not missing:
+            return
+        for skill, members in WaitingQueue.members(tenant_id, missing).items():
+            heap = [(score, customer_id) for customer_id, score in members]
+            state.queues[skill] = heap
+            for score, customer_id in heap:
+                state.waiting.setdefault(customer_id, (skill, score))
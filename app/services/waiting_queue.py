@@ -0,0 +1,200 @@
+import time
+from ..extensions import redis_client
+from ..utils.tracing import Trace
+from .agent_index import RESERVATION_TTL, _RELEASE_LUA, _TRY_CLAIM_LUA, AgentAvailabilityIndex
+
+# Scores order by priority first, then arrival: -priority * weight + arrival_ms stays exact within a
+# double's 53-bit mantissa for priorities up to MAX_PRIORITY.
+PRIORITY_WEIGHT = 10 ** 13
+MAX_PRIORITY = 899
+
+# Hand the highest-priority waiting customer across the agent's queues to the agent, if it can be claimed,
+# along with (and removing) the trace stashed when the customer was parked. The queue and (exact) score it
+# came from are returned so the dispatch can be undone.
+# KEYS = waiting queues the agent can serve; ARGV = tenant_id, agent_id, reservation ttl.
+_DISPATCH_LUA = _TRY_CLAIM_LUA + """
+local best_key, best_member, best_score, best_raw
+for _, key in ipairs(KEYS) do
+  local head = redis.call('ZRANGE', key, 0, 0, 'WITHSCORES')
+  if head[1] and (best_score == nil or tonumber(head[2]) < best_score) then
+    best_key, best_member, best_score, best_raw = key, head[1], tonumber(head[2]), head[2]
+  end
+end
+if not best_key then
+  return {'idle'}
+end
+local load = try_claim(ARGV[1], ARGV[2], tonumber(ARGV[3]))
+if not load then
+  return {'busy'}
+end
+redis.call('ZREM', best_key, best_member)
+local trace_key = 'trace:' .. ARGV[1] .. ':' .. best_member
+local trace = redis.call('GET', trace_key)
+if trace then
+  redis.call('DEL', trace_key)
+end
+return {'dispatched', best_member, load, best_key, best_raw, trace}
+"""
+
+# Put back a dispatched customer whose assignment was never committed, with its original score and trace,
+# and release the agent it claimed.
+# KEYS = the waiting queue it came from; ARGV = tenant_id, agent_id, customer_id, score, trace ttl[, trace].
+_UNDISPATCH_LUA = _RELEASE_LUA + """
+redis.call('ZADD', KEYS[1], 'NX', ARGV[4], ARGV[3])
+if ARGV[6] then
+  redis.call('SET', 'trace:' .. ARGV[1] .. ':' .. ARGV[3], ARGV[6], 'NX', 'EX', tonumber(ARGV[5]))
+end
+release(ARGV[1], ARGV[2])
+return 1
+"""
+
+
+class WaitingQueue:
+    """Per-tenant, per-skill Redis sorted sets of customers waiting for an agent."""
+
+    @staticmethod
+    def key(tenant_id: str, skill=None) -> str:
+        if skill:
+            return f"waiting:{tenant_id}:skill:{skill}"
+        return f"waiting:{tenant_id}"
+
+    @staticmethod
+    def score(priority=0, arrival_ms=None) -> int:
+        priority = min(max(int(priority or 0), 0), MAX_PRIORITY)
+        if arrival_ms is None:
+            arrival_ms = int(time.time() * 1000)
+        return -priority * PRIORITY_WEIGHT + arrival_ms
+
+    @staticmethod
+    def park_args(tenant_id: str, customer_id: str, skill=None, priority=0):
+        """(waiting key, member, score) for a customer, as accepted by the claim scripts."""
+        return WaitingQueue.key(tenant_id, skill), customer_id, WaitingQueue.score(priority)
+
+    @staticmethod
+    def park(park_args):
+        """Park a customer given its `park_args`; NX keeps the original arrival time if it is already waiting."""
+        key, member, score = park_args
+        redis_client.client.zadd(key, {member: score}, nx=True)
+
+    @staticmethod
+    def trace_key(tenant_id: str, customer_id: str) -> str:
+        return f"trace:{tenant_id}:{customer_id}"
+
+    @staticmethod
+    def stash_traces(tenant_id: str, traces: dict, ttl: int):
+        """
+        Keep the traces of parked customers ({customer_id: Trace}) until dispatch hands them back, in one
+        round trip. NX keeps the original trace of a customer that was already waiting.
+        """
+        if not traces:
+            return
+        pipe = redis_client.pipeline()
+        for customer_id, trace in traces.items():
+            pipe.set(WaitingQueue.trace_key(tenant_id, customer_id), trace.to_json(), nx=True, ex=ttl)
+        pipe.execute()
+
+    @staticmethod
+    def park_many(parks: list):
+        """`park` many customers given their `park_args`, in one round trip."""
+        if not parks:
+            return
+        pipe = redis_client.pipeline()
+        for key, member, score in parks:
+            pipe.zadd(key, {member: score}, nx=True)
+        pipe.execute()
+
+    @staticmethod
+    def members(tenant_id: str, queues: list) -> dict:
+        """{skill: [(customer_id, score)] in queue order} of the queues named by skill (None: tenant-wide), in one round trip."""
+        pipe = redis_client.pipeline()
+        for skill in queues:
+            pipe.zrange(WaitingQueue.key(tenant_id, skill), 0, -1, withscores=True)
+        return {
+            skill: [(member, int(score)) for member, score in members]
+            for skill, members in zip(queues, pipe.execute())
+        }
+
+    @staticmethod
+    def stashed_traces(tenant_id: str, customer_ids: list) -> dict:
+        """{customer_id: Trace} stashed for the given parked customers, in one round trip."""
+        if not customer_ids:
+            return {}
+        values = redis_client.client.mget([WaitingQueue.trace_key(tenant_id, c) for c in customer_ids])
+        traces = {}
+        for customer_id, value in zip(customer_ids, values):
+            trace = Trace.from_json(value)
+            if trace is not None:
+                traces[customer_id] = trace
+        return traces
+
+    @staticmethod
+    def remove_many(tenant_id: str, removals: list):
+        """Take (skill, customer_id) customers out of their waiting queues and drop their traces, in one round trip."""
+        if not removals:
+            return
+        pipe = redis_client.pipeline()
+        for skill, customer_id in removals:
+            pipe.zrem(WaitingQueue.key(tenant_id, skill), customer_id)
+            pipe.delete(WaitingQueue.trace_key(tenant_id, customer_id))
+        pipe.execute()
+
+    @staticmethod
+    def size(tenant_id: str, skill=None) -> int:
+        return redis_client.client.zcard(WaitingQueue.key(tenant_id, skill))
+
+    @staticmethod
+    def dispatch(tenant_id: str, agent_id: str, skills: list, ttl: int = RESERVATION_TTL):
+        """
+        Atomically pop the best waiting customer the agent can serve and claim the agent for it.
+
+        Returns (customer_id, agent, trace, parked) or None when nobody is waiting or the agent is already
+        reserved; trace is the customer's stashed Trace, if any, and parked the (waiting key, score) it was
+        popped from, for `undispatch_many`.
+        """
+        r = redis_client.client
+        keys = WaitingQueue._dispatch_keys(tenant_id, skills)
+        result = AgentAvailabilityIndex._script(r, _DISPATCH_LUA)(keys=keys, args=[tenant_id, agent_id, ttl], client=r)
+        return WaitingQueue._dispatch_result(agent_id, result)
+
+    @staticmethod
+    def dispatch_many(requests: list, ttl: int = RESERVATION_TTL) -> list:
+        """Pipeline one `dispatch` per (tenant_id, agent_id, skills) request into a single round trip."""
+        r = redis_client.client
+        script = AgentAvailabilityIndex._script(r, _DISPATCH_LUA)
+        pipe = redis_client.pipeline()
+        for tenant_id, agent_id, skills in requests:
+            script(keys=WaitingQueue._dispatch_keys(tenant_id, skills), args=[tenant_id, agent_id, ttl], client=pipe)
+        return [
+            WaitingQueue._dispatch_result(agent_id, result)
+            for (_, agent_id, _), result in zip(requests, pipe.execute())
+        ]
+
+    @staticmethod
+    def undispatch_many(undos: list, trace_ttl: int):
+        """
+        Undo (tenant_id, agent_id, customer_id, parked, trace) dispatches whose assignments failed to commit,
+        in one round trip: re-park each customer where it was, restore its trace and release the agent.
+        """
+        if not undos:
+            return
+        r = redis_client.client
+        script = AgentAvailabilityIndex._script(r, _UNDISPATCH_LUA)
+        pipe = redis_client.pipeline()
+        for tenant_id, agent_id, customer_id, (key, score), trace in undos:
+            args = [tenant_id, agent_id, customer_id, score, trace_ttl]
+            if trace is not None:
+                args.append(trace.to_json())
+            script(keys=[key], args=args, client=pipe)
+        pipe.execute()
+
+    @staticmethod
+    def _dispatch_keys(tenant_id, skills):
+        return [WaitingQueue.key(tenant_id)] + [WaitingQueue.key(tenant_id, s) for s in skills]
+
+    @staticmethod
+    def _dispatch_result(agent_id, result):
+        if result[0] != "dispatched":
+            return None
+        trace = Trace.from_json(result[5]) if len(result) > 5 else None
+        agent = {"agent_id": agent_id, "current_load": int(float(result[2]))}
+        return result[1], agent, trace, (result[3], result[4])
@@ -0,0 +1,199 @@
+"""
+Kafka message codecs, chosen per message by the `codec` header.
+
+    value, headers = encode(ROUTING_REQUEST, payload, codec="bin1")
+    payload = decode(msg.value(), msg.headers())
+
+Messages without a `codec` header are JSON, so consumers read every format and producers can switch
+KAFKA_CODEC once all consumers run this code. The `event_type` and `tenant_id` headers let consumers
+filter or route without decoding the body.
+"""
+import json
+import struct
+
+ROUTING_REQUEST = "routing.request"
+ASSIGNMENT = "assignment"
+AGENT_STATUS = "agent.status"
+HEARTBEAT = "agent.heartbeat"
+
+CODEC_HEADER = "codec"
+EVENT_TYPE_HEADER = "event_type"
+TENANT_HEADER = "tenant_id"
+
+
+class CodecError(ValueError):
+    """Raised for payloads a codec cannot decode or codec names nobody registered."""
+
+
+class JsonCodec:
+    name = "json"
+
+    def encode(self, event_type: str, value: dict) -> bytes:
+        return json.dumps(value).encode("utf-8")
+
+    def decode(self, payload: bytes) -> dict:
+        try:
+            value = json.loads(payload)
+        except ValueError as e:
+            raise CodecError(f"Invalid JSON payload: {e}")
+        if not isinstance(value, dict):
+            raise CodecError(f"JSON payload is a {type(value).__name__}, not an object")
+        return value
+
+
+class BinaryCodec:
+    """
+    Compact, versioned binary layout for the known event types:
+
+        version (u8) | schema id (u8) | flags (u8) | int fields (i32 each) | str lengths (u16 each)
+        | utf-8 str bytes | JSON extras (when flags & EXTRAS)
+
+    Field names are implied by the schema, so only values travel. None is a sentinel value; fields of
+    another type or out of range, and fields the schema does not know, go to the JSON extras section,
+    so no event is ever lost in encoding. Event types without a schema are all extras.
+    """
+
+    name = "bin1"
+    VERSION = 1
+    EXTRAS = 0x01
+    _NULL_INT = -(2 ** 31)
+    _NULL_STR = 0xFFFF
+
+    # schema id -> (event type, int fields, str fields); ids are part of the wire format, never reuse one
+    SCHEMAS = {
+        0: (None, (), ()),
+        1: (ROUTING_REQUEST, ("priority",), ("customer_id", "tenant_id", "requested_skill", "correlation_id",
+                                             "enqueued_at")),
+        2: (ASSIGNMENT, (), ("timestamp", "tenant_id", "customer_id", "agent_id", "status")),
+        3: (AGENT_STATUS, ("current_load",), ("agent_id", "tenant_id", "status", "skills")),
+        4: (HEARTBEAT, (), ("agent_id", "tenant_id")),
+    }
+
+    def __init__(self):
+        self._ids = {event_type: schema_id for schema_id, (event_type, _, _) in self.SCHEMAS.items()}
+        self._structs = {
+            schema_id: struct.Struct("<BBB" + "i" * len(ints) + "H" * len(strs))
+            for schema_id, (_, ints, strs) in self.SCHEMAS.items()
+        }
+
+    def encode(self, event_type: str, value: dict) -> bytes:
+        schema_id = self._ids.get(event_type, 0)
+        _, int_fields, str_fields = self.SCHEMAS[schema_id]
+        extras = {k: v for k, v in value.items() if k not in int_fields and k not in str_fields}
+
+        ints = []
+        for field in int_fields:
+            v = value.get(field)
+            if v is None:
+                ints.append(self._NULL_INT)
+            elif type(v) is int and self._NULL_INT < v < 2 ** 31:
+                ints.append(v)
+            else:
+                ints.append(self._NULL_INT)
+                extras[field] = v
+
+        lengths, chunks = [], []
+        for field in str_fields:
+            v = value.get(field)
+            data = v.encode("utf-8") if isinstance(v, str) else None
+            if data is None or len(data) >= self._NULL_STR:
+                lengths.append(self._NULL_STR)
+                if v is not None:
+                    extras[field] = v
+            else:
+                lengths.append(len(data))
+                chunks.append(data)
+
+        flags = self.EXTRAS if extras else 0
+        head = self._structs[schema_id].pack(self.VERSION, schema_id, flags, *ints, *lengths)
+        tail = json.dumps(extras).encode("utf-8") if extras else b""
+        return head + b"".join(chunks) + tail
+
+    def decode(self, payload: bytes) -> dict:
+        if len(payload) < 3:
+            raise CodecError(f"Truncated {self.name} payload of {len(payload)} bytes")
+        if payload[0] != self.VERSION:
+            raise CodecError(f"Unsupported {self.name} payload version {payload[:1].hex() or 'none'}")
+        schema = self.SCHEMAS.get(payload[1])
+        if schema is None:
+            raise CodecError(f"Unknown {self.name} schema id {payload[1]}")
+        _, int_fields, str_fields = schema
+        layout = self._structs[payload[1]]
+        try:
+            fields = layout.unpack_from(payload)
+        except struct.error as e:
+            raise CodecError(f"Truncated {self.name} payload: {e}")
+
+        value = {}
+        n_ints = len(int_fields)
+        for field, v in zip(int_fields, fields[3:3 + n_ints]):
+            value[field] = None if v == self._NULL_INT else v
+        offset = layout.size
+        for field, length in zip(str_fields, fields[3 + n_ints:]):
+            if length == self._NULL_STR:
+                value[field] = None
+                continue
+            if offset + length > len(payload):
+                raise CodecError(f"Truncated {self.name} payload: {field} needs {length} bytes at offset "
+                                 f"{offset} of {len(payload)}")
+            try:
+                value[field] = payload[offset:offset + length].decode("utf-8")
+            except UnicodeDecodeError as e:
+                raise CodecError(f"Invalid {self.name} string {field}: {e}")
+            offset += length
+        if fields[2] & self.EXTRAS:
+            try:
+                extras = json.loads(payload[offset:])
+            except ValueError as e:
+                raise CodecError(f"Invalid {self.name} extras section: {e}")
+            if not isinstance(extras, dict):
+                raise CodecError(f"Invalid {self.name} extras section: not an object")
+            value.update(extras)
+        elif offset != len(payload):
+            raise CodecError(f"{len(payload) - offset} unexpected trailing bytes in {self.name} payload")
+        return value
+
+
+CODECS = {}
+
+
+def register(codec):
+    """Make a codec available to encode() and to decode() by its `name` header value."""
+    CODECS[codec.name] = codec
+    return codec
+
+
+register(JsonCodec())
+register(BinaryCodec())
+
+
+def encode(event_type, value: dict, codec: str = "json"):
+    """Encode an event; returns (payload bytes, Kafka headers) with codec, event type and tenant headers."""
+    try:
+        impl = CODECS[codec]
+    except KeyError:
+        raise CodecError(f"Unknown codec {codec!r}")
+    headers = [(CODEC_HEADER, impl.name.encode())]
+    if event_type:
+        headers.append((EVENT_TYPE_HEADER, event_type.encode()))
+    if value.get("tenant_id"):
+        headers.append((TENANT_HEADER, str(value["tenant_id"]).encode("utf-8")))
+    return impl.encode(event_type, value), headers
+
+
+def decode(payload: bytes, headers=None) -> dict:
+    """Decode a payload with the codec named by its headers; messages without a codec header are JSON."""
+    name = header(headers, CODEC_HEADER) or JsonCodec.name
+    try:
+        impl = CODECS[name]
+    except KeyError:
+        raise CodecError(f"Unknown codec {name!r}")
+    return impl.decode(payload)
+
+
+def header(headers, name: str):
+    """First value of a Kafka header as a string, or None; `headers` is a message's headers() list."""
+    for key, value in headers or ():
+        if key == name:
+            return value.decode("utf-8") if isinstance(value, bytes) else value
+    return None
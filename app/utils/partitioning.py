@@ -0,0 +1,24 @@
+"""
+Tenant-to-partition mapping shared by every producer and consumer of the tenant-sharded topics.
+
+With ROUTING_SHARD_BY_TENANT, routing requests and agent status events of a tenant go to partition
+
+    crc32(utf-8 tenant_id) mod ROUTING_PARTITIONS
+
+of customer.routing.requests and agent.status alike (both topics must have exactly ROUTING_PARTITIONS
+partitions), so the router that owns partition p of one topic owns the same tenants on the other.
+Producers outside this codebase must use the same function; message keys stay customer_id/agent_id.
+"""
+import zlib
+from typing import Optional
+
+
+def tenant_partition(tenant_id: str, partitions: int) -> int:
+    return zlib.crc32(tenant_id.encode("utf-8")) % partitions
+
+
+def partition_for(tenant_id: str, config) -> Optional[int]:
+    """Partition to produce a tenant's message to, or None (key hashing) unless tenant sharding is on."""
+    if not config.get("ROUTING_SHARD_BY_TENANT"):
+        return None
+    return tenant_partition(tenant_id, config["ROUTING_PARTITIONS"])
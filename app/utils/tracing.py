@@ -0,0 +1,88 @@
+"""
+Routing trace context carried in Kafka headers from enqueue to the assignment event.
+
+    trace = Trace.start(correlation_id)              # API: trace_id + hop.enqueued
+    headers = codec_headers + trace.headers()
+    trace = Trace.from_headers(msg.headers())        # router: picks it up ...
+    trace.stamp("consumed")                          # ... and stamps each hop it passes
+
+Hops are epoch milliseconds in `hop.<name>` headers (enqueued, consumed, parked, assigned), so any
+consumer of customer.assignments can compute queue wait and enqueue-to-assignment latency without
+joining against the database.
+"""
+import json
+import time
+import uuid
+from .codec import header
+
+TRACE_ID_HEADER = "trace_id"
+HOP_PREFIX = "hop."
+
+ENQUEUED = "enqueued"
+CONSUMED = "consumed"
+PARKED = "parked"
+ASSIGNED = "assigned"
+
+
+def now_ms() -> int:
+    return int(time.time() * 1000)
+
+
+class Trace:
+    """A trace id plus the epoch-ms timestamp of every hop it has passed, in hop order."""
+
+    __slots__ = ("trace_id", "hops")
+
+    def __init__(self, trace_id=None, hops=None):
+        self.trace_id = trace_id or uuid.uuid4().hex
+        self.hops = dict(hops or {})
+
+    @classmethod
+    def start(cls, trace_id=None, at_ms=None):
+        """New trace stamped as enqueued; a caller's correlation_id becomes the trace id."""
+        return cls(trace_id).stamp(ENQUEUED, at_ms)
+
+    def stamp(self, hop: str, at_ms=None):
+        self.hops[hop] = at_ms if at_ms is not None else now_ms()
+        return self
+
+    def seconds(self, start: str, end: str):
+        """Seconds between two stamped hops, or None when either is missing."""
+        if start not in self.hops or end not in self.hops:
+            return None
+        return max(self.hops[end] - self.hops[start], 0) / 1000
+
+    def headers(self) -> list:
+        """Kafka headers for this trace, to append to a message's codec headers."""
+        return [(TRACE_ID_HEADER, self.trace_id.encode("utf-8"))] + [
+            (HOP_PREFIX + hop, str(ms).encode("ascii")) for hop, ms in self.hops.items()
+        ]
+
+    @classmethod
+    def from_headers(cls, headers):
+        """Trace carried by a message's headers, or None for messages produced without one."""
+        trace_id = header(headers, TRACE_ID_HEADER)
+        if not trace_id:
+            return None
+        hops = {}
+        for name, value in headers or ():
+            if name.startswith(HOP_PREFIX):
+                try:
+                    hops[name[len(HOP_PREFIX):]] = int(value)
+                except (TypeError, ValueError):
+                    continue
+        return cls(trace_id, hops)
+
+    def to_json(self) -> str:
+        return json.dumps({"trace_id": self.trace_id, "hops": self.hops})
+
+    @classmethod
+    def from_json(cls, data):
+        """Trace from `to_json()` output; None for a missing or unreadable value."""
+        if not data:
+            return None
+        try:
+            value = json.loads(data)
+            return cls(value["trace_id"], value.get("hops"))
+        except (ValueError, KeyError, TypeError):
+            return None
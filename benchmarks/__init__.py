@@ -0,0 +1,8 @@
+"""
+Hot-path microbenchmarks for the routing system, run against local stand-ins:
+SQLite, an in-memory Redis (fakeredis) and fake Kafka producers/consumers.
+
+- fakes.py: Kafka producer/consumer/message doubles and the in-memory Redis factory.
+- harness.py: timing loop, ops/sec and p50/p99 reporting, baseline save/compare.
+- run.py: scenario definitions and the command-line entry point (`python -m benchmarks.run`).
+"""
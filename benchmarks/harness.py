@@ -0,0 +1,75 @@
+import json
+import time
+
+
+def bench(name, fn, iterations=1000, warmup=50, after=None, counter=None) -> dict:
+    """
+    Time `fn(i)` for `iterations` calls after `warmup` untimed calls.
+
+    `after(i)`, when given, runs untimed after each call (e.g. to release reservations). `counter`,
+    when given, returns a running total (e.g. Redis round trips) reported per timed call.
+    """
+    for i in range(warmup):
+        fn(i)
+        if after is not None:
+            after(i)
+    samples = []
+    counted = 0
+    for i in range(iterations):
+        before = counter() if counter is not None else 0
+        start = time.perf_counter()
+        fn(i)
+        samples.append(time.perf_counter() - start)
+        if counter is not None:
+            counted += counter() - before
+        if after is not None:
+            after(i)
+    samples.sort()
+    total = sum(samples)
+    return {
+        "name": name,
+        "iterations": iterations,
+        "ops_per_sec": iterations / total if total else float("inf"),
+        "p50_ms": _percentile(samples, 0.50) * 1000,
+        "p99_ms": _percentile(samples, 0.99) * 1000,
+        "per_op": counted / iterations if counter is not None and iterations else None,
+    }
+
+
+def _percentile(sorted_samples, q):
+    if not sorted_samples:
+        return 0.0
+    idx = min(int(round(q * (len(sorted_samples) - 1))), len(sorted_samples) - 1)
+    return sorted_samples[idx]
+
+
+def report(results: list, baseline=None):
+    """Print a results table, with the ops/sec change against a baseline when one is given."""
+    print(f"{'benchmark':<44} {'ops/sec':>12} {'p50 ms':>10} {'p99 ms':>10} {'rt/op':>7} {'vs base':>9}")
+    for r in results:
+        delta = ""
+        base = (baseline or {}).get(r["name"])
+        if base:
+            delta = f"{(r['ops_per_sec'] / base['ops_per_sec'] - 1) * 100:+.1f}%"
+        per_op = f"{r['per_op']:.1f}" if r.get("per_op") is not None else "-"
+        print(f"{r['name']:<44} {r['ops_per_sec']:>12.1f} {r['p50_ms']:>10.3f} {r['p99_ms']:>10.3f} {per_op:>7} {delta:>9}")
+
+
+def save_baseline(results: list, path: str):
+    with open(path, "w") as f:
+        json.dump({r["name"]: r for r in results}, f, indent=2, sort_keys=True)
+
+
+def load_baseline(path: str) -> dict:
+    with open(path) as f:
+        return json.load(f)
+
+
+def regressions(results: list, baseline: dict, tolerance: float) -> list:
+    """Names of benchmarks whose throughput dropped by more than `tolerance` (a fraction) against the baseline."""
+    slower = []
+    for r in results:
+        base = baseline.get(r["name"])
+        if base and r["ops_per_sec"] < base["ops_per_sec"] * (1 - tolerance):
+            slower.append(r["name"])
+    return slower
@@ -0,0 +1,185 @@
+"""
+Run the hot-path microbenchmarks.
+
+    python -m benchmarks.run                           # run and print a table
+    python -m benchmarks.run --save baseline.json      # record a baseline
+    python -m benchmarks.run --compare baseline.json   # fail (exit 1) on throughput regressions
+"""
+import argparse
+import logging
+import sys
+from app import create_app
+from app.extensions import db, kafka_producer, redis_client
+from app.services.agent_index import AgentAvailabilityIndex
+from app.services.agent_service import AgentService
+from app.services.routing_service import RoutingService
+from app.services.skill_catalogue import SkillCatalogue
+from app.utils.codec import ROUTING_REQUEST, encode
+from workers.kafka_utils import parse_message
+from benchmarks.fakes import FakeMessage, FakeProducer, make_redis
+from benchmarks.harness import bench, load_baseline, regressions, report, save_baseline
+
+TENANT = "bench-tenant"
+
+
+def setup_app():
+    app = create_app("testing")
+    app.app_context().push()
+    redis_client._client = make_redis()
+    kafka_producer._producer = FakeProducer()
+    return app
+
+
+def round_trips():
+    return redis_client.stats()["round_trips"]
+
+
+def reset():
+    redis_client.client.flushall()
+    db.drop_all()
+    db.create_all()
+    SkillCatalogue._bits.clear()
+
+
+def seed_index(n: int, skills="support,billing"):
+    """Write n available agents straight into the Redis hashes and availability index."""
+    pipe = redis_client.client.pipeline(transaction=False)
+    for i in range(n):
+        agent_id = f"agent-{i}"
+        pipe.hset(f"agent:{TENANT}:{agent_id}", mapping={"status": "available", "skills": skills, "current_load": "0"})
+        AgentAvailabilityIndex.stage_update(pipe, TENANT, agent_id, "available", skills, 0)
+        if i % 1000 == 999:
+            pipe.execute()
+    pipe.execute()
+
+
+def bench_get_available_agents(scale):
+    results = []
+    for n in (10, 1_000, 50_000):
+        reset()
+        seed_index(n)
+        results.append(bench(
+            f"get_available_agents[{n}]",
+            lambda i: RoutingService._get_available_agents(TENANT, "support"),
+            iterations=scale,
+            counter=round_trips,
+        ))
+    return results
+
+
+def bench_assign_customer(scale):
+    reset()
+    # Enough agents that no iteration runs into reservations taken earlier in the run
+    seed_index(scale * 2 + 100)
+    return [bench(
+        "assign_customer",
+        lambda i: RoutingService.assign_customer(f"cust-{i}", TENANT, "support"),
+        iterations=scale,
+        counter=round_trips,
+    )]
+
+
+def bench_parse_message(scale):
+    value = {
+        "customer_id": "cust-1",
+        "tenant_id": TENANT,
+        "requested_skill": "support",
+        "priority": 1,
+        "correlation_id": "bench",
+    }
+    results = []
+    for codec in ("json", "bin1"):
+        payload, headers = encode(ROUTING_REQUEST, value, codec)
+        msg = FakeMessage("customer.routing.requests", 0, 0, b"cust-1", payload, headers)
+        results.append(bench(f"parse_message[{codec}]", lambda i: parse_message(msg), iterations=scale * 10))
+    return results
+
+
+def bench_upsert_agent(scale):
+    reset()
+    statuses = ("available", "busy")
+    return [bench(
+        "upsert_agent",
+        lambda i: AgentService.upsert_agent(f"agent-{i % 100}", TENANT, statuses[i % 2], "support,billing", i % 5),
+        iterations=scale,
+        counter=round_trips,
+    )]
+
+
+def bench_upsert_agents(scale):
+    reset()
+    statuses = ("available", "busy")
+    batch = 100
+    return [bench(
+        f"upsert_agents[{batch}]",
+        lambda i: AgentService.upsert_agents([
+            {"agent_id": f"agent-{n}", "tenant_id": TENANT, "status": statuses[(i + n) % 2],
+             "skills": "support,billing", "current_load": n % 5}
+            for n in range(batch)
+        ]),
+        iterations=max(scale // batch, 10),
+        counter=round_trips,
+    )]
+
+
+def bench_api(app, scale):
+    reset()
+    client = app.test_client()
+    route = bench(
+        "POST /api/customers/route",
+        lambda i: client.post("/api/customers/route", json={
+            "customer_id": f"cust-{i}", "tenant_id": TENANT, "requested_skill": "support", "priority": i % 3,
+        }),
+        iterations=scale,
+        counter=round_trips,
+    )
+    status = bench(
+        "POST /api/agents/status",
+        lambda i: client.post("/api/agents/status", json={
+            "agent_id": f"agent-{i % 100}", "tenant_id": TENANT, "status": "busy", "skills": "support",
+        }),
+        iterations=scale,
+        counter=round_trips,
+    )
+    poll = bench(
+        "GET /api/assignments/<customer_id>",
+        lambda i: client.get(f"/api/assignments/cust-{i % 100}?tenant_id={TENANT}"),
+        iterations=scale,
+        counter=round_trips,
+    )
+    return [route, status, poll]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--iterations", type=int, default=1000, help="timed iterations per benchmark")
+    parser.add_argument("--save", metavar="PATH", help="write results as a baseline file")
+    parser.add_argument("--compare", metavar="PATH", help="compare against a baseline file")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="allowed ops/sec drop vs baseline (fraction)")
+    args = parser.parse_args(argv)
+
+    logging.disable(logging.WARNING)
+    app = setup_app()
+    scale = args.iterations
+    results = []
+    results += bench_get_available_agents(scale)
+    results += bench_assign_customer(scale)
+    results += bench_parse_message(scale)
+    results += bench_upsert_agent(scale)
+    results += bench_upsert_agents(scale)
+    results += bench_api(app, scale)
+
+    baseline = load_baseline(args.compare) if args.compare else None
+    report(results, baseline)
+    if args.save:
+        save_baseline(results, args.save)
+    if baseline:
+        slower = regressions(results, baseline, args.tolerance)
+        if slower:
+            print(f"Regressed beyond {args.tolerance:.0%}: {', '.join(slower)}", file=sys.stderr)
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
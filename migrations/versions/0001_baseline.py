@@ -0,0 +1,73 @@
+"""baseline: the schema db.create_all() built before migrations
+
+Revision ID: 0001
+Revises:
+Create Date: 2026-10-18 09:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0001'
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'agents',
+        sa.Column('id', sa.Integer(), autoincrement=True, nullable=False),
+        sa.Column('agent_id', sa.String(length=64), nullable=False),
+        sa.Column('tenant_id', sa.String(length=64), nullable=False),
+        sa.Column('skills', sa.String(length=256), nullable=True),
+        sa.Column('status', sa.Enum('AVAILABLE', 'BUSY', 'OFFLINE', name='agentstatus'), nullable=False),
+        sa.Column('current_load', sa.Integer(), nullable=False),
+        sa.Column('updated_at', sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint('id'),
+    )
+    op.create_index('ix_agents_agent_id', 'agents', ['agent_id'], unique=True)
+    op.create_index('ix_agents_tenant_id', 'agents', ['tenant_id'])
+
+    op.create_table(
+        'customers',
+        sa.Column('id', sa.Integer(), autoincrement=True, nullable=False),
+        sa.Column('customer_id', sa.String(length=64), nullable=False),
+        sa.Column('tenant_id', sa.String(length=64), nullable=False),
+        sa.Column('requested_skill', sa.String(length=64), nullable=True),
+        sa.Column('priority', sa.Integer(), nullable=False),
+        sa.Column('status', sa.Enum('QUEUED', 'IN_PROGRESS', 'COMPLETED', name='customerstatus'), nullable=False),
+        sa.Column('updated_at', sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint('id'),
+    )
+    op.create_index('ix_customers_customer_id', 'customers', ['customer_id'], unique=True)
+    op.create_index('ix_customers_tenant_id', 'customers', ['tenant_id'])
+
+    op.create_table(
+        'assignments',
+        sa.Column('id', sa.Integer(), autoincrement=True, nullable=False),
+        sa.Column('customer_uid', sa.String(length=64), nullable=False),
+        sa.Column('agent_uid', sa.String(length=64), nullable=False),
+        sa.Column('tenant_id', sa.String(length=64), nullable=False),
+        sa.Column('customer_id', sa.Integer(), nullable=True),
+        sa.Column('agent_id', sa.Integer(), nullable=True),
+        sa.Column('created_at', sa.DateTime(), nullable=False),
+        sa.Column('updated_at', sa.DateTime(), nullable=False),
+        sa.ForeignKeyConstraint(['agent_id'], ['agents.id']),
+        sa.ForeignKeyConstraint(['customer_id'], ['customers.id']),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('customer_id', name='uq_assignments_customer_id'),
+    )
+    op.create_index('ix_assignments_agent_uid', 'assignments', ['agent_uid'])
+    op.create_index('ix_assignments_customer_uid', 'assignments', ['customer_uid'])
+    op.create_index('ix_assignments_tenant_id', 'assignments', ['tenant_id'])
+
+
+def downgrade():
+    op.drop_table('assignments')
+    op.drop_table('customers')
+    op.drop_table('agents')
+    sa.Enum(name='customerstatus').drop(op.get_bind(), checkfirst=True)
+    sa.Enum(name='agentstatus').drop(op.get_bind(), checkfirst=True)
@@ -0,0 +1,47 @@
+"""skills: per-tenant skill catalogue and the agent_skills relation
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-18 09:10:00.000000
+
+Each tenant's skills get a bit so an agent's skills form a bitmask. Existing agents keep their
+comma-separated skills column; `scripts/backfill_skills.py` interns it into agent_skills.
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0002'
+down_revision = '0001'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'skills',
+        sa.Column('id', sa.Integer(), autoincrement=True, nullable=False),
+        sa.Column('tenant_id', sa.String(length=64), nullable=False),
+        sa.Column('name', sa.String(length=64), nullable=False),
+        sa.Column('bit', sa.Integer(), nullable=False),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('tenant_id', 'name', name='uq_skills_tenant_name'),
+        sa.UniqueConstraint('tenant_id', 'bit', name='uq_skills_tenant_bit'),
+    )
+
+    op.create_table(
+        'agent_skills',
+        sa.Column('agent_id', sa.Integer(), nullable=False),
+        sa.Column('skill_id', sa.Integer(), nullable=False),
+        sa.ForeignKeyConstraint(['agent_id'], ['agents.id'], ondelete='CASCADE'),
+        sa.ForeignKeyConstraint(['skill_id'], ['skills.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('agent_id', 'skill_id'),
+    )
+    op.create_index('ix_agent_skills_skill_id', 'agent_skills', ['skill_id'])
+
+
+def downgrade():
+    op.drop_table('agent_skills')
+    op.drop_table('skills')
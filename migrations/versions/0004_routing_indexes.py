@@ -0,0 +1,73 @@
+"""routing indexes: composite indexes on the hot access paths and a (tenant_id, customer_uid) assignment key
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-18 09:30:00.000000
+
+Agents are read by (tenant_id, status) and, in the DB fallback of claims, least loaded first among the
+available ones; customers by (tenant_id, customer_id); assignments by (tenant_id, customer_uid), which
+becomes their unique key so routing can upsert them in one statement. The single-column indexes these
+supersede are dropped.
+
+On PostgreSQL the agent and customer indexes are built CONCURRENTLY, outside the migration transaction,
+so routing keeps writing to those tables meanwhile. The assignment key is built in the transaction: it
+first deletes all but the latest assignment of each customer, which must not race with routers still
+inserting duplicates.
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0004'
+down_revision = '0003'
+branch_labels = None
+depends_on = None
+
+AVAILABLE = sa.text("status = 'AVAILABLE'")
+
+
+def upgrade():
+    op.execute(
+        'DELETE FROM assignments WHERE id NOT IN '
+        '(SELECT MAX(id) FROM assignments GROUP BY tenant_id, customer_uid)'
+    )
+    with op.batch_alter_table('assignments') as batch:
+        batch.drop_constraint('uq_assignments_customer_id', type_='unique')
+        batch.create_unique_constraint('uq_assignments_tenant_customer', ['tenant_id', 'customer_uid'])
+    op.drop_index('ix_assignments_customer_uid', table_name='assignments')
+    op.drop_index('ix_assignments_tenant_id', table_name='assignments')
+
+    with op.get_context().autocommit_block():
+        op.create_index('ix_agents_tenant_status', 'agents', ['tenant_id', 'status'],
+                        postgresql_concurrently=True, if_not_exists=True)
+        op.create_index('ix_agents_available', 'agents', ['tenant_id', 'current_load', 'id'],
+                        postgresql_where=AVAILABLE, sqlite_where=AVAILABLE,
+                        postgresql_concurrently=True, if_not_exists=True)
+        op.create_index('ix_customers_tenant_customer', 'customers', ['tenant_id', 'customer_id'],
+                        postgresql_concurrently=True, if_not_exists=True)
+        op.drop_index('ix_agents_tenant_id', table_name='agents',
+                      postgresql_concurrently=True, if_exists=True)
+        op.drop_index('ix_customers_tenant_id', table_name='customers',
+                      postgresql_concurrently=True, if_exists=True)
+
+
+def downgrade():
+    with op.get_context().autocommit_block():
+        op.create_index('ix_customers_tenant_id', 'customers', ['tenant_id'],
+                        postgresql_concurrently=True, if_not_exists=True)
+        op.create_index('ix_agents_tenant_id', 'agents', ['tenant_id'],
+                        postgresql_concurrently=True, if_not_exists=True)
+        op.drop_index('ix_customers_tenant_customer', table_name='customers',
+                      postgresql_concurrently=True, if_exists=True)
+        op.drop_index('ix_agents_available', table_name='agents',
+                      postgresql_concurrently=True, if_exists=True)
+        op.drop_index('ix_agents_tenant_status', table_name='agents',
+                      postgresql_concurrently=True, if_exists=True)
+
+    op.create_index('ix_assignments_tenant_id', 'assignments', ['tenant_id'])
+    op.create_index('ix_assignments_customer_uid', 'assignments', ['customer_uid'])
+    with op.batch_alter_table('assignments') as batch:
+        batch.drop_constraint('uq_assignments_tenant_customer', type_='unique')
+        batch.create_unique_constraint('uq_assignments_customer_id', ['customer_id'])
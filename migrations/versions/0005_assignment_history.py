@@ -0,0 +1,55 @@
+"""assignment history: archive table for completed customers' assignments
+
+Revision ID: 0005
+Revises: 0004
+Create Date: 2026-10-18 11:00:00.000000
+
+On PostgreSQL assignment_history is range-partitioned by archived_at. Only the DEFAULT partition is created
+here; the retention worker creates the monthly partitions (assignment_history_YYYY_MM) ahead of use and
+drops expired ones. A partial index keeps completed customers, the ones waiting to be archived, in order.
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0005'
+down_revision = '0004'
+branch_labels = None
+depends_on = None
+
+COMPLETED = sa.text("status = 'COMPLETED'")
+
+
+def upgrade():
+    op.create_table(
+        'assignment_history',
+        sa.Column('assignment_id', sa.Integer(), autoincrement=False, nullable=False),
+        sa.Column('archived_at', sa.DateTime(), nullable=False),
+        sa.Column('customer_uid', sa.String(length=64), nullable=False),
+        sa.Column('agent_uid', sa.String(length=64), nullable=False),
+        sa.Column('tenant_id', sa.String(length=64), nullable=False),
+        sa.Column('requested_skill', sa.String(length=64), nullable=True),
+        sa.Column('priority', sa.Integer(), nullable=False),
+        sa.Column('assigned_at', sa.DateTime(), nullable=False),
+        sa.Column('completed_at', sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint('assignment_id', 'archived_at'),
+        postgresql_partition_by='RANGE (archived_at)',
+    )
+    op.create_index('ix_assignment_history_tenant_customer', 'assignment_history', ['tenant_id', 'customer_uid'])
+    if op.get_bind().dialect.name == 'postgresql':
+        op.execute('CREATE TABLE assignment_history_default PARTITION OF assignment_history DEFAULT')
+
+    with op.get_context().autocommit_block():
+        op.create_index('ix_customers_completed', 'customers', ['updated_at'],
+                        postgresql_where=COMPLETED, sqlite_where=COMPLETED,
+                        postgresql_concurrently=True, if_not_exists=True)
+
+
+def downgrade():
+    with op.get_context().autocommit_block():
+        op.drop_index('ix_customers_completed', table_name='customers',
+                      postgresql_concurrently=True, if_exists=True)
+    # Drops every partition with it
+    op.drop_table('assignment_history')
@@ -0,0 +1,32 @@
+from sqlalchemy import select
+from app import create_app
+from app.extensions import db
+from app.models.agent import Agent
+from app.services.agent_index import parse_skills
+from app.services.skill_catalogue import SkillCatalogue
+
+
+def backfill(batch_size: int = 500) -> int:
+    """Intern every agent's comma-separated skills into the skills/agent_skills relation, in id order."""
+    last_id, total = 0, 0
+    while True:
+        agents = db.session.execute(
+            select(Agent).where(Agent.id > last_id).order_by(Agent.id).limit(batch_size)
+        ).scalars().all()
+        if not agents:
+            return total
+        for agent in agents:
+            agent.skill_set = SkillCatalogue.intern(agent.tenant_id, parse_skills(agent.skills))
+        db.session.commit()
+        last_id = agents[-1].id
+        total += len(agents)
+
+
+def main():
+    app = create_app("development")
+    with app.app_context():
+        print(f"Backfilled skills for {backfill()} agents.")
+
+
+if __name__ == "__main__":
+    main()
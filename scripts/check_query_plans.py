@@ -0,0 +1,101 @@
+"""
+Check that the hot routing queries are planned on their indexes.
+
+    flask db upgrade && python scripts/check_query_plans.py      # -v prints every plan
+
+Calls the repository methods behind routing against the configured database (DATABASE_URL), captures
+the SQL they run and EXPLAINs it. A query whose plan scans its table, or skips the index it was built
+for, fails the check and the script exits 1, so a model or migration change that loses an index is
+caught in CI. Nothing is written: the session is rolled back. On PostgreSQL sequential scans are
+disabled for the check, so small or empty tables still show which index the access path can use.
+"""
+import sys
+from datetime import datetime
+from sqlalchemy import event
+from app import create_app
+from app.extensions import db
+from app.repositories import AgentRepository, AssignmentHistoryRepository, AssignmentRepository, CustomerRepository
+
+TENANT = "plan-check"
+
+
+def checks() -> list:
+    """(name, repository call, table, indexes any of which the plan must use, whether the plan may sort)."""
+    agents, customers, assignments = AgentRepository(), CustomerRepository(), AssignmentRepository()
+    history = AssignmentHistoryRepository()
+    return [
+        ("agents least loaded", lambda: agents.list_least_loaded(TENANT), "agents",
+         {"ix_agents_available"}, False),
+        ("agents of a tenant", lambda: agents.get_tenant_states(TENANT), "agents",
+         {"ix_agents_tenant_status"}, True),
+        ("agents mark offline", lambda: agents.mark_offline(TENANT, ["a"], datetime.utcnow()), "agents",
+         {"ix_agents_tenant_status", "ix_agents_agent_id"}, True),
+        ("customer lookup", lambda: customers.get_by_customer_id("c", TENANT), "customers",
+         {"ix_customers_tenant_customer", "ix_customers_customer_id"}, True),
+        # SQLite names the index of a UNIQUE constraint sqlite_autoindex_<table>_<n>; assignments has just the one
+        ("assignment view", lambda: assignments.get_view("c", TENANT), "assignments",
+         {"uq_assignments_tenant_customer", "sqlite_autoindex_assignments_"}, True),
+        # A cutoff before any completion: only the candidate query runs
+        ("completed customers to archive", lambda: history.archive_completed(datetime(1970, 1, 1), 1), "customers",
+         {"ix_customers_completed"}, False),
+    ]
+
+
+def capture(call) -> tuple:
+    """(statement, parameters) of the first SQL statement `call` executes."""
+    executed = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        executed.append((statement, parameters))
+
+    engine = db.session.get_bind()
+    event.listen(engine, "before_cursor_execute", record)
+    try:
+        call()
+    finally:
+        event.remove(engine, "before_cursor_execute", record)
+    return executed[0]
+
+
+def explain(statement, parameters) -> list:
+    conn = db.session.connection()
+    if conn.dialect.name == "postgresql":
+        return [row[0] for row in conn.exec_driver_sql(f"EXPLAIN {statement}", parameters)]
+    # SQLite: (id, parent, notused, detail)
+    return [row[3] for row in conn.exec_driver_sql(f"EXPLAIN QUERY PLAN {statement}", parameters)]
+
+
+def problems(plan: list, table: str, indexes: set, may_sort: bool) -> list:
+    text = "\n".join(plan)
+    found = []
+    if f"Seq Scan on {table}" in text or any(line.strip() in (f"SCAN {table}", f"SCAN TABLE {table}") for line in plan):
+        found.append(f"scans {table}")
+    if not any(index in text for index in indexes):
+        found.append(f"uses none of {', '.join(sorted(indexes))}")
+    if not may_sort and ("Sort" in text or "TEMP B-TREE" in text):
+        found.append("sorts instead of reading in index order")
+    return found
+
+
+def main() -> int:
+    verbose = "-v" in sys.argv[1:]
+    app = create_app("development")
+    failed = 0
+    with app.app_context():
+        if db.session.get_bind().dialect.name == "postgresql":
+            db.session.execute(db.text("SET LOCAL enable_seqscan = off"))
+        try:
+            for name, call, table, indexes, may_sort in checks():
+                plan = explain(*capture(call))
+                found = problems(plan, table, indexes, may_sort)
+                failed += bool(found)
+                print(f"{'FAIL' if found else 'ok':<6}{name}{': ' + '; '.join(found) if found else ''}")
+                if found or verbose:
+                    print("\n".join(f"        {line}" for line in plan))
+        finally:
+            db.session.rollback()
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
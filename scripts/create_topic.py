@@ -8,10 +8,13 @@ def main():
     app.app_context().push()
 
     kafka_adapter = KafkaAdapter.from_current_app()
+    # Tenant sharding maps tenants to partitions by number, so both sharded topics need the same count
+    sharded = app.config.get("ROUTING_PARTITIONS") if app.config.get("ROUTING_SHARD_BY_TENANT") else None
     topics = [
-        (app.config.get("TOPIC_ROUTING_REQUESTS"), 5, 1),
+        (app.config.get("TOPIC_ROUTING_REQUESTS"), sharded or 5, 1),
         (app.config.get("TOPIC_ASSIGNMENTS"), 5, 1),
-        ("agent.status", 3, 1),
+        (app.config.get("TOPIC_AGENT_STATUS"), sharded or 3, 1),
+        (app.config.get("TOPIC_AGENT_HEARTBEAT"), 3, 1),
     ]
 
     for topic, partitions, replication in topics:
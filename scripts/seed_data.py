@@ -1,13 +1,15 @@
+from flask_migrate import upgrade
 from app import create_app
 from app.extensions import db
 from app.models.agent import Agent, AgentStatus
 from app.models.customer import Customer, CustomerStatus
+from scripts.backfill_skills import backfill
 
 
 def main():
     app = create_app("development")
     with app.app_context():
-        db.create_all()
+        upgrade()
 
         agents = [
             Agent(agent_id="agent001", tenant_id="tenant01", skills="billing,support", status=AgentStatus.AVAILABLE, current_load=0),
@@ -23,6 +25,7 @@ def main():
 
         db.session.bulk_save_objects(agents + customers)
         db.session.commit()
+        backfill()
         print(f"Seeded {len(agents)} agents and {len(customers)} customers.")
 
 
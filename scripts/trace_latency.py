@@ -0,0 +1,88 @@
+"""
+Per-tenant routing latency over a recent window, read from the trace headers of assignment events.
+
+    python scripts/trace_latency.py --minutes 15
+
+Reads customer.assignments from the offsets at the start of the window up to the current end, without
+joining a consumer group or committing anything, and prints queue wait (enqueued -> consumed) and
+enqueue-to-assignment percentiles per tenant.
+"""
+import argparse
+import time
+import uuid
+from collections import defaultdict
+from confluent_kafka import Consumer, TopicPartition
+from app import create_app
+from app.utils.codec import TENANT_HEADER, header
+from app.utils.tracing import ASSIGNED, CONSUMED, ENQUEUED, Trace
+
+
+def percentile(samples: list, q: float):
+    return samples[min(int(len(samples) * q), len(samples) - 1)]
+
+
+def collect(consumer, topic: str, since_ms: int) -> dict:
+    """{tenant_id: {"queue_wait": [seconds], "enqueue_to_assignment": [seconds]}} for events since since_ms."""
+    partitions = consumer.list_topics(topic, timeout=10).topics[topic].partitions
+    starts = consumer.offsets_for_times([TopicPartition(topic, p, since_ms) for p in partitions], timeout=10)
+    ends = {}
+    assignment = []
+    for tp in starts:
+        _, high = consumer.get_watermark_offsets(tp, timeout=10)
+        if 0 <= tp.offset < high:
+            ends[tp.partition] = high
+            assignment.append(tp)
+    consumer.assign(assignment)
+
+    samples = defaultdict(lambda: {"queue_wait": [], "enqueue_to_assignment": []})
+    idle = 0
+    while ends and idle < 10:
+        msgs = consumer.consume(num_messages=1000, timeout=1.0)
+        # Offsets taken by transaction markers never arrive as messages; stop once reads dry up
+        idle = 0 if msgs else idle + 1
+        for msg in msgs:
+            if msg.error():
+                continue
+            if msg.offset() + 1 >= ends.get(msg.partition(), 0):
+                ends.pop(msg.partition(), None)
+            trace = Trace.from_headers(msg.headers())
+            if trace is None:
+                continue
+            tenant = header(msg.headers(), TENANT_HEADER) or "unknown"
+            for name, (start, end) in (("queue_wait", (ENQUEUED, CONSUMED)),
+                                       ("enqueue_to_assignment", (ENQUEUED, ASSIGNED))):
+                elapsed = trace.seconds(start, end)
+                if elapsed is not None:
+                    samples[tenant][name].append(elapsed)
+    return samples
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--minutes", type=float, default=15.0, help="window to report on")
+    args = parser.parse_args()
+
+    app = create_app("development")
+    consumer = Consumer({
+        "bootstrap.servers": app.config["KAFKA_BOOTSTRAP_SERVERS"],
+        "group.id": f"trace-latency-{uuid.uuid4().hex}",
+        "enable.auto.commit": False,
+    })
+    try:
+        topic = app.config.get("TOPIC_ASSIGNMENTS", "customer.assignments")
+        samples = collect(consumer, topic, int((time.time() - args.minutes * 60) * 1000))
+    finally:
+        consumer.close()
+
+    print(f"{'tenant':<24}{'metric':<24}{'count':>8}{'p50 s':>10}{'p95 s':>10}{'p99 s':>10}{'max s':>10}")
+    for tenant in sorted(samples):
+        for name, values in samples[tenant].items():
+            if not values:
+                continue
+            values.sort()
+            print(f"{tenant:<24}{name:<24}{len(values):>8}{percentile(values, 0.5):>10.3f}"
+                  f"{percentile(values, 0.95):>10.3f}{percentile(values, 0.99):>10.3f}{values[-1]:>10.3f}")
+
+
+if __name__ == "__main__":
+    main()
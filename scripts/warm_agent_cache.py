@@ -0,0 +1,29 @@
+"""
+Bulk-load agent state from the database into the Redis agent mirror, or report drift between the two.
+
+    python scripts/warm_agent_cache.py                 # warm every tenant
+    python scripts/warm_agent_cache.py --tenant t1
+    python scripts/warm_agent_cache.py --check         # report drift without writing
+"""
+import argparse
+from app import create_app
+from app.services.agent_cache import AgentCache
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--tenant", help="only this tenant")
+    parser.add_argument("--check", action="store_true", help="report drift without repairing it")
+    args = parser.parse_args()
+
+    app = create_app("development")
+    app.app_context().push()
+
+    report = AgentCache.reconcile(args.tenant, repair=not args.check)
+    checked = report.pop("checked", 0)
+    verb = "Checked" if args.check else "Warmed"
+    print(f"{verb} {checked} agents; drift: {report or 'none'}")
+
+
+if __name__ == "__main__":
+    main()
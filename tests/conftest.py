@@ -0,0 +1,17 @@
+import pytest
+from app import create_app
+from app.extensions import db, kafka_producer, redis_client
+from benchmarks.fakes import FakeProducer, make_redis
+
+
+@pytest.fixture
+def app():
+    """App on in-memory SQLite, an in-memory Redis with Lua and a fake Kafka producer."""
+    app = create_app("testing")
+    with app.app_context():
+        redis_client._client = make_redis()
+        kafka_producer._producer = FakeProducer()
+        db.create_all()
+        yield app
+        db.session.remove()
+        db.drop_all()
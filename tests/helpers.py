@@ -0,0 +1,38 @@
+from benchmarks.fakes import FakeConsumer, FakeMessage
+from app.utils.codec import AGENT_STATUS, ROUTING_REQUEST, encode
+
+
+def routing_message(offset, customer_id, tenant_id="t1", partition=0, topic="routing", codec="json", **fields):
+    value, headers = encode(ROUTING_REQUEST, dict(fields, customer_id=customer_id, tenant_id=tenant_id), codec)
+    return FakeMessage(topic, partition, offset, customer_id.encode(), value, headers)
+
+
+def status_message(offset, agent_id, status, tenant_id="t1", partition=0, topic="agent.status", **fields):
+    value, headers = encode(AGENT_STATUS, dict(fields, agent_id=agent_id, tenant_id=tenant_id, status=status), "json")
+    return FakeMessage(topic, partition, offset, agent_id.encode(), value, headers)
+
+
+class DrainingConsumer(FakeConsumer):
+    """FakeConsumer that asks the worker loop to stop once a consume finds nothing left."""
+
+    def __init__(self, messages):
+        super().__init__(messages)
+        self.requested = False
+
+    def consume(self, num_messages=1, timeout=None):
+        batch = super().consume(num_messages, timeout)
+        self.requested = not batch
+        return batch
+
+    def poll(self, timeout=None):
+        msg = super().poll(timeout)
+        self.requested = msg is None
+        return msg
+
+    def committed(self) -> dict:
+        """Highest committed offset per (topic, partition)."""
+        offsets = {}
+        for commit in self.commits:
+            for tp in commit:
+                offsets[(tp.topic, tp.partition)] = max(offsets.get((tp.topic, tp.partition), 0), tp.offset)
+        return offsets
@@ -0,0 +1,23 @@
+from datetime import datetime
+from app.extensions import redis_client
+from app.services.agent_cache import AgentCache
+from app.services.agent_index import AgentAvailabilityIndex
+
+TENANT = "t1"
+
+
+def test_reconcile_drops_orphans_in_one_extra_read(app):
+    pipe = redis_client.pipeline()
+    for i in range(20):
+        AgentCache.stage_agent(pipe, TENANT, f"ghost{i}", "available", "support", 0, 0, datetime.utcnow())
+    pipe.execute()
+
+    before = redis_client.stats()["round_trips"]
+    drift = AgentCache.reconcile_tenant(TENANT)
+
+    assert drift["orphaned"] == 20
+    # Pipelined read, orphans' skills read, pipelined write
+    assert redis_client.stats()["round_trips"] - before == 3
+    r = redis_client.client
+    assert r.zcard(AgentAvailabilityIndex.tenant_key(TENANT)) == 0
+    assert r.zcard(AgentAvailabilityIndex.skill_key(TENANT, "support")) == 0
@@ -0,0 +1,35 @@
+from app.models import Agent
+from app.services.agent_service import AgentService
+from workers.agent_status_worker import coalesce
+from tests.helpers import status_message
+
+
+def test_coalesces_to_one_update_per_agent_field_by_field():
+    updates, coalesced = coalesce([
+        status_message(0, "a0", "available", skills="support", current_load=2),
+        status_message(1, "a1", "offline"),
+        status_message(2, "a0", "busy"),
+        status_message(3, "a0", "available", current_load=0),
+        status_message(4, "a2", "dancing"),
+        status_message(5, "a1", "available", tenant_id="t2"),
+    ])
+
+    assert coalesced == 2
+    assert updates == [
+        {"agent_id": "a0", "tenant_id": "t1", "status": "available", "skills": "support", "current_load": 0},
+        {"agent_id": "a1", "tenant_id": "t1", "status": "offline", "skills": None, "current_load": None},
+        {"agent_id": "a1", "tenant_id": "t2", "status": "available", "skills": None, "current_load": None},
+    ]
+
+
+def test_coalesced_updates_apply_in_one_bulk_upsert(app):
+    updates, _ = coalesce([
+        status_message(0, "a0", "available", skills="support"),
+        status_message(1, "a0", "busy", current_load=1),
+        status_message(2, "a1", "available", skills="billing"),
+    ])
+
+    assert AgentService.upsert_agents(updates) == 2
+    agents = {a.agent_id: a for a in Agent.query}
+    assert (agents["a0"].status.value, agents["a0"].skills, agents["a0"].current_load) == ("busy", "support", 1)
+    assert agents["a1"].status.value == "available"
@@ -0,0 +1,62 @@
+from sqlalchemy import event
+from app.extensions import db, redis_client
+from app.repositories import AssignmentCache, AssignmentRepository
+from app.services.agent_service import AgentService
+from app.services.routing_service import RoutingService
+
+
+def _poll(client, customer_id="c1"):
+    response = client.get(f"/api/assignments/{customer_id}?tenant_id=t1")
+    assert response.status_code == 200
+    return response.json
+
+
+class _Queries:
+    """Counts the SQL statements run while active."""
+
+    def __enter__(self):
+        self.count = 0
+        event.listen(db.engine, "before_cursor_execute", self._record)
+        return self
+
+    def _record(self, *args):
+        self.count += 1
+
+    def __exit__(self, *exc):
+        event.remove(db.engine, "before_cursor_execute", self._record)
+
+
+def test_unassigned_polls_are_answered_from_a_negative_entry(app):
+    client = app.test_client()
+    assert _poll(client) == {"customer_id": "c1", "tenant_id": "t1", "assigned": False}
+    assert redis_client.client.ttl(AssignmentCache.key("t1", "c1")) <= app.config["ASSIGNMENT_CACHE_NEGATIVE_TTL"]
+
+    with _Queries() as queries:
+        assert _poll(client)["assigned"] is False
+    assert queries.count == 0
+
+
+def test_routing_writes_the_assignment_through(app):
+    client = app.test_client()
+    _poll(client)
+    AgentService.upsert_agent("a0", "t1", "available", skills="support", current_load=0)
+    RoutingService.assign_customer("c1", "t1", "support")
+
+    with _Queries() as queries:
+        payload = _poll(client)
+    assert queries.count == 0
+    assert (payload["assigned"], payload["agent_uid"]) == (True, "a0")
+    # The written-through entry matches what a miss reads from the database
+    assert payload == dict(AssignmentRepository().get_view("c1", "t1"), assigned=True)
+
+
+def test_polls_fall_back_to_the_database_without_redis(app, monkeypatch):
+    AgentService.upsert_agent("a0", "t1", "available", skills="support", current_load=0)
+    RoutingService.assign_customer("c1", "t1", "support")
+
+    def unavailable(*args, **kwargs):
+        raise ConnectionError("redis down")
+
+    monkeypatch.setattr(AssignmentCache, "get", staticmethod(unavailable))
+    monkeypatch.setattr(AssignmentCache, "put", staticmethod(unavailable))
+    assert _poll(app.test_client())["agent_uid"] == "a0"
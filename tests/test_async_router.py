@@ -0,0 +1,46 @@
+from app.models import Assignment
+from app.services.agent_service import AgentService
+from workers.async_router import AsyncRouter, OffsetTracker
+from workers.stats import WorkerStats
+from tests.helpers import DrainingConsumer, routing_message
+
+
+def _commits(tracker):
+    return [(tp.topic, tp.partition, tp.offset) for tp in tracker.committable()]
+
+
+def test_offsets_advance_only_across_completed_runs():
+    tracker = OffsetTracker()
+    for offset in (10, 11, 12):
+        tracker.add("routing", 0, offset)
+    tracker.add("routing", 1, 5)
+
+    tracker.complete("routing", 0, 11)
+    tracker.complete("routing", 1, 5)
+    assert _commits(tracker) == [("routing", 1, 6)]
+    assert tracker.in_flight() == 3
+
+    tracker.complete("routing", 0, 10)
+    assert _commits(tracker) == [("routing", 0, 12)]
+    assert _commits(tracker) == []
+
+    tracker.drop({("routing", 0)})
+    tracker.complete("routing", 0, 12)
+    assert tracker.in_flight() == 0 and _commits(tracker) == []
+
+
+def test_routes_concurrently_and_commits_every_settled_message(app):
+    for agent_id in ("a0", "a1"):
+        AgentService.upsert_agent(agent_id, "t1", "available", skills="support", current_load=0)
+    consumer = DrainingConsumer([
+        routing_message(0, "c1", requested_skill="support"),
+        routing_message(0, "c2", partition=1, requested_skill="support"),
+        routing_message(1, "c3", requested_skill="billing"),
+        # The same key again, chained behind the first c1
+        routing_message(2, "c1", requested_skill="support"),
+    ])
+
+    AsyncRouter(consumer, app, consumer, WorkerStats("router")).run()
+
+    assert {a.customer_uid for a in Assignment.query} == {"c1", "c2"}
+    assert consumer.committed() == {("routing", 0): 3, ("routing", 1): 1}
@@ -0,0 +1,37 @@
+import pytest
+from app.utils.codec import ROUTING_REQUEST, BinaryCodec, CodecError, decode, encode
+
+REQUEST = {
+    "customer_id": "c1", "tenant_id": "t1", "requested_skill": None, "priority": 3,
+    "correlation_id": "x", "enqueued_at": "2026-01-01T00:00:00",
+}
+
+
+def test_binary_round_trip_with_extras():
+    value = dict(REQUEST, priority=2 ** 40, note={"a": 1})
+    payload, headers = encode(ROUTING_REQUEST, value, "bin1")
+    assert decode(payload, headers) == value
+
+
+@pytest.mark.parametrize("corrupt", [
+    lambda p: p[:-3],                                     # declared string lengths run past the end
+    lambda p: p.replace(b"c1", b"\xff\xfe"),              # string bytes that are not UTF-8
+    lambda p: p + b"\x00",                                # trailing garbage
+    lambda p: p[:3],                                      # header only
+])
+def test_malformed_binary_payload_raises_codec_error(corrupt):
+    payload, _ = encode(ROUTING_REQUEST, REQUEST, "bin1")
+    with pytest.raises(CodecError):
+        BinaryCodec().decode(corrupt(payload))
+
+
+def test_extras_must_be_an_object():
+    payload, _ = encode(ROUTING_REQUEST, dict(REQUEST, note=1), "bin1")
+    with pytest.raises(CodecError):
+        BinaryCodec().decode(payload[:payload.index(b"{")] + b"[1]")
+
+
+@pytest.mark.parametrize("payload", [b"[]", b'"x"', b"3", b"null", b"{"])
+def test_json_payload_must_be_an_object(payload):
+    with pytest.raises(CodecError):
+        decode(payload)
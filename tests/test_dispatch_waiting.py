@@ -0,0 +1,85 @@
+import pytest
+from app.extensions import redis_client
+from app.models import Assignment
+from app.repositories import AssignmentRepository
+from app.services.agent_service import AgentService
+from app.services.routing_service import RoutingService
+from app.services.waiting_queue import WaitingQueue
+from app.utils.tracing import Trace
+
+TENANT = "t1"
+
+
+def _fail_commit(monkeypatch):
+    def upsert_many(self, rows):
+        raise RuntimeError("database unavailable")
+    monkeypatch.setattr(AssignmentRepository, "upsert_many", upsert_many)
+
+
+def _park(customer_id, skill="support", priority=0):
+    RoutingService.assign_customer(customer_id, TENANT, skill, priority=priority, trace=Trace.start(customer_id))
+
+
+def _agent_state(agent_id="a0"):
+    r = redis_client.client
+    return (
+        r.exists(f"lock:agent:{TENANT}:{agent_id}"),
+        r.zscore(f"agents:available:{TENANT}", agent_id),
+        r.zscore(f"agents:available:{TENANT}:skill:support", agent_id),
+        r.hget(f"agent:{TENANT}:{agent_id}", "current_load"),
+    )
+
+
+def test_failed_commit_hands_customer_back(app, monkeypatch):
+    _park("c1", priority=3)
+    key = WaitingQueue.key(TENANT, "support")
+    r = redis_client.client
+    score = r.zscore(key, "c1")
+    trace = r.get(WaitingQueue.trace_key(TENANT, "c1"))
+    assert score is not None and trace
+
+    _fail_commit(monkeypatch)
+    # The available agent triggers a dispatch whose commit fails; the error is logged, not raised
+    AgentService.upsert_agent("a0", TENANT, "available", skills="support", current_load=0)
+
+    assert r.zrange(key, 0, -1, withscores=True) == [("c1", score)]
+    assert r.get(WaitingQueue.trace_key(TENANT, "c1")) == trace
+    assert _agent_state() == (0, 0.0, 0.0, "0")
+    assert Assignment.query.count() == 0
+
+
+def test_failed_commit_of_dispatch_waiting_raises(app, monkeypatch):
+    _park("c1")
+    monkeypatch.setattr(AgentService, "_dispatch_waiting", staticmethod(lambda *args: None))
+    AgentService.upsert_agent("a0", TENANT, "available", skills="support", current_load=0)
+
+    _fail_commit(monkeypatch)
+    with pytest.raises(RuntimeError):
+        RoutingService.dispatch_waiting(TENANT, "a0", ["support"])
+    assert WaitingQueue.size(TENANT, "support") == 1
+    assert _agent_state() == (0, 0.0, 0.0, "0")
+
+    # Once the database is back the same customer is dispatched
+    monkeypatch.undo()
+    assert RoutingService.dispatch_waiting(TENANT, "a0", ["support"])["customer_id"] == "c1"
+    assert WaitingQueue.size(TENANT, "support") == 0
+    assert _agent_state()[1:] == (1.0, 1.0, "1")
+
+
+def test_failed_commit_of_dispatch_waiting_many_hands_customers_back(app, monkeypatch):
+    _park("c1", priority=2)
+    _park("c2", skill=None)
+    r = redis_client.client
+    scores = {key: r.zrange(key, 0, -1, withscores=True)
+              for key in (WaitingQueue.key(TENANT, "support"), WaitingQueue.key(TENANT))}
+
+    _fail_commit(monkeypatch)
+    AgentService.upsert_agents([
+        {"agent_id": agent_id, "tenant_id": TENANT, "status": "available", "skills": "support", "current_load": 0}
+        for agent_id in ("a0", "a1")
+    ])
+
+    assert {key: r.zrange(key, 0, -1, withscores=True) for key in scores} == scores
+    assert _agent_state("a0") == (0, 0.0, 0.0, "0")
+    assert _agent_state("a1") == (0, 0.0, 0.0, "0")
+    assert Assignment.query.count() == 0
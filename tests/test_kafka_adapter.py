@@ -0,0 +1,14 @@
+from app.adapters.kafka import KafkaAdapter
+from app.utils.codec import decode
+
+
+def test_produce_returns_the_delivery_future(app):
+    adapter = KafkaAdapter.from_current_app()
+
+    futures = [
+        adapter.produce_json("events", "k1", {"tenant_id": "t1", "n": 1}),
+        adapter.produce_event("events", "k2", "agent.heartbeat", {"tenant_id": "t1", "agent_id": "a0"}),
+    ]
+
+    assert [future.result(timeout=5).key() for future in futures] == [b"k1", b"k2"]
+    assert decode(futures[1].result().value(), futures[1].result().headers())["agent_id"] == "a0"
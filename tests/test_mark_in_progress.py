@@ -0,0 +1,47 @@
+from datetime import datetime, timedelta
+from app.extensions import db
+from app.models import CustomerStatus
+from app.repositories import CustomerRepository
+from app.services.agent_service import AgentService
+from app.services.routing_service import RoutingService
+
+TENANT = "t1"
+
+
+def _route(client, customer_id, priority):
+    client.post("/api/customers/route", json={
+        "customer_id": customer_id, "tenant_id": TENANT, "requested_skill": "support", "priority": priority,
+    })
+    return RoutingService.assign_customer(customer_id, TENANT, "support", priority=priority)
+
+
+def test_dispatch_keeps_priority_and_marks_in_progress(app):
+    client = app.test_client()
+    _route(client, "c1", 7)
+    customer = CustomerRepository().get_by_customer_id("c1", TENANT)
+    # The API host's clock runs ahead of the router's
+    customer.updated_at = datetime.utcnow() + timedelta(minutes=5)
+    db.session.commit()
+
+    AgentService.upsert_agent("a0", TENANT, "available", skills="support", current_load=0)
+
+    db.session.expire_all()
+    customer = CustomerRepository().get_by_customer_id("c1", TENANT)
+    assert customer.status == CustomerStatus.IN_PROGRESS
+    assert customer.priority == 7
+    assert customer.requested_skill == "support"
+
+
+def test_bulk_upsert_newer_wins_and_kept_priority(app):
+    repo = CustomerRepository()
+    later = datetime.utcnow() + timedelta(minutes=5)
+    row = {"customer_id": "c1", "tenant_id": TENANT, "requested_skill": None, "status": CustomerStatus.QUEUED}
+    assert repo.bulk_upsert([dict(row, priority=4, updated_at=later)]) == {"c1"}
+    assert repo.bulk_upsert([dict(row, priority=None, status=CustomerStatus.IN_PROGRESS,
+                                  updated_at=datetime.utcnow())]) == set()
+    assert repo.bulk_upsert([dict(row, priority=None, status=CustomerStatus.IN_PROGRESS,
+                                  updated_at=datetime.utcnow())], newer_wins=False) == {"c1"}
+    db.session.commit()
+
+    customer = repo.get_by_customer_id("c1", TENANT)
+    assert (customer.status, customer.priority) == (CustomerStatus.IN_PROGRESS, 4)
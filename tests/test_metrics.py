@@ -0,0 +1,17 @@
+from app.utils.metrics import Registry
+
+
+def test_counter_family_and_samples_share_the_total_name():
+    registry = Registry()
+    registry.counter("jobs", "Jobs run", ("kind",)).labels("a").inc(2)
+    registry.counter("errors_total", "Errors").inc()
+
+    assert registry.render().splitlines() == [
+        "# HELP errors_total Errors",
+        "# TYPE errors_total counter",
+        "errors_total 1",
+        "# HELP jobs_total Jobs run",
+        "# TYPE jobs_total counter",
+        'jobs_total{kind="a"} 2',
+    ]
+    assert registry.counter("jobs", "Jobs run", ("kind",)).name == "jobs_total"
@@ -0,0 +1,56 @@
+from concurrent.futures import Future
+from app.extensions import kafka_producer
+from app.models import OutboxEvent
+from app.repositories import OutboxRepository
+from app.services.agent_service import AgentService
+from app.services.routing_service import RoutingService
+from workers.outbox_relay import relay_batch
+
+TOPIC = "customer.assignments"
+
+
+def _route_with_outbox(app, customers):
+    app.config["ASSIGNMENT_OUTBOX"] = True
+    for i, customer_id in enumerate(customers):
+        AgentService.upsert_agent(f"a{i}", "t1", "available", skills="support", current_load=0)
+        RoutingService.assign_customer(customer_id, "t1", "support", topic=TOPIC)
+
+
+def _produced_keys():
+    kafka_producer.flush()
+    return [m.key() for m in kafka_producer._producer.messages if m.topic() == TOPIC]
+
+
+def test_assignment_events_wait_in_the_outbox_until_relayed(app):
+    _route_with_outbox(app, ["c1", "c2", "c3"])
+    assert _produced_keys() == []
+    assert OutboxRepository().count_pending() == 3
+
+    assert relay_batch(OutboxRepository(), batch_size=2, delivery_timeout=5) == (2, 2)
+    assert relay_batch(OutboxRepository(), batch_size=2, delivery_timeout=5) == (1, 1)
+    assert relay_batch(OutboxRepository(), batch_size=2, delivery_timeout=5) == (0, 0)
+
+    assert _produced_keys() == [b"c1", b"c2", b"c3"]
+    assert OutboxRepository().count_pending() == 0
+
+
+def test_only_the_delivered_prefix_is_marked_sent(app, monkeypatch):
+    _route_with_outbox(app, ["c1", "c2", "c3"])
+    send = kafka_producer.send
+
+    def fail_c2(topic, value, key=None, **kwargs):
+        if key == b"c2":
+            future = Future()
+            future.set_exception(RuntimeError("broker unavailable"))
+            return future
+        return send(topic, value, key=key, **kwargs)
+
+    monkeypatch.setattr(kafka_producer, "send", fail_c2)
+    assert relay_batch(OutboxRepository(), batch_size=10, delivery_timeout=5) == (1, 3)
+    monkeypatch.undo()
+
+    # c3 was delivered but goes out again after c2, so c2 never ends up last
+    pending = OutboxEvent.query.filter(OutboxEvent.sent_at.is_(None)).order_by(OutboxEvent.id)
+    assert [e.key for e in pending] == ["c2", "c3"]
+    assert relay_batch(OutboxRepository(), batch_size=10, delivery_timeout=5) == (2, 2)
+    assert _produced_keys() == [b"c1", b"c3", b"c2", b"c3"]
@@ -0,0 +1,22 @@
+import pytest
+from scripts.check_query_plans import capture, checks, explain, problems
+
+NAMES = [
+    "agents least loaded",
+    "agents of a tenant",
+    "agents mark offline",
+    "customer lookup",
+    "assignment view",
+    "completed customers to archive",
+]
+
+
+def test_every_check_is_covered(app):
+    assert [check[0] for check in checks()] == NAMES
+
+
+@pytest.mark.parametrize("name", NAMES)
+def test_hot_query_uses_its_index(app, name):
+    _, call, table, indexes, may_sort = next(check for check in checks() if check[0] == name)
+    plan = explain(*capture(call))
+    assert problems(plan, table, indexes, may_sort) == [], "\n".join(plan)
@@ -0,0 +1,78 @@
+from datetime import datetime, timedelta
+from app.models import Assignment, AssignmentHistory, Customer, OutboxEvent
+from app.repositories import AssignmentCache, OutboxRepository
+from app.services.agent_service import AgentService
+from app.services.retention_service import RetentionService
+from app.services.routing_service import RoutingService
+
+LATER = timedelta(seconds=600)
+
+
+def _route(app, customers):
+    app.config["RETENTION_CHUNK_SIZE"] = 2
+    app.config["RETENTION_CHUNK_PAUSE"] = 0
+    for i, customer_id in enumerate(customers):
+        AgentService.upsert_agent(f"a{i}", "t1", "available", skills="support", current_load=0)
+        RoutingService.assign_customer(customer_id, "t1", "support")
+
+
+def _complete(client, customer_id, tenant_id="t1"):
+    return client.post(f"/api/customers/{customer_id}/complete", json={"tenant_id": tenant_id})
+
+
+def test_complete_marks_the_customer_completed(app):
+    _route(app, ["c1"])
+    client = app.test_client()
+
+    response = _complete(client, "c1")
+    assert response.status_code == 200
+    assert response.get_json()["status"] == "completed"
+    assert _complete(client, "missing").status_code == 404
+    assert client.post("/api/customers/c1/complete", json={}).status_code == 400
+
+
+def test_completed_customers_are_archived_in_chunks_once_old_enough(app):
+    _route(app, ["c1", "c2", "c3", "c4"])
+    client = app.test_client()
+    for customer_id in ("c1", "c2", "c3"):
+        _complete(client, customer_id)
+    assert AssignmentCache.get("t1", "c1")[0]
+
+    # Completed just now: not yet old enough to archive
+    assert RetentionService.run()["archived"] == 0
+
+    # Three customers in chunks of two
+    assert RetentionService.run(now=datetime.utcnow() + LATER)["archived"] == 3
+    assert [a.customer_uid for a in Assignment.query] == ["c4"]
+    assert [c.customer_id for c in Customer.query] == ["c4"]
+    assert sorted(h.customer_uid for h in AssignmentHistory.query) == ["c1", "c2", "c3"]
+    assert AssignmentCache.get("t1", "c1") == (False, None)
+
+
+def test_expired_history_and_sent_outbox_events_are_purged(app):
+    app.config["ASSIGNMENT_OUTBOX"] = True
+    _route(app, ["c1", "c2", "c3"])
+    client = app.test_client()
+    for customer_id in ("c1", "c2"):
+        _complete(client, customer_id)
+    later = datetime.utcnow() + LATER
+    assert RetentionService.run(now=later)["archived"] == 2
+
+    ids = [e.id for e in OutboxEvent.query.order_by(OutboxEvent.id)]
+    OutboxRepository().mark_sent(ids[:2], sent_at=later - timedelta(days=2))
+    report = RetentionService.run(now=later)
+    assert report["outbox_purged"] == 2
+    assert report["history_purged"] == 0
+    assert [e.id for e in OutboxEvent.query] == ids[2:]
+
+    history_days = app.config.get("ASSIGNMENT_HISTORY_RETENTION_DAYS", 90)
+    assert RetentionService.run(now=later + timedelta(days=history_days + 1))["history_purged"] == 2
+    assert AssignmentHistory.query.count() == 0
+
+
+def test_stop_ends_the_pass_before_any_chunk(app):
+    _route(app, ["c1"])
+    _complete(app.test_client(), "c1")
+    report = RetentionService.run(now=datetime.utcnow() + LATER, stop=lambda: True)
+    assert report["archived"] == 0
+    assert Assignment.query.count() == 1
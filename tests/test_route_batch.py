@@ -0,0 +1,54 @@
+from datetime import datetime, timedelta
+from app.extensions import db
+from app.models import Customer, CustomerStatus
+from app.repositories import CustomerRepository
+
+
+def _post(client, items):
+    response = client.post("/api/customers/route/batch", json=items)
+    assert response.status_code == 202
+    return {r["index"]: r for r in response.json["results"]}
+
+
+def test_bad_items_fail_only_themselves(app):
+    results = _post(app.test_client(), [
+        {"customer_id": "c1", "tenant_id": "t1", "requested_skill": "support", "priority": 3},
+        {"customer_id": "c2", "tenant_id": "t1", "requested_skill": ["support"]},
+        {"customer_id": "c3", "tenant_id": "t1", "correlation_id": {"id": 1}},
+        {"customer_id": "c4", "tenant_id": "t1", "priority": 10 ** 12},
+        {"customer_id": "c5", "tenant_id": "t1", "priority": -1},
+        {"customer_id": "c6" * 40, "tenant_id": "t1"},
+        {"customer_id": "c7", "tenant_id": "t1", "priority": "high"},
+    ])
+
+    assert results[0]["status"] == "enqueued"
+    assert [results[i]["error"] for i in range(1, 7)] == [
+        "requested_skill must be a string",
+        "correlation_id must be a string",
+        "priority must be between 0 and 899",
+        "priority must be between 0 and 899",
+        "customer_id must be at most 64 characters",
+        "priority must be an integer",
+    ]
+    assert [c.customer_id for c in Customer.query] == ["c1"]
+
+
+def test_rows_are_overwritten_whatever_their_updated_at(app):
+    db.session.add_all([
+        Customer(customer_id="c1", tenant_id="t1", status=CustomerStatus.IN_PROGRESS,
+                 updated_at=datetime.utcnow() + timedelta(minutes=5)),
+        Customer(customer_id="c2", tenant_id="t2"),
+    ])
+    db.session.commit()
+
+    results = _post(app.test_client(), [
+        {"customer_id": "c1", "tenant_id": "t1", "priority": 2},
+        {"customer_id": "c2", "tenant_id": "t1"},
+    ])
+
+    assert results[0]["status"] == "enqueued"
+    assert results[1] == {"index": 1, "customer_id": "c2", "status": "rejected",
+                          "error": "customer_id belongs to another tenant"}
+    db.session.expire_all()
+    customer = CustomerRepository().get_by_customer_id("c1", "t1")
+    assert (customer.status, customer.priority) == (CustomerStatus.QUEUED, 2)
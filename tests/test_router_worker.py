@@ -0,0 +1,68 @@
+import workers.router_worker as router_worker
+from app.extensions import redis_client
+from app.models import Assignment
+from app.services.agent_service import AgentService
+from app.services.routing_service import RoutingService
+from workers.stats import WorkerStats
+from tests.helpers import DrainingConsumer, routing_message
+
+
+def _agents(*agent_ids):
+    for agent_id in agent_ids:
+        AgentService.upsert_agent(agent_id, "t1", "available", skills="support", current_load=0)
+
+
+def _run_batch(app, consumer):
+    # The consumer doubles as the shutdown flag
+    router_worker.run_batch(consumer, app, consumer, WorkerStats("router"))
+
+
+def test_batch_routes_and_commits_past_settled_messages(app):
+    _agents("a0", "a1")
+    consumer = DrainingConsumer([
+        routing_message(0, "c1", requested_skill="support"),
+        routing_message(1, "c2", requested_skill="billing"),
+        routing_message(2, "c3", requested_skill="support"),
+    ])
+
+    _run_batch(app, consumer)
+
+    assert {a.customer_uid for a in Assignment.query} == {"c1", "c3"}
+    assert consumer.committed() == {("routing", 0): 3}
+
+
+def test_failed_batch_is_rewound_and_its_claims_released(app, monkeypatch):
+    _agents("a0", "a1", "a2")
+    consumer = DrainingConsumer([routing_message(0, "c1"), routing_message(1, "c2")])
+    persist = RoutingService._persist_assignments
+    calls = []
+
+    def fail_once(*args, **kwargs):
+        calls.append(1)
+        if len(calls) == 1:
+            raise RuntimeError("database unavailable")
+        return persist(*args, **kwargs)
+
+    monkeypatch.setattr(RoutingService, "_persist_assignments", staticmethod(fail_once))
+    monkeypatch.setattr(router_worker.time, "sleep", lambda seconds: None)
+
+    _run_batch(app, consumer)
+
+    assert len(calls) == 2
+    assert {a.customer_uid for a in Assignment.query} == {"c1", "c2"}
+    assert consumer.committed() == {("routing", 0): 2}
+    # Only the retried batch's two claims remain
+    r = redis_client.client
+    assert sum(load for _, load in r.zrange("agents:available:t1", 0, -1, withscores=True)) == 2
+    assert len(r.keys("lock:agent:t1:*")) == 2
+
+
+def test_single_mode_skips_payloads_that_are_not_objects(app):
+    _agents("a0")
+    bad = routing_message(0, "c0")
+    bad._value = b"[]"
+    consumer = DrainingConsumer([bad, routing_message(1, "c1")])
+
+    router_worker.run_single(consumer, app, consumer, WorkerStats("router"))
+
+    assert [a.customer_uid for a in Assignment.query] == ["c1"]
@@ -0,0 +1,70 @@
+from types import SimpleNamespace
+import workers.sharded_router as sharded_router
+from app.extensions import kafka_producer
+from app.models import Assignment
+from app.services.agent_service import AgentService
+from app.utils.partitioning import tenant_partition
+from workers.sharded_router import ShardedRouter
+from workers.stats import WorkerStats
+from tests.helpers import DrainingConsumer, routing_message
+
+PARTITIONS = 12
+OWNED = tenant_partition("t1", PARTITIONS)
+
+
+def _router(app, consumer):
+    app.config.update(ROUTING_SHARD_BY_TENANT=True, ROUTING_PARTITIONS=PARTITIONS)
+    router = ShardedRouter(consumer, None, app, SimpleNamespace(requested=False), WorkerStats("router"))
+    router.topic = "routing"
+    router.shard.own([OWNED])
+    return router
+
+
+def _message(offset, customer_id, tenant_id="t1", partition=OWNED, **fields):
+    return routing_message(offset, customer_id, tenant_id, partition=partition, **fields)
+
+
+def test_routes_owned_tenants_and_forwards_misplaced_requests(app):
+    AgentService.upsert_agent("a0", "t1", "available", skills="support", current_load=0)
+    consumer = DrainingConsumer([])
+    misplaced = (OWNED + 1) % PARTITIONS
+
+    _router(app, consumer)._route([
+        _message(5, "c1", requested_skill="support"),
+        _message(7, "c2", partition=misplaced),
+    ])
+
+    assert [a.customer_uid for a in Assignment.query] == ["c1"]
+    kafka_producer.flush()
+    assert [(m.partition(), m.key()) for m in kafka_producer._producer.messages if m.topic() == "routing"] == [
+        (OWNED, b"c2"),
+    ]
+    assert consumer.committed() == {("routing", OWNED): 6, ("routing", misplaced): 8}
+
+
+def test_failed_batch_is_rewound(app, monkeypatch):
+    consumer = DrainingConsumer([_message(5, "c1"), _message(6, "c2")])
+    consumer.consume(2)
+    router = _router(app, consumer)
+
+    def unavailable(*args, **kwargs):
+        raise RuntimeError("database unavailable")
+
+    monkeypatch.setattr(router.shard, "route", unavailable)
+    monkeypatch.setattr(sharded_router.time, "sleep", lambda seconds: None)
+    router._route([_message(5, "c1"), _message(6, "c2")])
+
+    assert consumer.commits == []
+    assert [m.offset() for m in consumer.consume(10)] == [5, 6]
+
+
+def test_requests_of_revoked_partitions_are_counted_and_left_uncommitted(app):
+    consumer = DrainingConsumer([])
+    router = _router(app, consumer)
+    router.shard.release([OWNED])
+    before = sharded_router.UNOWNED_REQUESTS._default.value
+
+    router._route([_message(5, "c1")])
+
+    assert sharded_router.UNOWNED_REQUESTS._default.value == before + 1
+    assert consumer.commits == []
@@ -0,0 +1,48 @@
+from app.extensions import db, kafka_producer
+from app.models import Customer, CustomerStatus
+from app.repositories import CustomerRepository
+from app.services.routing_service import RoutingService
+from workers.customer_writer_worker import customer_rows
+from tests.helpers import routing_message
+
+
+def _produced():
+    kafka_producer.flush()
+    return [m for m in kafka_producer._producer.messages if m.topic() == "customer.routing.requests"]
+
+
+def test_api_defers_the_customer_row_to_the_writer(app):
+    app.config["CUSTOMER_WRITE_BEHIND"] = True
+    client = app.test_client()
+    client.post("/api/customers/route", json={"customer_id": "c1", "tenant_id": "t1", "priority": 4})
+    client.post("/api/customers/route/batch", json=[{"customer_id": "c2", "tenant_id": "t1"}])
+    assert Customer.query.count() == 0
+
+    CustomerRepository().bulk_upsert(customer_rows(_produced()))
+    db.session.commit()
+
+    customers = {c.customer_id: c for c in Customer.query}
+    assert set(customers) == {"c1", "c2"}
+    assert (customers["c1"].status, customers["c1"].priority) == (CustomerStatus.QUEUED, 4)
+
+
+def test_late_writer_never_rolls_back_the_routers_status(app):
+    app.config["CUSTOMER_WRITE_BEHIND"] = True
+    app.test_client().post("/api/customers/route", json={"customer_id": "c1", "tenant_id": "t1"})
+    request = _produced()
+    # The router marks the customer before the writer gets to the request
+    RoutingService._mark_customers_in_progress("t1", [("c1", None, 0)])
+    db.session.commit()
+
+    assert CustomerRepository().bulk_upsert(customer_rows(request)) == set()
+    db.session.commit()
+    assert CustomerRepository().get_by_customer_id("c1", "t1").status == CustomerStatus.IN_PROGRESS
+
+
+def test_latest_request_per_customer_wins():
+    rows = customer_rows([
+        routing_message(0, "c1", priority=1, enqueued_at="2026-01-01T00:00:00"),
+        routing_message(1, "c1", priority=5, enqueued_at="2026-01-01T00:00:01"),
+        routing_message(2, "c2", tenant_id=None),
+    ])
+    assert [(r["customer_id"], r["priority"]) for r in rows] == [("c1", 5)]
@@ -2,6 +2,15 @@
 Kafka stream processing workers for contact-center routing system.
 
 - router_worker.py: consumes customer routing requests and assigns agents.
+- sharded_router.py: ROUTER_MODE=sharded, routes the tenants of owned partitions from local state.
 - agent_status_worker.py: consumes agent status updates and maintains presence.
+- customer_writer_worker.py: batch-persists customer rows from routing requests (write-behind mode).
+- outbox_relay.py: produces committed outbox events (assignment events in outbox mode) in batches.
+- agent_cache_reconciler.py: periodically repairs drift between the Redis agent mirror and the DB.
+- heartbeat_worker.py: records agent heartbeats in Redis presence sets, without DB writes.
+- presence_sweeper.py: bulk-marks agents offline once their heartbeats stop.
+- retention_worker.py: archives completed assignments into their history and purges expired rows in chunks.
 - kafka_utils.py: shared config, serialization, and consumer utility functions.
+- stats.py: per-process throughput and consumer-lag reporting.
+- supervisor.py: runs N processes of one worker type with restarts and graceful drain.
 """
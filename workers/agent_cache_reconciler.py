@@ -0,0 +1,59 @@
+"""
+Keep the Redis agent mirror in step with the database.
+
+    python -m workers.supervisor agent_cache_reconciler --processes 1
+
+Every AGENT_CACHE_RECONCILE_INTERVAL seconds each tenant's agents are compared with their Redis hashes and
+availability index entries; drifted agents are rewritten from the DB, orphaned index entries removed and
+the remaining hashes' TTLs refreshed, so the mirror survives Redis restarts and key expiry.
+"""
+import logging
+import time
+from app.extensions import db
+from app.services.agent_cache import AgentCache
+from workers.kafka_utils import GracefulShutdown
+from workers.stats import WorkerStats, serve_metrics
+from app import create_app
+
+logger = logging.getLogger("agent_cache_reconciler")
+
+
+def main(stats_queue=None):
+    shutdown = GracefulShutdown()
+    app = create_app("production")
+    app.app_context().push()
+
+    interval = app.config.get("AGENT_CACHE_RECONCILE_INTERVAL", 60)
+    stats = WorkerStats("agent_cache_reconciler", stats_queue)
+    serve_metrics(app)
+    logger.info(f"Agent cache reconciler started, every {interval}s")
+    try:
+        while not shutdown.requested:
+            stats.maybe_report()
+            started = time.monotonic()
+            try:
+                with stats.timed("process"):
+                    report = AgentCache.reconcile()
+                # End the read transaction so the next pass sees fresh rows
+                db.session.rollback()
+            except Exception as e:
+                db.session.rollback()
+                logger.exception(f"Error reconciling the agent cache: {e}")
+                report = {}
+
+            checked = report.pop("checked", 0)
+            stats.record(checked)
+            for kind, count in report.items():
+                stats.incr(f"drift_{kind}", count)
+            logger.info(f"Reconciled {checked} agents; drift: {report or 'none'}")
+            while not shutdown.requested and time.monotonic() - started < interval:
+                time.sleep(0.5)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        logger.info("Agent cache reconciler shutdown gracefully.")
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    main()
@@ -1,52 +1,101 @@
 import logging
 import time
 from confluent_kafka import KafkaException
-from app.extensions import db
+from app.extensions import db, kafka_producer
+from app.models import AgentStatus
 from app.services.agent_service import AgentService
-from workers.kafka_utils import create_consumer, parse_message
+from workers.kafka_utils import GracefulShutdown, create_consumer, parse_message, rewind
+from workers.stats import WorkerStats, serve_metrics
 from app import create_app
 
 logger = logging.getLogger("agent_status_worker")
 
+STATUSES = {s.value for s in AgentStatus}
 
-def main():
+RETRY_BACKOFF = 1.0
+
+
+def coalesce(msgs):
+    """
+    Reduce a batch of status events to one update per (tenant, agent), applied in offset order.
+
+    Later events win field by field: a later event without skills or current_load keeps the value an
+    earlier event in the batch declared, so no change is lost. Returns (updates, coalesced) where
+    coalesced counts the events folded into a later one.
+    """
+    updates = {}
+    valid = 0
+    for msg in msgs:
+        if msg.error():
+            logger.error(f"Consumer error: {msg.error()}")
+            continue
+        try:
+            key, data = parse_message(msg)
+        except KafkaException as e:
+            logger.error(f"Skipping undecodable message at {msg.topic()}[{msg.partition()}]@{msg.offset()}: {e}")
+            continue
+        if not data or not data.get("agent_id") or not data.get("tenant_id") or data.get("status") not in STATUSES:
+            logger.error(f"Skipping malformed agent status message key={key}")
+            continue
+        valid += 1
+        update = updates.setdefault((data["tenant_id"], data["agent_id"]), {
+            "agent_id": data["agent_id"],
+            "tenant_id": data["tenant_id"],
+            "skills": None,
+            "current_load": None,
+        })
+        update["status"] = data["status"]
+        for field in ("skills", "current_load"):
+            if data.get(field) is not None:
+                update[field] = data[field]
+    return list(updates.values()), valid - len(updates)
+
+
+def main(stats_queue=None):
+    shutdown = GracefulShutdown()
     app = create_app("production")
     app.app_context().push()
 
     consumer = create_consumer(group_id="agent_status_worker_group", bootstrap_servers=app.config['KAFKA_BOOTSTRAP_SERVERS'])
-    topic = "agent.status"
+    topic = app.config.get("TOPIC_AGENT_STATUS", "agent.status")
     consumer.subscribe([topic])
     logger.info(f"Agent Status worker subscribed to topic: {topic}")
 
+    batch_size = app.config.get("AGENT_STATUS_BATCH_SIZE", 500)
+    max_wait = app.config.get("AGENT_STATUS_BATCH_MAX_WAIT", 0.1)
+    stats = WorkerStats("agent_status", stats_queue)
+    serve_metrics(app)
     try:
-        while True:
-            msg = consumer.poll(timeout=1.0)
-            if msg is None:
-                continue
-            if msg.error():
-                logger.error(f"Consumer error: {msg.error()}")
+        while not shutdown.requested:
+            stats.maybe_report(consumer)
+            msgs = consumer.consume(num_messages=batch_size, timeout=max_wait)
+            if not msgs:
                 continue
+            stats.observe_batch(len(msgs))
 
-            key, data = parse_message(msg)
-            logger.info(f"Consumed agent status message key={key}, value={data}")
-
+            updates, coalesced = coalesce(msgs)
             try:
-                AgentService.upsert_agent(
-                    agent_id=data.get("agent_id"),
-                    tenant_id=data.get("tenant_id"),
-                    status=data.get("status"),
-                    skills=data.get("skills"),
-                    current_load=data.get("current_load"),
-                )
-                consumer.commit(message=msg)
+                with stats.timed("process"):
+                    written = AgentService.upsert_agents(updates)
             except Exception as e:
-                logger.exception(f"Error processing agent status message key={key}: {e}")
+                # Seek back so the batch is retried; the consumer's position has already moved past it
+                db.session.rollback()
+                logger.exception(f"Error applying {len(updates)} agent status updates; retrying batch: {e}")
+                rewind(consumer, msgs)
+                time.sleep(RETRY_BACKOFF)
+                continue
 
-            time.sleep(0.01)
+            logger.info(f"Applied {written} agent status updates from {len(msgs)} messages ({coalesced} coalesced)")
+            stats.record(len(msgs))
+            stats.incr("coalesced", coalesced)
+            with stats.timed("commit"):
+                consumer.commit(asynchronous=False)
     except KeyboardInterrupt:
         pass
     finally:
         consumer.close()
+        # Deliver assignment events still queued in the shared producer
+        kafka_producer.close()
         logger.info("Agent Status worker shutdown gracefully.")
 
 
@@ -0,0 +1,188 @@
+import asyncio
+import logging
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from confluent_kafka import KafkaException, TopicPartition
+from app.services.routing_service import SETTLED_STATUSES, RoutingService
+from workers.kafka_utils import message_trace, parse_message
+
+logger = logging.getLogger("async_router")
+
+
+class OffsetTracker:
+    """
+    Tracks in-flight offsets per partition and advances the commit point only across a contiguous
+    run of completed offsets, so a slow message never gets skipped by faster ones behind it.
+    """
+
+    def __init__(self):
+        self._pending = {}
+        self._done = {}
+        self._committable = {}
+
+    def add(self, topic, partition, offset):
+        self._pending.setdefault((topic, partition), deque()).append(offset)
+        self._done.setdefault((topic, partition), set())
+
+    def complete(self, topic, partition, offset):
+        tp = (topic, partition)
+        if tp not in self._pending:
+            return
+        self._done[tp].add(offset)
+        pending, done = self._pending[tp], self._done[tp]
+        while pending and pending[0] in done:
+            done.discard(pending[0])
+            self._committable[tp] = pending.popleft() + 1
+
+    def in_flight(self, partitions=None) -> int:
+        return sum(len(p) for tp, p in self._pending.items() if partitions is None or tp in partitions)
+
+    def committable(self, partitions=None) -> list:
+        """Pop the offsets that advanced since the last call, as TopicPartitions ready to commit."""
+        ready = [tp for tp in self._committable if partitions is None or tp in partitions]
+        return [TopicPartition(t, p, self._committable.pop((t, p))) for t, p in ready]
+
+    def drop(self, partitions):
+        for tp in partitions:
+            self._pending.pop(tp, None)
+            self._done.pop(tp, None)
+            self._committable.pop(tp, None)
+
+
+class AsyncRouter:
+    """
+    Routes many messages concurrently while keeping messages of the same key (customer_id) strictly
+    ordered: each message chains on the previous in-flight message with its key.
+
+    The consumer is only touched from one dedicated thread; routing calls run in a bounded thread pool,
+    each inside its own app context, so their Redis, DB and Kafka waits overlap.
+    """
+
+    def __init__(self, consumer, app, shutdown, stats, agent_view=None):
+        self.consumer = consumer
+        self.app = app
+        self.shutdown = shutdown
+        self.stats = stats
+        self.agent_view = agent_view
+        self.concurrency = app.config.get("ROUTER_ASYNC_CONCURRENCY", 16)
+        self.batch_size = app.config.get("ROUTER_BATCH_SIZE", 500)
+        self.max_wait = app.config.get("ROUTER_BATCH_MAX_WAIT", 0.05)
+        self.assignments_topic = app.config.get("TOPIC_ASSIGNMENTS", "customer.assignments")
+        self.tracker = OffsetTracker()
+        self._consumer_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="router-consumer")
+        self._route_executor = ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix="router-route")
+        self._tails = {}
+        self._tasks = set()
+        self._loop = None
+        self._slots = None
+
+    def subscribe(self, topic):
+        self.consumer.subscribe([topic], on_revoke=self._on_revoke)
+
+    def run(self):
+        asyncio.run(self._run())
+
+    async def _run(self):
+        self._loop = asyncio.get_running_loop()
+        self._slots = asyncio.Semaphore(self.concurrency)
+        try:
+            while not self.shutdown.requested:
+                self.stats.maybe_report(self.consumer)
+                msgs = await self._on_consumer(self.consumer.consume, self.batch_size, self.max_wait)
+                if msgs:
+                    self.stats.observe_batch(len(msgs))
+                for msg in msgs:
+                    await self._dispatch(msg)
+                await self._commit()
+        finally:
+            # Drain everything in flight before the consumer is closed
+            if self._tasks:
+                await asyncio.gather(*self._tasks, return_exceptions=True)
+            await self._commit()
+            self._route_executor.shutdown(wait=True)
+            self._consumer_executor.shutdown(wait=True)
+
+    async def _dispatch(self, msg):
+        if msg.error():
+            logger.error(f"Consumer error: {msg.error()}")
+            return
+        await self._slots.acquire()
+        self.tracker.add(msg.topic(), msg.partition(), msg.offset())
+        key = msg.key()
+        task = asyncio.create_task(self._process(msg, self._tails.get(key)))
+        self._tails[key] = task
+        self._tasks.add(task)
+        task.add_done_callback(lambda t, key=key: self._finished(t, key))
+
+    def _finished(self, task, key):
+        self._tasks.discard(task)
+        if self._tails.get(key) is task:
+            del self._tails[key]
+        self._slots.release()
+
+    async def _process(self, msg, previous):
+        trace = message_trace(msg)
+        if previous is not None:
+            # Same-key ordering: wait for the earlier message, whatever its outcome
+            await asyncio.wait([previous])
+        try:
+            key, data = parse_message(msg)
+            result, status = await self._loop.run_in_executor(self._route_executor, self._route, data, trace)
+            logger.info(f"Routing result: {result}, status: {status}")
+            self.stats.record()
+            if result.get("status") not in SETTLED_STATUSES:
+                logger.warning(f"Unsettled routing result for key={key}: {result}")
+        except KafkaException as e:
+            logger.error(f"Skipping undecodable message at {msg.topic()}[{msg.partition()}]@{msg.offset()}: {e}")
+        except Exception as e:
+            logger.exception(f"Error processing message key={msg.key()}: {e}")
+        finally:
+            # Like single mode, a failed message does not hold back commits of the messages after it
+            self.tracker.complete(msg.topic(), msg.partition(), msg.offset())
+
+    def _route(self, data, trace=None):
+        with self.app.app_context(), self.stats.timed("process"):
+            return RoutingService.assign_customer(
+                customer_id=data.get("customer_id"),
+                tenant_id=data.get("tenant_id"),
+                requested_skill=data.get("requested_skill"),
+                priority=data.get("priority"),
+                topic=self.assignments_topic,
+                agent_view=self.agent_view,
+                trace=trace,
+            )
+
+    async def _commit(self, partitions=None):
+        offsets = self.tracker.committable(partitions)
+        if offsets:
+            with self.stats.timed("commit"):
+                await self._on_consumer(self.consumer.commit, offsets=offsets, asynchronous=False)
+
+    def _on_consumer(self, fn, *args, **kwargs):
+        return self._loop.run_in_executor(self._consumer_executor, lambda: fn(*args, **kwargs))
+
+    def _on_revoke(self, consumer, partitions):
+        """Runs on the consumer thread inside consume(): finish and commit revoked partitions before handing them off."""
+        revoked = {(tp.topic, tp.partition) for tp in partitions}
+        try:
+            if self._loop is None or self._loop.is_closed():
+                # Revocation from consumer.close(): run() has already drained everything
+                offsets = self.tracker.committable(revoked)
+            else:
+                offsets = asyncio.run_coroutine_threadsafe(self._drain(revoked), self._loop).result(timeout=30)
+            if offsets:
+                consumer.commit(offsets=offsets, asynchronous=False)
+        except Exception as e:
+            logger.error(f"Could not drain revoked partitions {sorted(revoked)}: {e}")
+        self.tracker.drop(revoked)
+
+    async def _drain(self, revoked):
+        while self.tracker.in_flight(revoked):
+            await asyncio.sleep(0.01)
+        return self.tracker.committable(revoked)
+
+
+def run_async(consumer, app, shutdown, stats, topic, agent_view=None):
+    router = AsyncRouter(consumer, app, shutdown, stats, agent_view)
+    router.subscribe(topic)
+    router.run()
@@ -0,0 +1,102 @@
+import logging
+import time
+from datetime import datetime
+from confluent_kafka import KafkaException
+from app.extensions import db
+from app.models import CustomerStatus
+from app.repositories import CustomerRepository
+from workers.kafka_utils import GracefulShutdown, create_consumer, parse_message, rewind
+from workers.stats import WorkerStats, serve_metrics
+from app import create_app
+
+logger = logging.getLogger("customer_writer_worker")
+
+RETRY_BACKOFF = 1.0
+
+
+def customer_rows(msgs) -> list:
+    """
+    Build one Queued customer row per customer_id from a batch of routing requests.
+
+    The latest request for a customer wins; updated_at is the API's enqueued_at, so the upsert's
+    newer-wins rule never rolls back a status the router wrote after the request was accepted.
+    """
+    rows = {}
+    for msg in msgs:
+        if msg.error():
+            logger.error(f"Consumer error: {msg.error()}")
+            continue
+        try:
+            key, data = parse_message(msg)
+        except KafkaException as e:
+            logger.error(f"Skipping undecodable message at {msg.topic()}[{msg.partition()}]@{msg.offset()}: {e}")
+            continue
+        if not data or not data.get("customer_id") or not data.get("tenant_id"):
+            logger.error(f"Skipping malformed routing request key={key}")
+            continue
+        try:
+            enqueued_at = datetime.fromisoformat(data["enqueued_at"])
+        except (KeyError, TypeError, ValueError):
+            enqueued_at = datetime.utcnow()
+        rows[data["customer_id"]] = {
+            "customer_id": data["customer_id"],
+            "tenant_id": data["tenant_id"],
+            "requested_skill": data.get("requested_skill"),
+            "priority": int(data.get("priority") or 0),
+            "status": CustomerStatus.QUEUED,
+            "updated_at": enqueued_at,
+        }
+    return list(rows.values())
+
+
+def main(stats_queue=None):
+    shutdown = GracefulShutdown()
+    app = create_app("production")
+    app.app_context().push()
+
+    consumer = create_consumer(group_id="customer_writer_group", bootstrap_servers=app.config['KAFKA_BOOTSTRAP_SERVERS'])
+    topic = app.config.get("TOPIC_ROUTING_REQUESTS", "customer.routing.requests")
+    consumer.subscribe([topic])
+    logger.info(f"Customer writer worker subscribed to topic: {topic}")
+
+    batch_size = app.config.get("CUSTOMER_WRITER_BATCH_SIZE", 1000)
+    max_wait = app.config.get("CUSTOMER_WRITER_MAX_WAIT", 0.2)
+    stats = WorkerStats("customer_writer", stats_queue)
+    serve_metrics(app)
+    try:
+        while not shutdown.requested:
+            stats.maybe_report(consumer)
+            msgs = consumer.consume(num_messages=batch_size, timeout=max_wait)
+            if not msgs:
+                continue
+            stats.observe_batch(len(msgs))
+
+            rows = customer_rows(msgs)
+            try:
+                with stats.timed("process"):
+                    written = CustomerRepository().bulk_upsert(rows)
+                    db.session.commit()
+            except Exception as e:
+                db.session.rollback()
+                logger.exception(f"Error writing {len(rows)} customers; retrying batch: {e}")
+                rewind(consumer, msgs)
+                time.sleep(RETRY_BACKOFF)
+                continue
+
+            skipped = len(rows) - len(written)
+            if skipped:
+                # Either a newer write already landed or the customer_id belongs to another tenant
+                logger.info(f"Customer writer left {skipped} of {len(rows)} customers unchanged")
+            stats.record(len(msgs))
+            with stats.timed("commit"):
+                consumer.commit(asynchronous=False)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        consumer.close()
+        logger.info("Customer writer worker shutdown gracefully.")
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    main()
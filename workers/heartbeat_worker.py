@@ -0,0 +1,78 @@
+import logging
+from confluent_kafka import KafkaException
+from app.extensions import kafka_producer
+from app.services.presence import Presence
+from workers.kafka_utils import GracefulShutdown, create_consumer, parse_message
+from workers.stats import WorkerStats, serve_metrics
+from app import create_app
+
+logger = logging.getLogger("heartbeat_worker")
+
+
+def collect(msgs) -> list:
+    """(tenant_id, agent_id, seen_ms) per valid heartbeat, seen at the message's broker/producer timestamp."""
+    heartbeats = []
+    for msg in msgs:
+        if msg.error():
+            logger.error(f"Consumer error: {msg.error()}")
+            continue
+        try:
+            key, data = parse_message(msg)
+        except KafkaException as e:
+            logger.error(f"Skipping undecodable message at {msg.topic()}[{msg.partition()}]@{msg.offset()}: {e}")
+            continue
+        if not data or not data.get("agent_id") or not data.get("tenant_id"):
+            logger.error(f"Skipping malformed heartbeat key={key}")
+            continue
+        kind, ts = msg.timestamp()
+        heartbeats.append((data["tenant_id"], data["agent_id"], ts if kind else None))
+    return heartbeats
+
+
+def main(stats_queue=None):
+    shutdown = GracefulShutdown()
+    app = create_app("production")
+    app.app_context().push()
+
+    # Heartbeats are superseded within seconds, so a fresh consumer group skips any backlog
+    consumer = create_consumer(group_id="heartbeat_worker_group", bootstrap_servers=app.config['KAFKA_BOOTSTRAP_SERVERS'],
+                               auto_offset_reset="latest")
+    topic = app.config.get("TOPIC_AGENT_HEARTBEAT", "agent.heartbeat")
+    consumer.subscribe([topic])
+    logger.info(f"Heartbeat worker subscribed to topic: {topic}")
+
+    batch_size = app.config.get("HEARTBEAT_BATCH_SIZE", 5000)
+    max_wait = app.config.get("HEARTBEAT_BATCH_MAX_WAIT", 0.5)
+    stats = WorkerStats("heartbeat", stats_queue)
+    serve_metrics(app)
+    try:
+        while not shutdown.requested:
+            stats.maybe_report(consumer)
+            msgs = consumer.consume(num_messages=batch_size, timeout=max_wait)
+            if not msgs:
+                continue
+            stats.observe_batch(len(msgs))
+
+            heartbeats = collect(msgs)
+            try:
+                with stats.timed("process"):
+                    Presence.touch_many(heartbeats)
+            except Exception as e:
+                logger.exception(f"Error recording {len(heartbeats)} heartbeats: {e}")
+                continue
+
+            stats.record(len(msgs))
+            with stats.timed("commit"):
+                # A lost commit only replays heartbeats, which GT makes harmless
+                consumer.commit(asynchronous=True)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        consumer.close()
+        kafka_producer.close()
+        logger.info("Heartbeat worker shutdown gracefully.")
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    main()
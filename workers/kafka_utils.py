@@ -1,5 +1,7 @@
-import json
-from confluent_kafka import Consumer, KafkaException
+import signal
+from confluent_kafka import Consumer, KafkaException, TopicPartition
+from app.utils.codec import CodecError, decode
+from app.utils.tracing import CONSUMED, Trace
 
 
 def create_consumer(group_id, bootstrap_servers="localhost:9092", auto_offset_reset="earliest"):
@@ -23,24 +25,50 @@ def create_consumer(group_id, bootstrap_servers="localhost:9092", auto_offset_re
     return consumer
 
 
-def json_deserializer(message):
-    """
-    Decode Kafka message value bytes to Python dict.
-    """
-    if message is None:
-        return None
-    try:
-        return json.loads(message.decode("utf-8"))
-    except Exception as ex:
-        raise KafkaException(f"Failed to deserialize message: {ex}")
+def rewind(consumer, msgs):
+    """Seek every partition in the batch back to its first message so the batch is consumed again."""
+    first = {}
+    for msg in msgs:
+        if not msg.error():
+            first.setdefault((msg.topic(), msg.partition()), msg.offset())
+    for (topic, partition), offset in first.items():
+        consumer.seek(TopicPartition(topic, partition, offset))
 
 
 def parse_message(message):
     """
-    Parse Kafka message to dict with key and value.
+    Parse Kafka message to dict with key and value, decoding the value with the codec its headers name.
     """
     key = message.key()
     if key:
         key = key.decode("utf-8")
-    value = json_deserializer(message.value())
+    if message.value() is None:
+        return key, None
+    try:
+        value = decode(message.value(), message.headers())
+    except CodecError as ex:
+        raise KafkaException(f"Failed to deserialize message: {ex}")
     return key, value
+
+
+def message_trace(message):
+    """Trace context from a message's headers, stamped as consumed now; None for untraced messages."""
+    trace = Trace.from_headers(message.headers())
+    if trace is not None:
+        trace.stamp(CONSUMED)
+    return trace
+
+
+class GracefulShutdown:
+    """
+    Turn SIGTERM/SIGINT into a flag that poll loops check between iterations, so a worker can finish
+    its in-flight message or batch, commit and close its consumer cleanly.
+    """
+
+    def __init__(self):
+        self.requested = False
+        signal.signal(signal.SIGTERM, self._handle)
+        signal.signal(signal.SIGINT, self._handle)
+
+    def _handle(self, signum, frame):
+        self.requested = True
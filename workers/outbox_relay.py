@@ -0,0 +1,100 @@
+"""
+Produce committed outbox events to Kafka in large, ordered batches.
+
+    python -m workers.supervisor outbox_relay --processes 1
+
+Each cycle locks the oldest pending events, produces them all through the shared producer, waits once
+for the batch's deliveries and stamps the delivered ones sent with one UPDATE. Delivery is at least
+once: events are only marked sent after the broker acknowledged them, so a crash re-sends the batch.
+"""
+import logging
+import time
+from concurrent import futures
+from app.extensions import db, kafka_producer
+from app.repositories import OutboxRepository
+from workers.kafka_utils import GracefulShutdown
+from workers.stats import WorkerStats, serve_metrics
+from app import create_app
+
+logger = logging.getLogger("outbox_relay")
+
+RETRY_BACKOFF = 1.0
+
+
+def relay_batch(repo: OutboxRepository, batch_size: int, delivery_timeout: float):
+    """
+    Relay one batch of pending events; returns (sent, claimed).
+
+    Only the longest delivered prefix of the batch is marked sent. Events after a failed one are sent
+    again with it on the next cycle, so for any key the last event consumers see is still the latest.
+    """
+    events = repo.claim_pending(batch_size)
+    if not events:
+        # End the transaction so the next poll sees newly committed events
+        db.session.commit()
+        return 0, 0
+
+    pending = []
+    try:
+        for event in events:
+            key = event.key.encode("utf-8") if event.key is not None else None
+            pending.append(kafka_producer.send(event.topic, event.payload, key=key, headers=event.kafka_headers()))
+    except BufferError as e:
+        # Producer backlog is full; relay what was queued and pick the rest up next cycle
+        logger.warning(f"Queued {len(pending)} of {len(events)} outbox events: {e}")
+    futures.wait(pending, timeout=delivery_timeout)
+
+    delivered = []
+    for event, future in zip(events, pending):
+        if not future.done() or future.exception() is not None:
+            error = future.exception() if future.done() else "delivery not confirmed before timeout"
+            logger.error(f"Outbox event {event.id} to {event.topic} not delivered, retrying: {error}")
+            break
+        delivered.append(event.id)
+    repo.mark_sent(delivered)
+    db.session.commit()
+    return len(delivered), len(events)
+
+
+def main(stats_queue=None):
+    shutdown = GracefulShutdown()
+    app = create_app("production")
+    app.app_context().push()
+
+    batch_size = app.config.get("OUTBOX_RELAY_BATCH_SIZE", 1000)
+    poll_interval = app.config.get("OUTBOX_RELAY_POLL_INTERVAL", 0.2)
+    delivery_timeout = app.config.get("OUTBOX_RELAY_DELIVERY_TIMEOUT", 30.0)
+    repo = OutboxRepository()
+    stats = WorkerStats("outbox_relay", stats_queue)
+    serve_metrics(app)
+    logger.info(f"Outbox relay started with batches of {batch_size} events")
+    try:
+        while not shutdown.requested:
+            stats.maybe_report()
+            try:
+                with stats.timed("process"):
+                    sent, claimed = relay_batch(repo, batch_size, delivery_timeout)
+            except Exception as e:
+                db.session.rollback()
+                logger.exception(f"Error relaying outbox events: {e}")
+                time.sleep(RETRY_BACKOFF)
+                continue
+
+            stats.record(sent)
+            if claimed:
+                stats.observe_batch(claimed)
+            if sent < claimed:
+                time.sleep(RETRY_BACKOFF)
+            elif claimed < batch_size:
+                # Drained; a full batch means more are waiting, so only idle once caught up
+                time.sleep(poll_interval)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        kafka_producer.close()
+        logger.info("Outbox relay shutdown gracefully.")
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    main()
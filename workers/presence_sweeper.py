@@ -0,0 +1,58 @@
+"""
+Mark agents offline once their heartbeats stop.
+
+    python -m workers.supervisor presence_sweeper --processes 1
+
+Every PRESENCE_SWEEP_INTERVAL seconds, agents last seen more than PRESENCE_TIMEOUT seconds ago are set
+offline with one UPDATE and one Redis pipeline, and taken out of the availability index. Only agents that
+heartbeat (POST /api/agents/heartbeat or the agent.heartbeat topic) are tracked.
+"""
+import logging
+import time
+from app.extensions import db, kafka_producer
+from app.services.agent_service import AgentService
+from workers.kafka_utils import GracefulShutdown
+from workers.stats import WorkerStats, serve_metrics
+from app import create_app
+
+logger = logging.getLogger("presence_sweeper")
+
+
+def main(stats_queue=None):
+    shutdown = GracefulShutdown()
+    app = create_app("production")
+    app.app_context().push()
+
+    interval = app.config.get("PRESENCE_SWEEP_INTERVAL", 5.0)
+    timeout = app.config.get("PRESENCE_TIMEOUT", 30.0)
+    stats = WorkerStats("presence_sweeper", stats_queue)
+    serve_metrics(app)
+    logger.info(f"Presence sweeper started: agents silent for {timeout}s go offline, checked every {interval}s")
+    try:
+        while not shutdown.requested:
+            stats.maybe_report()
+            started = time.monotonic()
+            try:
+                with stats.timed("process"):
+                    swept = AgentService.sweep_presence(timeout)
+                db.session.rollback()
+            except Exception as e:
+                db.session.rollback()
+                logger.exception(f"Error sweeping stale agents: {e}")
+                swept = 0
+            if swept:
+                logger.info(f"Marked {swept} silent agents offline")
+            stats.record(swept)
+            while not shutdown.requested and time.monotonic() - started < interval:
+                time.sleep(min(interval, 0.5))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        # Deliver status events of swept agents (tenant-sharded mode)
+        kafka_producer.close()
+        logger.info("Presence sweeper shutdown gracefully.")
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    main()
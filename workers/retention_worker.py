@@ -0,0 +1,56 @@
+"""
+Archive completed customers' assignments and purge expired history and sent outbox events.
+
+    python -m workers.supervisor retention --processes 1
+
+Every RETENTION_INTERVAL seconds runs one RetentionService pass: chunked, short transactions that move
+customers completed more than COMPLETED_ARCHIVE_AFTER seconds ago into assignment_history and age out
+what the retention settings no longer keep.
+"""
+import logging
+import time
+from app.extensions import db
+from app.services.retention_service import RetentionService
+from workers.kafka_utils import GracefulShutdown
+from workers.stats import WorkerStats, serve_metrics
+from app import create_app
+
+logger = logging.getLogger("retention_worker")
+
+
+def main(stats_queue=None):
+    shutdown = GracefulShutdown()
+    app = create_app("production")
+    app.app_context().push()
+
+    interval = app.config.get("RETENTION_INTERVAL", 60.0)
+    stats = WorkerStats("retention", stats_queue)
+    serve_metrics(app)
+    logger.info(f"Retention worker started: a pass every {interval}s in chunks of "
+                f"{app.config.get('RETENTION_CHUNK_SIZE', 1000)} rows")
+    try:
+        while not shutdown.requested:
+            stats.maybe_report()
+            started = time.monotonic()
+            try:
+                with stats.timed("process"):
+                    report = RetentionService.run(stop=lambda: shutdown.requested)
+            except Exception as e:
+                db.session.rollback()
+                logger.exception(f"Error in retention pass: {e}")
+                report = {}
+            handled = sum(report.values())
+            if handled:
+                logger.info(f"Retention pass: {report}")
+            stats.record(handled)
+            while not shutdown.requested and time.monotonic() - started < interval:
+                time.sleep(min(interval, 0.5))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        logger.info("Retention worker shutdown gracefully.")
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    main()
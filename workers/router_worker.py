@@ -1,54 +1,183 @@
 import logging
 import time
-from confluent_kafka import KafkaException
-from app.extensions import db
-from app.services.routing_service import RoutingService
-from workers.kafka_utils import create_consumer, parse_message
+from confluent_kafka import KafkaException, TopicPartition
+from app.extensions import db, kafka_producer, redis_client
+from app.services.agent_cache import AgentCache
+from app.services.agent_view import AgentView
+from app.services.routing_service import SETTLED_STATUSES, RoutingService
+from workers.async_router import run_async
+from workers.sharded_router import run_sharded
+from workers.agent_status_worker import RETRY_BACKOFF
+from workers.kafka_utils import GracefulShutdown, create_consumer, message_trace, parse_message, rewind
+from workers.stats import WorkerStats, serve_metrics
 from app import create_app
 
 logger = logging.getLogger("router_worker")
 
 
-def main():
-    app = create_app("production")
-    app.app_context().push()
-
-    consumer = create_consumer(group_id="router_worker_group", bootstrap_servers=app.config['KAFKA_BOOTSTRAP_SERVERS'])
-    topic = app.config.get("TOPIC_ROUTING_REQUESTS", "customer.routing.requests")
-    consumer.subscribe([topic])
-    logger.info(f"Router worker subscribed to topic: {topic}")
-
-    try:
-        while True:
-            msg = consumer.poll(timeout=1.0)
-            if msg is None:
-                continue
-            if msg.error():
-                logger.error(f"Consumer error: {msg.error()}")
-                continue
+def run_single(consumer, app, shutdown, stats, agent_view=None):
+    """Route one message per poll and commit each settled message."""
+    assignments_topic = app.config.get("TOPIC_ASSIGNMENTS", "customer.assignments")
+    while not shutdown.requested:
+        stats.maybe_report(consumer)
+        msg = consumer.poll(timeout=1.0)
+        if msg is None:
+            continue
+        if msg.error():
+            logger.error(f"Consumer error: {msg.error()}")
+            continue
 
+        trace = message_trace(msg)
+        try:
             key, data = parse_message(msg)
-            logger.info(f"Consumed message with key={key}, value={data}")
+        except KafkaException as e:
+            logger.error(f"Skipping undecodable message at {msg.topic()}[{msg.partition()}]@{msg.offset()}: {e}")
+            continue
+        if not data:
+            logger.error(f"Skipping empty routing request key={key}")
+            continue
+        logger.info(f"Consumed message with key={key}, value={data}")
 
-            try:
+        try:
+            with stats.timed("process"):
                 result, status = RoutingService.assign_customer(
                     customer_id=data.get("customer_id"),
                     tenant_id=data.get("tenant_id"),
                     requested_skill=data.get("requested_skill"),
-                    topic=app.config.get("TOPIC_ASSIGNMENTS", "customer.assignments")
+                    priority=data.get("priority"),
+                    topic=assignments_topic,
+                    agent_view=agent_view,
+                    trace=trace,
                 )
-                logger.info(f"Routing result: {result}, status: {status}")
-                if status == 200:
+            logger.info(f"Routing result: {result}, status: {status}")
+            stats.record()
+            if result.get("status") in SETTLED_STATUSES:
+                with stats.timed("commit"):
                     consumer.commit(message=msg)
-            except Exception as e:
-                logger.exception(f"Error processing message key={key}: {e}")
+        except Exception as e:
+            logger.exception(f"Error processing message key={key}: {e}")
+
+        time.sleep(0.01)
 
-            time.sleep(0.01)
 
+def run_batch(consumer, app, shutdown, stats, agent_view=None):
+    """Consume up to ROUTER_BATCH_SIZE messages at a time, route them together and commit once per batch."""
+    assignments_topic = app.config.get("TOPIC_ASSIGNMENTS", "customer.assignments")
+    batch_size = app.config.get("ROUTER_BATCH_SIZE", 500)
+    max_wait = app.config.get("ROUTER_BATCH_MAX_WAIT", 0.05)
+    while not shutdown.requested:
+        stats.maybe_report(consumer)
+        msgs = consumer.consume(num_messages=batch_size, timeout=max_wait)
+        if not msgs:
+            continue
+        stats.observe_batch(len(msgs))
+
+        accepted, requests, traces = [], [], []
+        for msg in msgs:
+            if msg.error():
+                logger.error(f"Consumer error: {msg.error()}")
+                continue
+            try:
+                key, data = parse_message(msg)
+            except KafkaException as e:
+                logger.error(f"Skipping undecodable message at {msg.topic()}[{msg.partition()}]@{msg.offset()}: {e}")
+                continue
+            if not data or not data.get("customer_id") or not data.get("tenant_id"):
+                logger.error(f"Skipping malformed routing request key={key}")
+                continue
+            accepted.append(msg)
+            requests.append(data)
+            traces.append(message_trace(msg))
+
+        if not requests:
+            continue
+
+        try:
+            with stats.timed("process"):
+                results = RoutingService.assign_batch(
+                    requests, topic=assignments_topic, agent_view=agent_view, traces=traces,
+                )
+        except Exception as e:
+            # Seek back so the requests are routed again; their claims were already handed back
+            db.session.rollback()
+            logger.exception(f"Error routing batch of {len(requests)} messages; retrying batch: {e}")
+            rewind(consumer, accepted)
+            time.sleep(RETRY_BACKOFF)
+            continue
+
+        # Same semantics as single mode: commit past the last settled message of each partition
+        offsets = {}
+        for msg, (result, _) in zip(accepted, results):
+            if result.get("status") in SETTLED_STATUSES:
+                offsets[(msg.topic(), msg.partition())] = msg.offset() + 1
+        stats.record(len(requests))
+        assigned = sum(1 for result, _ in results if result.get("status") == "assigned")
+        logger.info(f"Routed batch: consumed={len(msgs)}, assigned={assigned}, queued={len(requests) - assigned}")
+        if offsets:
+            with stats.timed("commit"):
+                consumer.commit(
+                    offsets=[TopicPartition(t, p, o) for (t, p), o in offsets.items()],
+                    asynchronous=False,
+                )
+
+
+def main(stats_queue=None):
+    shutdown = GracefulShutdown()
+    app = create_app("production")
+    app.app_context().push()
+
+    consumer = create_consumer(group_id="router_worker_group", bootstrap_servers=app.config['KAFKA_BOOTSTRAP_SERVERS'])
+    topic = app.config.get("TOPIC_ROUTING_REQUESTS", "customer.routing.requests")
+    mode = app.config.get("ROUTER_MODE", "single")
+    if mode == "sharded" and not app.config.get("ROUTING_SHARD_BY_TENANT"):
+        raise RuntimeError("ROUTER_MODE=sharded needs ROUTING_SHARD_BY_TENANT, so producers partition by tenant")
+    if mode not in ("async", "sharded"):
+        # The async and sharded routers subscribe themselves to act on partition assignment and revocation
+        consumer.subscribe([topic])
+    logger.info(f"Router worker subscribed to topic: {topic} (mode={mode})")
+
+    status_consumer = None
+    if mode == "sharded":
+        # Reads the owned partitions of the agent status topic by explicit assignment; never commits
+        status_consumer = create_consumer(
+            group_id="router_status_replay_group", bootstrap_servers=app.config['KAFKA_BOOTSTRAP_SERVERS'],
+        )
+
+    if mode != "sharded":
+        # Serve the first requests from a warm index rather than DB fallbacks; the sharded router reads the DB itself
+        try:
+            report = AgentCache.reconcile(skip_warm=True)
+            logger.info(f"Warmed the agent cache: {report}")
+        except Exception as e:
+            logger.exception(f"Could not warm the agent cache: {e}")
+        db.session.rollback()
+
+    agent_view = None
+    if app.config.get("ROUTER_AGENT_VIEW") and mode != "sharded":
+        agent_view = AgentView(redis_client.client).start()
+
+    stats = WorkerStats("router", stats_queue)
+    serve_metrics(app)
+    try:
+        if mode == "batch":
+            run_batch(consumer, app, shutdown, stats, agent_view)
+        elif mode == "async":
+            run_async(consumer, app, shutdown, stats, topic, agent_view)
+        elif mode == "sharded":
+            run_sharded(consumer, status_consumer, app, shutdown, stats, topic)
+        else:
+            run_single(consumer, app, shutdown, stats, agent_view)
     except KeyboardInterrupt:
         pass
     finally:
+        if agent_view is not None:
+            agent_view.stop()
+        # Closing revokes the routing partitions, which hands the shard's reservations back to Redis
         consumer.close()
+        if status_consumer is not None:
+            status_consumer.close()
+        # Deliver assignment events still queued in the shared producer
+        kafka_producer.close()
         logger.info("Router worker shutdown gracefully.")
 
 
@@ -0,0 +1,210 @@
+import logging
+import time
+from concurrent import futures
+from confluent_kafka import KafkaException, TopicPartition
+from app.extensions import db, kafka_producer
+from app.services.tenant_shard import TenantShard
+from app.utils import metrics
+from app.utils.partitioning import tenant_partition
+from workers.agent_status_worker import RETRY_BACKOFF, coalesce
+from workers.kafka_utils import message_trace, parse_message, rewind
+
+logger = logging.getLogger("sharded_router")
+
+FORWARD_TIMEOUT = 30.0
+CATCH_UP_TIMEOUT = 60.0
+
+UNOWNED_REQUESTS = metrics.counter(
+    "sharded_router_unowned_requests", "Routing requests consumed for a tenant this router no longer owns",
+)
+
+
+class ShardedRouter:
+    """
+    Routes the tenants of its assigned partitions from a TenantShard, without Redis reservation locks.
+
+    A second, group-less consumer reads the same partition numbers of the agent status topic, so the
+    router sees every status change of the tenants it owns. On each cooperative assignment the new
+    partitions' status events of the last ROUTER_STATUS_REPLAY_SECONDS are replayed before any routing
+    request of theirs is handled; on revocation (or loss) the partitions' tenants are released, handing
+    their reservations back to Redis, before the group reassigns them. Offsets are committed after every
+    batch, so a revoked partition never has routed-but-uncommitted requests.
+    """
+
+    def __init__(self, consumer, status_consumer, app, shutdown, stats):
+        self.consumer = consumer
+        self.status_consumer = status_consumer
+        self.app = app
+        self.shutdown = shutdown
+        self.stats = stats
+        self.partitions = app.config.get("ROUTING_PARTITIONS", 12)
+        self.batch_size = app.config.get("ROUTER_BATCH_SIZE", 500)
+        self.max_wait = app.config.get("ROUTER_BATCH_MAX_WAIT", 0.05)
+        self.replay_seconds = app.config.get("ROUTER_STATUS_REPLAY_SECONDS", 300)
+        self.assignments_topic = app.config.get("TOPIC_ASSIGNMENTS", "customer.assignments")
+        self.status_topic = app.config.get("TOPIC_AGENT_STATUS", "agent.status")
+        self.shard = TenantShard(self.partitions)
+        self.topic = None
+
+    def subscribe(self, topic):
+        self.topic = topic
+        self._check_partitions([topic, self.status_topic])
+        self.consumer.subscribe([topic], on_assign=self._on_assign, on_revoke=self._on_revoke, on_lost=self._on_revoke)
+
+    def _check_partitions(self, topics):
+        """Tenant ownership only lines up when both topics have exactly ROUTING_PARTITIONS partitions."""
+        metadata = self.consumer.list_topics(timeout=10)
+        for topic in topics:
+            found = metadata.topics.get(topic)
+            count = len(found.partitions) if found is not None and found.error is None else 0
+            if count != self.partitions:
+                raise RuntimeError(
+                    f"Tenant-sharded routing needs {topic} with {self.partitions} partitions (ROUTING_PARTITIONS), "
+                    f"found {count}"
+                )
+
+    def run(self):
+        while not self.shutdown.requested:
+            self.stats.maybe_report(self.consumer)
+            self._drain_status(timeout=0)
+            msgs = self.consumer.consume(num_messages=self.batch_size, timeout=self.max_wait)
+            if msgs:
+                self.stats.observe_batch(len(msgs))
+                self._route(msgs)
+
+    def _route(self, msgs):
+        accepted, requests, traces, forwards, unowned = [], [], [], [], set()
+        for msg in msgs:
+            if msg.error():
+                logger.error(f"Consumer error: {msg.error()}")
+                continue
+            try:
+                key, data = parse_message(msg)
+            except KafkaException as e:
+                logger.error(f"Skipping undecodable message at {msg.topic()}[{msg.partition()}]@{msg.offset()}: {e}")
+                continue
+            if not data or not data.get("customer_id") or not data.get("tenant_id"):
+                logger.error(f"Skipping malformed routing request key={key}")
+                continue
+            owner = tenant_partition(data["tenant_id"], self.partitions)
+            if owner != msg.partition():
+                # Produced without the tenant mapping: move it to the owning partition rather than route it here
+                forwards.append((msg, owner))
+            elif self.shard.owns(data["tenant_id"]):
+                accepted.append(msg)
+                requests.append(data)
+                traces.append(message_trace(msg))
+            else:
+                # The partition was revoked mid-batch; its new owner reads the request from the committed offset
+                unowned.add((msg.topic(), msg.partition()))
+                UNOWNED_REQUESTS.inc()
+        if unowned:
+            logger.warning(f"Leaving requests of revoked partitions {sorted(p for _, p in unowned)} to their new owner")
+
+        settled = list(self._forward(forwards))
+        if requests:
+            try:
+                with self.stats.timed("process"):
+                    results = self.shard.route(requests, topic=self.assignments_topic, traces=traces)
+            except Exception as e:
+                # Seek back so the requests are routed again; forwards later in their partitions are re-sent
+                db.session.rollback()
+                logger.exception(f"Error routing batch of {len(requests)} messages; retrying batch: {e}")
+                rewind(self.consumer, accepted)
+                time.sleep(RETRY_BACKOFF)
+                return
+            settled += accepted
+            self.stats.record(len(requests))
+            assigned = sum(1 for result, _ in results if result.get("status") == "assigned")
+            logger.info(f"Routed batch: consumed={len(msgs)}, assigned={assigned}, queued={len(requests) - assigned}")
+
+        offsets = {}
+        for msg in settled:
+            tp = (msg.topic(), msg.partition())
+            if tp not in unowned:
+                offsets[tp] = max(offsets.get(tp, 0), msg.offset() + 1)
+        if offsets:
+            with self.stats.timed("commit"):
+                self.consumer.commit(offsets=[TopicPartition(t, p, o) for (t, p), o in offsets.items()],
+                                     asynchronous=False)
+
+    def _forward(self, forwards):
+        """Re-produce mis-partitioned requests to their tenant's partition; yields the ones delivered."""
+        if not forwards:
+            return
+        logger.warning(f"Forwarding {len(forwards)} routing requests produced to the wrong partition")
+        pending = [
+            (msg, kafka_producer.send(msg.topic(), msg.value(), key=msg.key(), headers=msg.headers(), partition=owner))
+            for msg, owner in forwards
+        ]
+        futures.wait([f for _, f in pending], timeout=FORWARD_TIMEOUT)
+        for msg, future in pending:
+            if future.done() and future.exception() is None:
+                yield msg
+            else:
+                logger.error(f"Could not forward routing request at {msg.topic()}[{msg.partition()}]@{msg.offset()}")
+
+    def _drain_status(self, timeout):
+        """Apply pending agent status events and dispatch waiting customers to agents they left available."""
+        msgs = self.status_consumer.consume(num_messages=self.batch_size, timeout=timeout)
+        if not msgs:
+            return 0
+        updates, _ = coalesce(msgs)
+        try:
+            with self.stats.timed("status"):
+                available = self.shard.apply_status(updates)
+                self.shard.dispatch(available, topic=self.assignments_topic)
+        except Exception as e:
+            db.session.rollback()
+            logger.exception(f"Error dispatching to {len(updates)} updated agents: {e}")
+        return len(msgs)
+
+    def _on_assign(self, consumer, partitions):
+        """Own the new partitions, reading their status partitions from the replay window up to the current end first."""
+        numbers = sorted(tp.partition for tp in partitions)
+        if not numbers:
+            return
+        self.shard.own(numbers)
+        since_ms = int((time.time() - self.replay_seconds) * 1000)
+        starts = self.status_consumer.offsets_for_times(
+            [TopicPartition(self.status_topic, p, since_ms) for p in numbers], timeout=10,
+        )
+        ends = {}
+        for tp in starts:
+            _, high = self.status_consumer.get_watermark_offsets(tp, timeout=10)
+            if tp.offset < 0:
+                # Nothing newer than the window start: read only what arrives from now on
+                tp.offset = high
+            if tp.offset < high:
+                ends[tp.partition] = high
+        self.status_consumer.incremental_assign(starts)
+        self._catch_up(ends)
+
+    def _catch_up(self, ends):
+        deadline = time.monotonic() + CATCH_UP_TIMEOUT
+        while ends and time.monotonic() < deadline:
+            positions = self.status_consumer.position([TopicPartition(self.status_topic, p) for p in ends])
+            for tp in positions:
+                if tp.offset >= ends[tp.partition]:
+                    ends.pop(tp.partition)
+            if ends:
+                self._drain_status(timeout=0.5)
+        if ends:
+            logger.warning(f"Status replay of partitions {sorted(ends)} did not finish; routing from what was read")
+
+    def _on_revoke(self, consumer, partitions):
+        """Release revoked (or lost) partitions' tenants and stop reading their status partitions."""
+        numbers = sorted(tp.partition for tp in partitions)
+        if not numbers:
+            return
+        self.shard.release(numbers)
+        try:
+            self.status_consumer.incremental_unassign([TopicPartition(self.status_topic, p) for p in numbers])
+        except KafkaException as e:
+            logger.error(f"Could not unassign status partitions {numbers}: {e}")
+
+
+def run_sharded(consumer, status_consumer, app, shutdown, stats, topic):
+    router = ShardedRouter(consumer, status_consumer, app, shutdown, stats)
+    router.subscribe(topic)
+    router.run()
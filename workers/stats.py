@@ -0,0 +1,126 @@
+import logging
+import os
+import time
+from confluent_kafka import TopicPartition
+from app.extensions import kafka_producer, redis_client
+from app.utils import metrics
+
+logger = logging.getLogger("worker_stats")
+
+WORKER_BATCH_SIZE = metrics.histogram(
+    "worker_batch_size", "Messages handled per poll-loop iteration", ("worker",), buckets=metrics.SIZE_BUCKETS,
+)
+WORKER_STAGE = metrics.histogram(
+    "worker_stage_seconds", "Poll-loop step latency (process, commit)", ("worker", "stage"),
+)
+WORKER_PROCESSED = metrics.counter("worker_messages", "Messages processed", ("worker",))
+WORKER_LAG = metrics.gauge("worker_consumer_lag", "Consumer lag summed over assigned partitions", ("worker",))
+
+
+def serve_metrics(app):
+    """
+    Expose this process's metrics when METRICS_PORT is set, on METRICS_PORT plus the supervisor slot
+    index (WORKER_INDEX), so every process of a supervised worker type gets its own port.
+    """
+    port = app.config.get("METRICS_PORT")
+    if not port:
+        return None
+    port += int(os.getenv("WORKER_INDEX", "0"))
+    try:
+        server = metrics.serve(port)
+    except OSError as e:
+        logger.error(f"Could not serve metrics on port {port}: {e}")
+        return None
+    logger.info(f"Serving metrics on :{port}/metrics")
+    return server
+
+
+class WorkerStats:
+    """
+    Per-process throughput and consumer-lag reporter.
+
+    Reports every `interval` seconds to the supervisor's queue when one is given, otherwise to the log.
+    """
+
+    def __init__(self, worker: str, queue=None, interval: float = 10.0):
+        self.worker = worker
+        self.queue = queue
+        self.interval = interval
+        self.processed = 0
+        self.counters = {}
+        self._window_processed = 0
+        self._window_start = time.monotonic()
+
+    def record(self, count: int = 1):
+        self.processed += count
+        self._window_processed += count
+        WORKER_PROCESSED.labels(self.worker).inc(count)
+
+    def observe_batch(self, size: int):
+        """Record how many messages one consume() call returned."""
+        WORKER_BATCH_SIZE.labels(self.worker).observe(size)
+
+    def timed(self, stage: str):
+        """Context manager timing one poll-loop step into worker_stage_seconds."""
+        return WORKER_STAGE.labels(self.worker, stage).time()
+
+    def incr(self, name: str, count: int = 1):
+        """Bump a worker-specific running total, reported alongside throughput (e.g. coalesced events)."""
+        self.counters[name] = self.counters.get(name, 0) + count
+
+    def maybe_report(self, consumer=None):
+        now = time.monotonic()
+        elapsed = now - self._window_start
+        if elapsed < self.interval:
+            return
+        lag = self.lag(consumer) if consumer is not None else None
+        if lag is not None:
+            WORKER_LAG.labels(self.worker).set(lag)
+        report = {
+            "worker": self.worker,
+            "pid": os.getpid(),
+            "processed": self.processed,
+            "rate": self._window_processed / elapsed,
+            "lag": lag,
+            "counters": {**self.counters, **self.redis_counters(), **self.producer_counters()},
+        }
+        self._window_processed = 0
+        self._window_start = now
+        if self.queue is not None:
+            self.queue.put(report)
+        else:
+            logger.info(f"Worker stats: {report}")
+
+    @staticmethod
+    def redis_counters() -> dict:
+        """Round trips and pool waits of this process's shared Redis pool, when it counts them."""
+        try:
+            stats = redis_client.stats()
+        except RuntimeError:
+            return {}
+        if stats["round_trips"] is None:
+            return {}
+        return {"redis_round_trips": stats["round_trips"], "redis_pool_waits": stats["pool_waits"]}
+
+    @staticmethod
+    def producer_counters() -> dict:
+        """Delivery outcomes and backlog of this process's shared Kafka producer."""
+        stats = kafka_producer.stats()
+        return {
+            "produced": stats["delivered"],
+            "produce_failed": stats["failed"],
+            "produce_in_flight": stats["in_flight"],
+        }
+
+    @staticmethod
+    def lag(consumer):
+        """Messages between the consumer's position and the high watermark, summed over assigned partitions."""
+        try:
+            total = 0
+            for tp in consumer.position(consumer.assignment()):
+                low, high = consumer.get_watermark_offsets(TopicPartition(tp.topic, tp.partition), timeout=1.0)
+                total += high - (tp.offset if tp.offset >= 0 else low)
+            return total
+        except Exception as e:
+            logger.warning(f"Could not compute consumer lag: {e}")
+            return None
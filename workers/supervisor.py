@@ -0,0 +1,165 @@
+"""
+Run N consumer processes of one worker type in the same consumer group.
+
+    python -m workers.supervisor router --processes 8
+    python -m workers.supervisor agent_status
+
+Crashed children are restarted with exponential backoff, SIGTERM/SIGINT is forwarded to every child
+for a graceful drain, and per-process throughput and lag are aggregated into periodic log lines.
+Processes beyond the topic's partition count sit idle, so size --processes accordingly.
+"""
+import argparse
+import importlib
+import logging
+import multiprocessing as mp
+import os
+import queue
+import signal
+import time
+
+logger = logging.getLogger("supervisor")
+
+WORKERS = {
+    "router": "workers.router_worker",
+    "agent_status": "workers.agent_status_worker",
+    "customer_writer": "workers.customer_writer_worker",
+    "outbox_relay": "workers.outbox_relay",
+    "agent_cache_reconciler": "workers.agent_cache_reconciler",
+    "heartbeat": "workers.heartbeat_worker",
+    "presence_sweeper": "workers.presence_sweeper",
+    "retention": "workers.retention_worker",
+}
+
+
+def _child(worker_type: str, stats_queue, index: int = 0):
+    logging.basicConfig(level=logging.INFO)
+    # Lets each process derive per-slot resources, e.g. its metrics port
+    os.environ["WORKER_INDEX"] = str(index)
+    importlib.import_module(WORKERS[worker_type]).main(stats_queue=stats_queue)
+
+
+class Supervisor:
+    """Keeps `processes` children of one worker type alive until asked to stop."""
+
+    def __init__(self, worker_type: str, processes: int, backoff_base: float = 1.0, backoff_max: float = 60.0,
+                 stable_after: float = 60.0, grace_period: float = 30.0, report_interval: float = 30.0):
+        self.worker_type = worker_type
+        self.processes = processes
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.stable_after = stable_after
+        self.grace_period = grace_period
+        self.report_interval = report_interval
+        # librdkafka is not fork-safe; spawn gives every child its own clean client state
+        self._ctx = mp.get_context("spawn")
+        self._stats_queue = self._ctx.Queue()
+        self._slots = [{"process": None, "started": 0.0, "failures": 0, "restart_at": 0.0} for _ in range(processes)]
+        self._stats = {}
+        self._stopping = False
+
+    def run(self):
+        signal.signal(signal.SIGTERM, self._request_stop)
+        signal.signal(signal.SIGINT, self._request_stop)
+        logger.info(f"Supervising {self.processes} {self.worker_type} worker processes")
+        next_report = time.monotonic() + self.report_interval
+        while not self._stopping:
+            now = time.monotonic()
+            for index, slot in enumerate(self._slots):
+                self._check(index, slot, now)
+            self._drain_stats()
+            if now >= next_report:
+                self._report()
+                next_report = now + self.report_interval
+            time.sleep(0.5)
+        self._shutdown()
+
+    def _check(self, index, slot, now):
+        process = slot["process"]
+        if process is not None and process.is_alive():
+            if slot["failures"] and now - slot["started"] >= self.stable_after:
+                slot["failures"] = 0
+            return
+        if process is not None:
+            slot["failures"] += 1
+            delay = min(self.backoff_base * 2 ** (slot["failures"] - 1), self.backoff_max)
+            logger.warning(
+                f"{self.worker_type}[{index}] pid={process.pid} exited with code {process.exitcode}; "
+                f"restarting in {delay:.1f}s"
+            )
+            self._stats.pop(process.pid, None)
+            slot["process"], slot["restart_at"] = None, now + delay
+        if now >= slot["restart_at"]:
+            self._start(index, slot)
+
+    def _start(self, index, slot):
+        process = self._ctx.Process(
+            target=_child,
+            args=(self.worker_type, self._stats_queue, index),
+            name=f"{self.worker_type}-{index}",
+            daemon=False,
+        )
+        process.start()
+        slot["process"], slot["started"] = process, time.monotonic()
+        logger.info(f"Started {self.worker_type}[{index}] pid={process.pid}")
+
+    def _drain_stats(self):
+        while True:
+            try:
+                report = self._stats_queue.get_nowait()
+            except queue.Empty:
+                return
+            self._stats[report["pid"]] = report
+
+    def _report(self):
+        alive = [s["process"].pid for s in self._slots if s["process"] is not None and s["process"].is_alive()]
+        reports = [self._stats[pid] for pid in alive if pid in self._stats]
+        lags = [r["lag"] for r in reports if r["lag"] is not None]
+        counters = {}
+        for r in reports:
+            for name, value in r.get("counters", {}).items():
+                counters[name] = counters.get(name, 0) + value
+        logger.info(
+            f"{self.worker_type}: processes={len(alive)}/{self.processes} "
+            f"rate={sum(r['rate'] for r in reports):.1f}/s "
+            f"lag={sum(lags) if lags else 'n/a'} "
+            f"{''.join(f'{name}={value} ' for name, value in sorted(counters.items()))}"
+            f"per_process={[(r['pid'], round(r['rate'], 1), r['lag']) for r in reports]}"
+        )
+
+    def _request_stop(self, signum, frame):
+        self._stopping = True
+
+    def _shutdown(self):
+        children = [s["process"] for s in self._slots if s["process"] is not None and s["process"].is_alive()]
+        logger.info(f"Forwarding SIGTERM to {len(children)} children for graceful drain")
+        for process in children:
+            os.kill(process.pid, signal.SIGTERM)
+        deadline = time.monotonic() + self.grace_period
+        for process in children:
+            process.join(timeout=max(deadline - time.monotonic(), 0))
+        for process in children:
+            if process.is_alive():
+                logger.warning(f"{process.name} pid={process.pid} did not drain in time; killing")
+                process.kill()
+                process.join()
+        logger.info("Supervisor shutdown complete.")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("worker", choices=sorted(WORKERS))
+    parser.add_argument("--processes", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--grace-period", type=float, default=30.0, help="seconds to wait for children to drain")
+    parser.add_argument("--report-interval", type=float, default=30.0, help="seconds between aggregate stats lines")
+    args = parser.parse_args(argv)
+    Supervisor(
+        args.worker,
+        args.processes,
+        grace_period=args.grace_period,
+        report_interval=args.report_interval,
+    ).run()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    main()